@@ -0,0 +1,239 @@
+# analytics_export.py
+import argparse
+import json
+import os
+import shutil
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from database import NutritionDatabase
+
+# Exported columns, in file order, with their Arrow types
+EXPORT_COLUMNS = [
+    ("id", "int64"),
+    ("user_id", "int64"),
+    ("date", "string"),
+    ("food_name", "string"),
+    ("portion", "string"),
+    ("calories", "float64"),
+    ("protein", "float64"),
+    ("fat", "float64"),
+    ("carbs", "float64"),
+    ("fiber", "float64"),
+    ("sugar", "float64"),
+    ("sodium", "float64"),
+    ("water_ml", "int64"),
+    ("exercise_min", "int64"),
+    ("source", "string"),
+    ("prediction_confidence", "float64"),
+    ("created_at", "string"),
+]
+
+WATERMARK_FILE = "_watermark.json"
+FILE_EXTENSIONS = {"arrow": ".arrow", "parquet": ".parquet"}
+
+def load_pyarrow():
+    """Import pyarrow on first use so the app runs without it"""
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        return pyarrow
+    except ImportError:
+        raise ImportError("Analytics export needs pyarrow: pip install pyarrow") from None
+
+def export_schema():
+    pa = load_pyarrow()
+    return pa.schema([(name, getattr(pa, arrow_type)()) for name, arrow_type in EXPORT_COLUMNS])
+
+def read_watermark(root: str) -> int:
+    """Highest daily_entries rowid already exported (0 if nothing yet)"""
+    try:
+        with open(os.path.join(root, WATERMARK_FILE), "r", encoding="utf-8") as f:
+            return int(json.load(f).get("last_id", 0))
+    except (OSError, ValueError):
+        return 0
+
+def write_watermark(root: str, last_id: int, rows: int):
+    """Replace the watermark atomically so a crash never leaves it half-written"""
+    path = os.path.join(root, WATERMARK_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"last_id": last_id, "rows_exported": rows, "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S")}, f)
+    os.replace(tmp_path, path)
+
+def write_partition(root: str, month: str, rows: List[tuple], file_format: str) -> str:
+    """
+    Write one month's rows of a batch as a new part file
+
+    Parts are named after their first and last rowid, so re-exporting a batch
+    after a crash overwrites the same file instead of duplicating rows.
+    """
+    pa = load_pyarrow()
+    schema = export_schema()
+    columns = list(zip(*rows))
+    table = pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema
+    )
+
+    directory = os.path.join(root, f"month={month}")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"part-{rows[0][0]:012d}-{rows[-1][0]:012d}{FILE_EXTENSIONS[file_format]}")
+
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, path)
+    else:
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, schema) as writer:
+                writer.write_table(table)
+    return path
+
+def export_entries(db: NutritionDatabase, root: str = "analytics", file_format: str = "arrow",
+                   batch_size: int = 50000, full: bool = False) -> Dict:
+    """
+    Export daily_entries newer than the watermark into month partitions
+
+    Rows are read in rowid order, one short read transaction per batch. Entries
+    edited or deleted after they were exported are not revisited; use full=True
+    to rebuild the export from scratch.
+
+    Args:
+        db: Source database
+        root: Output directory (one month=YYYY-MM subdirectory per month)
+        file_format: 'arrow' (IPC file, memory-mappable) or 'parquet'
+        batch_size: Rows per read and per part file
+        full: Discard the existing export and start from rowid 0
+
+    Returns:
+        Dictionary with rows, files, last_id and seconds
+    """
+    if file_format not in FILE_EXTENSIONS:
+        raise ValueError(f"Unknown export format: {file_format}")
+    load_pyarrow()
+
+    if full and os.path.isdir(root):
+        # Only remove what the export itself created
+        for name in os.listdir(root):
+            if name.startswith("month="):
+                shutil.rmtree(os.path.join(root, name))
+        if os.path.exists(os.path.join(root, WATERMARK_FILE)):
+            os.remove(os.path.join(root, WATERMARK_FILE))
+    os.makedirs(root, exist_ok=True)
+
+    last_id = read_watermark(root)
+    stats = {"rows": 0, "files": 0, "last_id": last_id, "seconds": 0.0}
+    start = time.perf_counter()
+    query = f"SELECT {', '.join(name for name, _ in EXPORT_COLUMNS)} FROM daily_entries WHERE id > ? ORDER BY id LIMIT ?"
+
+    while True:
+        with db.connection() as conn:
+            rows = [tuple(row) for row in conn.execute(query, (last_id, batch_size))]
+        if not rows:
+            break
+
+        by_month = defaultdict(list)
+        for row in rows:
+            by_month[(row[2] or "unknown")[:7]].append(row)
+        for month, month_rows in by_month.items():
+            write_partition(root, month, month_rows, file_format)
+            stats["files"] += 1
+
+        last_id = rows[-1][0]
+        stats["rows"] += len(rows)
+        # Only advance the watermark once the batch is on disk
+        write_watermark(root, last_id, stats["rows"])
+        print(f"   … exported {stats['rows']} entries (last id {last_id})", end="\r")
+
+    if stats["rows"]:
+        print()
+    stats["last_id"] = last_id
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    print(f"✅ Exported {stats['rows']} new entries into {stats['files']} files in {stats['seconds']}s")
+    return stats
+
+def partition_files(root: str, months: Optional[Iterable[str]] = None) -> List[str]:
+    """Part files under root, optionally limited to 'YYYY-MM' months"""
+    wanted = set(months) if months else None
+    files = []
+    if not os.path.isdir(root):
+        return files
+    for directory in sorted(os.listdir(root)):
+        if not directory.startswith("month="):
+            continue
+        if wanted is not None and directory[len("month="):] not in wanted:
+            continue
+        for name in sorted(os.listdir(os.path.join(root, directory))):
+            if name.endswith(tuple(FILE_EXTENSIONS.values())):
+                files.append(os.path.join(root, directory, name))
+    return files
+
+def load_entries(root: str = "analytics", months: Optional[Iterable[str]] = None,
+                 columns: Optional[List[str]] = None):
+    """
+    Load exported entries as one pyarrow Table
+
+    Arrow IPC parts are memory-mapped, so column buffers are paged in from
+    the files on demand instead of being copied onto the heap.
+    """
+    pa = load_pyarrow()
+    tables = []
+    for path in partition_files(root, months):
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+            tables.append(pq.read_table(path, columns=columns, memory_map=True))
+        else:
+            table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+            tables.append(table.select(columns) if columns else table)
+    if not tables:
+        schema = export_schema()
+        return pa.schema([schema.field(name) for name in columns]).empty_table() if columns else schema.empty_table()
+    return pa.concat_tables(tables)
+
+def load_entries_frame(root: str = "analytics", months: Optional[Iterable[str]] = None,
+                       columns: Optional[List[str]] = None):
+    """load_entries as a pandas DataFrame"""
+    return load_entries(root, months, columns).to_pandas()
+
+def average_calories_by_weekday(root: str = "analytics", months: Optional[Iterable[str]] = None):
+    """Mean daily calories per user-day, by weekday (Monday first)"""
+    import pandas as pd
+
+    frame = load_entries_frame(root, months, ["user_id", "date", "calories"])
+    daily = frame.groupby(["user_id", "date"], as_index=False)["calories"].sum()
+    weekday = pd.to_datetime(daily["date"], errors="coerce").dt.day_name()
+    order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    return daily.groupby(weekday)["calories"].mean().reindex(order)
+
+def most_logged_foods(root: str = "analytics", limit: int = 10, months: Optional[Iterable[str]] = None):
+    """Foods with the most entries across all users"""
+    frame = load_entries_frame(root, months, ["food_name"])
+    return frame["food_name"].str.strip().str.title().value_counts().head(limit)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export daily entries for population-level analytics")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Export entries newer than the watermark")
+    export.add_argument("--db", default="nutrition.db", help="Database path")
+    export.add_argument("--out", default="analytics", help="Output directory")
+    export.add_argument("--format", choices=sorted(FILE_EXTENSIONS), default="arrow")
+    export.add_argument("--batch-size", type=int, default=50000)
+    export.add_argument("--full", action="store_true", help="Rebuild the export from scratch")
+
+    report = commands.add_parser("report", help="Weekday calories and most-logged foods from the export")
+    report.add_argument("--out", default="analytics", help="Export directory")
+    report.add_argument("--month", action="append", help="Limit to YYYY-MM (repeatable)")
+
+    args = parser.parse_args()
+    try:
+        if args.command == "export":
+            export_entries(NutritionDatabase(args.db), args.out, args.format, args.batch_size, args.full)
+        else:
+            print("📊 Average calories per user-day by weekday")
+            print(average_calories_by_weekday(args.out, args.month).round(1).to_string())
+            print("\n🍽️ Most logged foods")
+            print(most_logged_foods(args.out, months=args.month).to_string())
+    except ImportError as e:
+        print(f"❌ {e}")
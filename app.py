@@ -13,6 +13,10 @@ try:
     from database import NutritionDatabase, extract_number
     from image_classifier import get_food_classifier
     from deepseek_api import get_nutrition_api, extract_number as extract_num
+    from nutrition_stats import NutritionStats
+    from sharding import ShardedNutritionDatabase
+    from export import export_filename, iter_export
+    from food_index import QUICK_FOODS, FoodCatalog
 except ImportError:
     # Fallback if modules are in same directory
     import sys
@@ -20,6 +24,10 @@ except ImportError:
     from database import NutritionDatabase, extract_number
     from image_classifier import get_food_classifier
     from deepseek_api import get_nutrition_api, extract_number as extract_num
+    from nutrition_stats import NutritionStats
+    from sharding import ShardedNutritionDatabase
+    from export import export_filename, iter_export
+    from food_index import QUICK_FOODS, FoodCatalog
 
 # -------------------------
 # KONFIGURASI APLIKASI
@@ -34,7 +42,11 @@ st.set_page_config(
 # Initialize database
 @st.cache_resource
 def init_database():
-    return NutritionDatabase()
+    # Saves return once queued; reads of the same user still see them
+    shards = int(os.environ.get("NUTRITION_SHARDS", "1"))
+    if shards > 1:
+        return ShardedNutritionDatabase(shards=shards, write_behind=True)
+    return NutritionDatabase(write_behind=True)
 
 db = init_database()
 
@@ -47,6 +59,14 @@ def init_classifier():
 def init_nutrition_api():
     return get_nutrition_api()
 
+@st.cache_resource
+def init_nutrition_stats():
+    return NutritionStats(db)
+
+@st.cache_resource
+def init_food_catalog():
+    return FoodCatalog(db)
+
 # -------------------------
 # SESSION STATE MANAGEMENT
 # -------------------------
@@ -78,6 +98,9 @@ def init_session_state():
     
     if "nutrition_result" not in st.session_state:
         st.session_state.nutrition_result = None
+    
+    if "history_cursors" not in st.session_state:
+        st.session_state.history_cursors = [None]
 
 init_session_state()
 
@@ -201,6 +224,25 @@ def get_nutrition_from_prediction(food_name, portion_size="normal"):
         nutrition = nutrition_api.analyze_food_nutrition(food_name, portion_size)
         return nutrition
 
+def stream_nutrition_to_tiles(food_name, portion_size="normal"):
+    """Show nutrition metric tiles, filling them in as the streamed analysis arrives"""
+    col_nut1, col_nut2 = st.columns(2)
+    with col_nut1:
+        tiles = {"calories": ("🔥 Kalori", st.empty()), "protein": ("🥩 Protein", st.empty())}
+    with col_nut2:
+        tiles.update({"fat": ("🥑 Lemak", st.empty()), "carbs": ("🍞 Karbo", st.empty())})
+    
+    for label, tile in tiles.values():
+        tile.metric(label, "…")
+    
+    nutrition = {}
+    with st.spinner(f"Analisis nutrisi {food_name}..."):
+        for stage, data in nutrition_api.stream_food_nutrition(food_name, portion_size):
+            for field, (label, tile) in tiles.items():
+                tile.metric(label, data.get(field, "…"))
+            nutrition = data
+    return nutrition
+
 # -------------------------
 # AUTHENTICATION PAGES
 # -------------------------
@@ -315,17 +357,18 @@ def home_page():
     
     # Today's summary
     today = datetime.now().strftime("%Y-%m-%d")
-    today_entries = db.get_daily_entries(st.session_state.user_id, today)
+    today_entries = db.query_entries(st.session_state.user_id, today, columns=('food_name', 'calories'), limit=3)
+    today_totals = db.get_daily_totals(st.session_state.user_id, today)
     
     col_summary1, col_summary2, col_summary3, col_summary4 = st.columns(4)
     
-    total_cal = sum(entry.get('calories', 0) for entry in today_entries)
-    total_pro = sum(entry.get('protein', 0) for entry in today_entries)
-    total_water = sum(entry.get('water_ml', 0) for entry in today_entries)
-    total_exercise = sum(entry.get('exercise_min', 0) for entry in today_entries)
+    total_cal = today_totals['calories']
+    total_pro = today_totals['protein']
+    total_water = today_totals['water']
+    total_exercise = today_totals['exercise']
     
     with col_summary1:
-        st.metric("🍽️ Makanan", len(today_entries))
+        st.metric("🍽️ Makanan", today_totals['entry_count'])
     with col_summary2:
         st.metric("🔥 Kalori", f"{int(total_cal)} kcal")
     with col_summary3:
@@ -368,21 +411,13 @@ def home_page():
             
             # Button to analyze nutrition
             if st.button("🧪 Analisis Nutrisi dari Gambar", type="primary"):
-                with st.spinner(f"Menganalisis nutrisi {selected_food}..."):
-                    # Get nutrition from DeepSeek API
-                    nutrition = get_nutrition_from_prediction(selected_food, portion.lower())
+                with st.container():
+                    # Get nutrition from DeepSeek API, tiles fill in while the response streams
+                    nutrition = stream_nutrition_to_tiles(selected_food, portion.lower())
                     
                     # Display results
                     st.success(f"✅ Nutrisi {selected_food} berhasil dianalisis!")
                     
-                    col_nut1, col_nut2 = st.columns(2)
-                    with col_nut1:
-                        st.metric("🔥 Kalori", nutrition.get('calories', '0 kcal'))
-                        st.metric("🥩 Protein", nutrition.get('protein', '0 g'))
-                    with col_nut2:
-                        st.metric("🥑 Lemak", nutrition.get('fat', '0 g'))
-                        st.metric("🍞 Karbo", nutrition.get('carbs', '0 g'))
-                    
                     if 'notes' in nutrition:
                         st.info(f"📝 **Catatan:** {nutrition['notes']}")
                     
@@ -400,6 +435,7 @@ def home_page():
                         }
                         
                         if db.add_daily_entry(st.session_state.user_id, entry_data):
+                            init_food_catalog().record(st.session_state.user_id, selected_food)
                             st.success("✅ Data berhasil disimpan!")
                             st.session_state.current_data = entry_data
                             st.session_state.page = "report"
@@ -416,6 +452,20 @@ def home_page():
             key="food_input_manual"
         )
         
+        # Completions and typo fixes from class names, quick foods and this user's own history
+        food_catalog = init_food_catalog()
+        suggestions = [
+            name for name, _ in food_catalog.suggest(food_name, st.session_state.user_id, limit=4)
+            if name != food_name.strip()
+        ]
+        if suggestions:
+            st.caption("💡 Saran:")
+            cols = st.columns(len(suggestions))
+            for col, suggestion in zip(cols, suggestions):
+                if col.button(suggestion, key=f"suggest_{suggestion}", use_container_width=True):
+                    st.session_state.food_input = suggestion
+                    st.rerun()
+        
         col_input1, col_input2, col_input3 = st.columns(3)
         with col_input1:
             portion = st.selectbox("Porsi", ["Kecil", "Normal", "Besar"], index=1, key="manual_portion")
@@ -428,6 +478,8 @@ def home_page():
             if not food_name.strip():
                 st.error("❗ Masukkan nama makanan terlebih dahulu")
             else:
+                # Known spelling first, so typos share one cache entry and API call
+                food_name = food_catalog.canonical(food_name, st.session_state.user_id)
                 with st.spinner("Menganalisis nutrisi..."):
                     # Get nutrition from DeepSeek API
                     nutrition = get_nutrition_from_prediction(food_name, portion.lower())
@@ -443,6 +495,7 @@ def home_page():
                     
                     # Save to database
                     if db.add_daily_entry(st.session_state.user_id, entry_data):
+                        food_catalog.record(st.session_state.user_id, food_name)
                         st.success("✅ Data berhasil disimpan!")
                         st.session_state.current_data = entry_data
                         st.session_state.page = "report"
@@ -455,11 +508,8 @@ def home_page():
         # Quick selection
         st.subheader("🍱 Pilihan Cepat")
         
-        quick_foods = ["Nasi Goreng", "Ayam Goreng", "Tempe Goreng", "Buah Pisang", 
-                      "Sayur Bayam", "Telur Rebus", "Sate Ayam", "Rendang"]
-        
         cols = st.columns(4)
-        for idx, food in enumerate(quick_foods):
+        for idx, food in enumerate(QUICK_FOODS):
             col = cols[idx % 4]
             if col.button(food, use_container_width=True):
                 st.session_state.food_input = food
@@ -492,7 +542,7 @@ def home_page():
         # Recent entries
         if today_entries:
             st.subheader("📝 Entri Hari Ini")
-            for entry in today_entries[:3]:
+            for entry in today_entries:
                 st.write(f"• {entry['food_name'][:20]}... ({entry.get('calories', 0)} kcal)")
     
     # Navigation at bottom
@@ -578,6 +628,7 @@ def report_page():
         if 'source' in nutrition:
             source_map = {
                 'deepseek_api': '🤖 AI DeepSeek',
+                'local_database': '📚 Tabel Gizi Lokal',
                 'text_extraction': '📝 Analisis Teks',
                 'fallback_estimation': '📊 Estimasi',
                 'image_upload': '📸 Upload Gambar'
@@ -626,6 +677,112 @@ def report_page():
             st.session_state.page = "history"
             st.rerun()
 
+def history_page():
+    """Entry history, one keyset page at a time"""
+    st.title("📋 Riwayat Makanan")
+    
+    # Stack of page cursors: the last one is the page being shown
+    cursors = st.session_state.history_cursors
+    page = db.get_entries_page(
+        st.session_state.user_id,
+        cursor=cursors[-1],
+        page_size=20,
+        columns=('date', 'food_name', 'portion', 'calories', 'protein', 'fat', 'carbs')
+    )
+    
+    if not page['entries']:
+        st.info("Belum ada entri makanan")
+    
+    current_date = None
+    for entry in page['entries']:
+        if entry['date'] != current_date:
+            current_date = entry['date']
+            st.subheader(f"📅 {current_date}")
+        st.write(
+            f"• **{entry['food_name']}** ({entry['portion']}) — {entry['calories']:.0f} kcal, "
+            f"P {entry['protein']:.1f} g, L {entry['fat']:.1f} g, K {entry['carbs']:.1f} g"
+        )
+    
+    st.markdown("---")
+    col_prev, col_page, col_next = st.columns([1, 1, 1])
+    with col_prev:
+        if len(cursors) > 1 and st.button("⬅️ Lebih Baru", use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with col_page:
+        st.caption(f"Halaman {len(cursors)}")
+    with col_next:
+        if page['next_cursor'] and st.button("Lebih Lama ➡️", use_container_width=True):
+            cursors.append(page['next_cursor'])
+            st.rerun()
+    
+    with st.expander("📥 Ekspor Riwayat"):
+        export_format = st.selectbox("Format", ["csv", "jsonl"], key="export_format")
+        compress = st.checkbox("Kompres (gzip)", value=True, key="export_gzip")
+        # download_button reads its data on every rerun, so it gets a file built once per click
+        # (streamed off the cursor) and kept until the user's entries change, never a fresh export
+        export_key = (st.session_state.user_id, export_format, compress)
+        if st.button("Siapkan File", use_container_width=True):
+            version = db.get_entry_version(st.session_state.user_id)
+            cached = st.session_state.get('export_file')
+            if cached is None or cached[:2] != (export_key, version):
+                with st.spinner("Menyiapkan file..."):
+                    data = b"".join(iter_export(db, st.session_state.user_id, export_format, compress))
+                st.session_state.export_file = (export_key, version, data)
+        cached = st.session_state.get('export_file')
+        if cached is not None and cached[0] == export_key:
+            if cached[1] != db.get_entry_version(st.session_state.user_id):
+                st.caption("Ada entri baru sejak file disiapkan; klik Siapkan File untuk memperbarui.")
+            mime = "application/gzip" if compress else ("text/csv" if export_format == "csv" else "application/x-ndjson")
+            st.download_button(
+                "⬇️ Unduh",
+                data=cached[2],
+                file_name=export_filename(st.session_state.user_id, export_format, compress),
+                mime=mime,
+                use_container_width=True
+            )
+    
+    if st.button("🏠 Kembali ke Home", use_container_width=True):
+        st.session_state.history_cursors = [None]
+        st.session_state.page = "home"
+        st.rerun()
+
+def stats_page():
+    """Trends, streaks and goal adherence"""
+    st.title("📊 Statistik Nutrisi")
+    
+    stats = init_nutrition_stats().get_stats(st.session_state.user_id)
+    if not stats['days_logged']:
+        st.info("Belum ada data untuk dihitung")
+    else:
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("📅 Hari Tercatat", stats['days_logged'])
+        col2.metric("🔥 Streak Saat Ini", f"{stats['streaks']['current']} hari")
+        col3.metric("🏆 Streak Terpanjang", f"{stats['streaks']['longest']} hari")
+        col4.metric("🎯 Target Kalori Tercapai", f"{stats['adherence']['calories']:.0%}")
+        
+        st.subheader("📈 Rata-rata Kalori Bergerak")
+        st.line_chart(stats['rolling'][['calories_7d', 'calories_30d']].tail(90))
+        
+        col_left, col_right = st.columns(2)
+        with col_left:
+            st.subheader("🥗 Komposisi Energi Makro")
+            ratios = stats['macro_ratios']
+            st.write(f"• Protein: {ratios['protein']:.0%}")
+            st.write(f"• Karbohidrat: {ratios['carbs']:.0%}")
+            st.write(f"• Lemak: {ratios['fat']:.0%}")
+            st.caption(
+                f"Air tercapai {stats['adherence']['water']:.0%} hari, "
+                f"olahraga {stats['adherence']['exercise']:.0%} hari"
+            )
+        with col_right:
+            st.subheader("🗓️ Kalori per Hari dalam Seminggu")
+            st.bar_chart(stats['weekday']['calories'])
+    
+    if st.button("🏠 Kembali ke Home", use_container_width=True):
+        st.session_state.page = "home"
+        st.rerun()
+
 # -------------------------
 # SIDEBAR NAVIGATION
 # -------------------------
@@ -671,6 +828,24 @@ with st.sidebar.expander("ℹ️ Info Sistem"):
     api_status = "✅ Aktif" if nutrition_api.is_available() else "⚠️ Mode Demo"
     st.caption(f"**DeepSeek API:** {api_status}")
 
+    api_metrics = nutrition_api.get_metrics()
+    st.caption(f"**Panggilan API:** {api_metrics['upstream_calls']} (dihemat: {api_metrics['coalesced_calls']})")
+    if api_metrics['circuit_state'] != "closed":
+        st.caption(f"**Circuit Breaker:** ⚠️ {api_metrics['circuit_state']} (pakai estimasi)")
+    
+    cache_stats = db.get_cache_stats()
+    cache_hits = sum(s['hits'] for s in cache_stats.values())
+    cache_lookups = cache_hits + sum(s['misses'] for s in cache_stats.values())
+    if cache_lookups:
+        st.caption(f"**Cache Database:** {cache_hits / cache_lookups:.0%} hit rate")
+    
+    write_metrics = db.get_write_metrics()
+    if write_metrics:
+        st.caption(
+            f"**Antrian Tulis:** {write_metrics['queue_depth']} "
+            f"(commit p50 {write_metrics['commit_latency_p50_ms']:.1f} ms)"
+        )
+
 # About
 st.sidebar.markdown("---")
 st.sidebar.caption("""
@@ -693,7 +868,9 @@ else:
     page_handlers = {
         "home": home_page,
         "report": report_page,
-        # Add other pages here (history, stats, profile)
+        "history": history_page,
+        "stats": stats_page,
+        # Add other pages here (profile)
         # They should work with DeepSeek API too
     }
     
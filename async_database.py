@@ -0,0 +1,509 @@
+# async_database.py
+import asyncio
+import sqlite3
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+import aiosqlite
+
+from database import (
+    BUSY_TIMEOUT_MS, CONNECTION_PRAGMAS, DEFAULT_PAGE_SIZE, INSERT_ENTRY_SQL, MAX_PAGE_SIZE, PURGE_BATCH_PAUSE,
+    PURGE_BATCH_SIZE,
+    LoginRecorder, NutritionDatabase, apply_migrations, decode_cursor, decode_nutrition, encode_cursor, entry_row,
+    insert_entry_rows, select_entry_columns
+)
+from nutrition_codec import NutritionCodec
+
+class AsyncConnectionPool:
+    """Bounded pool of aiosqlite connections for one event loop"""
+
+    def __init__(self, db_path: str, max_size: int = 8, timeout: float = 30.0):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._lock = asyncio.Lock()
+        self._connections: List[aiosqlite.Connection] = []
+
+    async def _open(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = aiosqlite.Row
+        for pragma in CONNECTION_PRAGMAS:
+            await conn.execute(pragma)
+        return conn
+
+    async def _acquire(self) -> aiosqlite.Connection:
+        try:
+            return self._idle.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        async with self._lock:
+            if len(self._connections) < self.max_size:
+                conn = await self._open()
+                self._connections.append(conn)
+                return conn
+        return await asyncio.wait_for(self._idle.get(), self.timeout)
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a connection; uncommitted work is rolled back when it is returned"""
+        conn = await self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                await conn.rollback()
+            self._idle.put_nowait(conn)
+
+    def size(self) -> int:
+        return len(self._connections)
+
+    async def close_all(self):
+        for conn in self._connections:
+            await conn.close()
+        self._connections = []
+        self._idle = asyncio.Queue()
+
+async def pipeline(*calls):
+    """
+    Submit several statements on one connection without a round-trip in between
+
+    aiosqlite runs a connection's calls in submission order on its worker thread,
+    so e.g. an INSERT and its COMMIT cost one event-loop wake-up instead of two.
+    """
+    return await asyncio.gather(*calls)
+
+class AsyncNutritionDatabase:
+    """
+    asyncio counterpart of NutritionDatabase built on aiosqlite.
+
+    Same schema, migrations, connection pragmas and row helpers as the
+    threaded class; use as `async with AsyncNutritionDatabase(path) as db:`.
+    New entries are written as JSON; packed rows written by NutritionDatabase
+    decode transparently. The notes texts they refer to are read through the
+    pool before decoding, so the event loop never waits on a synchronous query.
+    """
+
+    hash_password = NutritionDatabase.hash_password
+
+    def __init__(self, db_path: str = "nutrition.db", pool_size: int = 8):
+        self.db_path = db_path
+        self.pool = AsyncConnectionPool(db_path, max_size=pool_size)
+        # Reaches the sync connection only for ids missing from nutrition_notes (load_notes reads the rest)
+        self.codec = NutritionCodec(self.sync_connection)
+        # Flushes on its own thread, and in close() through asyncio.to_thread, never on the loop
+        self.logins = LoginRecorder(self.sync_connection)
+
+    @contextmanager
+    def sync_connection(self):
+        """Short-lived synchronous connection for work kept off the event loop"""
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def connection(self):
+        """Borrow a pooled connection (use as an async context manager)"""
+        return self.pool.connection()
+
+    async def load_notes(self, entries: List[Dict]):
+        """Cache the notes texts of packed entries, so decoding them needs no database access"""
+        missing = list(self.codec.missing_note_ids(entry.get('nutrition_blob') for entry in entries))
+        if not missing:
+            return
+        async with self.connection() as conn:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows = await conn.execute_fetchall(
+                    f"SELECT id, text FROM nutrition_notes WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                )
+                self.codec.add_notes((row[0], row[1]) for row in rows)
+
+    async def init_database(self):
+        """Create or upgrade the schema through the shared synchronous migration path"""
+        def migrate():
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+            try:
+                for pragma in CONNECTION_PRAGMAS:
+                    conn.execute(pragma)
+                apply_migrations(conn)
+            finally:
+                conn.close()
+
+        await asyncio.to_thread(migrate)
+        print("✅ Async database initialized successfully")
+
+    async def close(self):
+        await asyncio.to_thread(self.logins.stop)
+        await self.pool.close_all()
+
+    async def __aenter__(self):
+        await self.init_database()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # ===== USER MANAGEMENT =====
+    async def create_user(self, email: str, password: str, name: str) -> Optional[int]:
+        """Create new user and return user_id"""
+        try:
+            async with self.connection() as conn:
+                cursor, _ = await pipeline(
+                    conn.execute(
+                        "INSERT INTO users (email, password_hash, name) VALUES (?, ?, ?)",
+                        (email, self.hash_password(password), name)
+                    ),
+                    conn.commit()
+                )
+                print(f"✅ User created: {email} (ID: {cursor.lastrowid})")
+                return cursor.lastrowid
+        except sqlite3.IntegrityError:
+            print(f"❌ User already exists: {email}")
+            return None
+        except Exception as e:
+            print(f"❌ Error creating user: {e}")
+            return None
+
+    async def authenticate_user(self, email: str, password: str) -> Optional[Dict]:
+        """Authenticate user and return user data"""
+        try:
+            async with self.connection() as conn:
+                rows = await conn.execute_fetchall('''
+                SELECT id, email, name, weight, height, age, activity_level, goal
+                FROM users
+                WHERE email = ? AND password_hash = ?
+                ''', (email, self.hash_password(password)))
+
+                if rows:
+                    user = dict(rows[0])
+                    self.logins.record(user['id'])
+                    print(f"✅ User authenticated: {email}")
+                    return user
+
+                print(f"❌ Authentication failed for: {email}")
+                return None
+        except Exception as e:
+            print(f"❌ Error authenticating user: {e}")
+            return None
+
+    async def get_user_profile(self, user_id: int) -> Optional[Dict]:
+        """Get user profile by ID"""
+        try:
+            async with self.connection() as conn:
+                rows = await conn.execute_fetchall('''
+                SELECT id, email, name, weight, height, age, activity_level, goal
+                FROM users
+                WHERE id = ?
+                ''', (user_id,))
+                return dict(rows[0]) if rows else None
+        except Exception as e:
+            print(f"❌ Error getting user profile: {e}")
+            return None
+
+    async def update_user_profile(self, user_id: int, **kwargs) -> bool:
+        """Update user profile fields"""
+        allowed_fields = ['name', 'weight', 'height', 'age', 'activity_level', 'goal']
+        updates = [(f"{field} = ?", value) for field, value in kwargs.items() if field in allowed_fields]
+        if not updates:
+            return False
+        try:
+            async with self.connection() as conn:
+                cursor, _ = await pipeline(
+                    conn.execute(
+                        f"UPDATE users SET {', '.join(clause for clause, _ in updates)} WHERE id = ?",
+                        [value for _, value in updates] + [user_id]
+                    ),
+                    conn.commit()
+                )
+                success = cursor.rowcount > 0
+                if success:
+                    print(f"✅ Profile updated for user ID: {user_id}")
+                return success
+        except Exception as e:
+            print(f"❌ Error updating profile: {e}")
+            return False
+
+    async def user_exists(self, email: str) -> bool:
+        """Check if user with email exists"""
+        try:
+            async with self.connection() as conn:
+                rows = await conn.execute_fetchall('SELECT 1 FROM users WHERE email = ?', (email,))
+                return bool(rows)
+        except Exception as e:
+            print(f"❌ Error checking user existence: {e}")
+            return False
+
+    # ===== DAILY ENTRIES MANAGEMENT =====
+    async def add_daily_entry(self, user_id: int, entry_data: Dict[str, Any]) -> bool:
+        """Add a new daily entry for user"""
+        try:
+            row = entry_row(user_id, entry_data)
+            async with self.connection() as conn:
+                cursor, _ = await pipeline(conn.execute(INSERT_ENTRY_SQL, row), conn.commit())
+                print(f"✅ Entry added: {row[2]} (ID: {cursor.lastrowid}) for user {user_id}")
+                return True
+        except Exception as e:
+            print(f"❌ Error adding daily entry: {e}")
+            return False
+
+    async def add_daily_entries_bulk(self, entries: List[Dict[str, Any]], user_id: Optional[int] = None,
+                                     chunk_size: int = 1000) -> Dict:
+        """
+        Insert many daily entries with one transaction per chunk
+
+        A chunk that fails is rolled back and retried row by row, like
+        NutritionDatabase.add_daily_entries_bulk; malformed entries are skipped.
+        """
+        def insert_individually(rows: List[tuple]) -> int:
+            with self.sync_connection() as conn:
+                inserted = insert_entry_rows(conn, rows)
+                conn.commit()
+            return inserted
+
+        stats = {'inserted': 0, 'failed': 0, 'chunks': 0}
+        for start in range(0, len(entries), chunk_size):
+            chunk = entries[start:start + chunk_size]
+            rows = []
+            for entry in chunk:
+                try:
+                    rows.append(entry_row(user_id if user_id is not None else entry.get('user_id'), entry))
+                except Exception as e:
+                    print(f"❌ Skipping malformed entry: {e}")
+            stats['failed'] += len(chunk) - len(rows)
+            try:
+                async with self.connection() as conn:
+                    # Not pipelined: the COMMIT must not follow an executemany that failed partway
+                    try:
+                        await conn.executemany(INSERT_ENTRY_SQL, rows)
+                    except Exception:
+                        await conn.rollback()
+                        raise
+                    await conn.commit()
+                stats['inserted'] += len(rows)
+            except Exception as e:
+                print(f"⚠️ Chunk of {len(rows)} entries failed ({e}), retrying rows individually")
+                inserted = 0
+                try:
+                    # Same per-row retry as the sync class, on a thread so the loop keeps running
+                    inserted = await asyncio.to_thread(insert_individually, rows)
+                except Exception as retry_error:
+                    print(f"❌ Error inserting chunk of {len(rows)} entries: {retry_error}")
+                stats['inserted'] += inserted
+                stats['failed'] += len(rows) - inserted
+            stats['chunks'] += 1
+        print(f"✅ Bulk insert: {stats['inserted']} entries")
+        return stats
+
+    async def get_daily_entries(self, user_id: int, date: Optional[str] = None) -> List[Dict]:
+        """Get daily entries for user, optionally filtered by date"""
+        try:
+            async with self.connection() as conn:
+                if date:
+                    rows = await conn.execute_fetchall('''
+                    SELECT * FROM daily_entries
+                    WHERE user_id = ? AND date = ?
+                    ORDER BY created_at DESC, id DESC
+                    ''', (user_id, date))
+                else:
+                    rows = await conn.execute_fetchall('''
+                    SELECT * FROM daily_entries
+                    WHERE user_id = ?
+                    ORDER BY date DESC, created_at DESC, id DESC
+                    ''', (user_id,))
+
+            entries = [dict(row) for row in rows]
+            await self.load_notes(entries)
+            for entry in entries:
+                entry['nutrition'] = decode_nutrition(entry, self.codec)
+                entry.pop('nutrition_blob', None)
+            return entries
+        except Exception as e:
+            print(f"❌ Error getting daily entries: {e}")
+            return []
+
+    async def get_entries_page(self, user_id: int, cursor: Optional[str] = None,
+                               page_size: int = DEFAULT_PAGE_SIZE) -> Dict:
+        """One keyset page of a user's history, newest first (see NutritionDatabase.get_entries_page)"""
+        page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+        try:
+            query = f"SELECT {', '.join(select_entry_columns())} FROM daily_entries WHERE user_id = ?"
+            params: List[Any] = [user_id]
+            if cursor:
+                query += " AND (date, created_at, id) < (?, ?, ?)"
+                params.extend(decode_cursor(cursor))
+            query += " ORDER BY date DESC, created_at DESC, id DESC LIMIT ?"
+            params.append(page_size + 1)
+
+            async with self.connection() as conn:
+                rows = [dict(row) for row in await conn.execute_fetchall(query, params)]
+
+            next_cursor = None
+            if len(rows) > page_size:
+                rows = rows[:page_size]
+                last = rows[-1]
+                next_cursor = encode_cursor(last['date'], last['created_at'], last['id'])
+            await self.load_notes(rows)
+            for entry in rows:
+                entry['nutrition'] = decode_nutrition(entry, self.codec)
+                entry.pop('nutrition_blob', None)
+            return {'entries': rows, 'next_cursor': next_cursor}
+        except Exception as e:
+            print(f"❌ Error getting entries page: {e}")
+            return {'entries': [], 'next_cursor': None}
+
+    async def get_user_summary(self, user_id: int, start_date: Optional[str] = None,
+                               end_date: Optional[str] = None) -> Dict:
+        """Get summary statistics for user from the daily_totals rollup"""
+        query = '''
+        SELECT date, entry_count, calories as total_calories, protein as total_protein, fat as total_fat,
+               carbs as total_carbs, water as total_water, exercise as total_exercise
+        FROM daily_totals
+        WHERE user_id = ?
+        '''
+        params: List[Any] = [user_id]
+        if start_date:
+            query += " AND date >= ?"
+            params.append(start_date)
+        if end_date:
+            query += " AND date <= ?"
+            params.append(end_date)
+        query += " ORDER BY date DESC"
+
+        try:
+            async with self.connection() as conn:
+                rows = [dict(row) for row in await conn.execute_fetchall(query, params)]
+            days = len(rows)
+            return {
+                'daily_summaries': rows,
+                'total_days': days,
+                'total_entries': sum(row['entry_count'] for row in rows),
+                'avg_calories': sum(row['total_calories'] for row in rows) / days if days else 0,
+                'avg_water': sum(row['total_water'] for row in rows) / days if days else 0,
+                'avg_exercise': sum(row['total_exercise'] for row in rows) / days if days else 0
+            }
+        except Exception as e:
+            print(f"❌ Error getting user summary: {e}")
+            return {}
+
+    async def get_daily_totals(self, user_id: int, date: str) -> Dict:
+        """Get one day's totals for user from the rollup table"""
+        totals = {'entry_count': 0, 'calories': 0.0, 'protein': 0.0, 'fat': 0.0,
+                  'carbs': 0.0, 'water': 0, 'exercise': 0}
+        try:
+            async with self.connection() as conn:
+                rows = await conn.execute_fetchall('''
+                SELECT entry_count, calories, protein, fat, carbs, water, exercise
+                FROM daily_totals
+                WHERE user_id = ? AND date = ?
+                ''', (user_id, date))
+            if rows:
+                totals.update(dict(rows[0]))
+            return totals
+        except Exception as e:
+            print(f"❌ Error getting daily totals: {e}")
+            return totals
+
+    async def delete_entry(self, user_id: int, entry_id: int) -> bool:
+        """Delete a specific entry"""
+        try:
+            async with self.connection() as conn:
+                cursor, _ = await pipeline(
+                    conn.execute("DELETE FROM daily_entries WHERE id = ? AND user_id = ?", (entry_id, user_id)),
+                    conn.commit()
+                )
+                return cursor.rowcount > 0
+        except Exception as e:
+            print(f"❌ Error deleting entry: {e}")
+            return False
+
+    async def clear_user_data(self, user_id: int, batch_size: int = PURGE_BATCH_SIZE,
+                              progress: Optional[Callable[[int], None]] = None) -> bool:
+        """Clear all data for a specific user in short batches (see NutritionDatabase.clear_user_data)"""
+        try:
+            deleted_count = 0
+            while True:
+                async with self.connection() as conn:
+                    cursor, _ = await pipeline(
+                        conn.execute('''
+                        DELETE FROM daily_entries WHERE id IN (
+                            SELECT id FROM daily_entries WHERE user_id = ? LIMIT ?
+                        )
+                        ''', (user_id, batch_size)),
+                        conn.commit()
+                    )
+                deleted = cursor.rowcount
+                deleted_count += deleted
+                if progress:
+                    progress(deleted_count)
+                if deleted < batch_size:
+                    break
+                # The connection is back in the pool; let other writers take the lock first
+                await asyncio.sleep(PURGE_BATCH_PAUSE)
+
+            print(f"✅ Cleared {deleted_count} entries for user {user_id}")
+            return True
+        except Exception as e:
+            print(f"❌ Error clearing user data: {e}")
+            return False
+
+    async def get_database_stats(self) -> Dict:
+        """Get database statistics"""
+        try:
+            async with self.connection() as conn:
+                counts, date_range = await pipeline(
+                    conn.execute_fetchall("SELECT users, entries FROM row_counts WHERE id = 1"),
+                    conn.execute_fetchall(
+                        "SELECT (SELECT MIN(date) FROM daily_entries), (SELECT MAX(date) FROM daily_entries)"
+                    )
+                )
+            first, last = date_range[0]
+            users, entries = (counts[0][0], counts[0][1]) if counts else (0, 0)
+            return {
+                'total_users': users,
+                'total_entries': entries,
+                'date_range': f"{first} to {last}" if first and last else "No data",
+            }
+        except Exception as e:
+            print(f"❌ Error getting database stats: {e}")
+            return {}
+
+if __name__ == "__main__":
+    import io
+    import os
+    import tempfile
+    import time
+    from contextlib import redirect_stdout
+
+    async def simulate_user(db: AsyncNutritionDatabase, index: int, entries: int, date: str) -> int:
+        user_id = await db.create_user(f"async{index}@example.com", "async123", f"Async {index}")
+        await db.authenticate_user(f"async{index}@example.com", "async123")
+        for _ in range(entries):
+            await db.add_daily_entry(user_id, {
+                'food': 'Nasi Goreng',
+                'nutrition': {'calories': '250 kcal', 'protein': '8 g', 'fat': '10 g', 'carbs': '30 g'},
+                'date': date
+            })
+            await db.get_daily_totals(user_id, date)
+        summary = await db.get_user_summary(user_id)
+        return summary['total_entries']
+
+    async def main():
+        users, entries = 200, 10
+        with tempfile.TemporaryDirectory() as tmp:
+            with redirect_stdout(io.StringIO()):
+                async with AsyncNutritionDatabase(os.path.join(tmp, "async.db")) as db:
+                    start = time.perf_counter()
+                    totals = await asyncio.gather(*(simulate_user(db, i, entries, "2024-06-01") for i in range(users)))
+                    elapsed = time.perf_counter() - start
+                    stats = await db.get_database_stats()
+                    pool_size = db.pool.size()
+
+        operations = users * (3 + 2 * entries)
+        assert totals == [entries] * users and stats['total_entries'] == users * entries, (totals[:5], stats)
+        print(f"✅ {users} concurrent users, {operations} operations on {pool_size} connections "
+              f"in {elapsed:.2f}s ({operations / elapsed:.0f} ops/sec) from one event loop")
+
+    asyncio.run(main())
@@ -0,0 +1,270 @@
+# backup.py
+import argparse
+import gzip
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from database import BUSY_TIMEOUT_MS
+
+BACKUP_DIR = "backups"
+BACKUP_PAGES_PER_STEP = 256     # 1 MB per step at 4 KB pages
+BACKUP_STEP_SLEEP = 0.005       # seconds between steps, leaves I/O for the app
+MAX_BACKUP_RESTARTS = 3         # stepped copies restarted by app writes before taking a single-step snapshot
+KEEP_SNAPSHOTS = 7
+SNAPSHOT_SUFFIX = ".db.gz"
+CHECKSUM_SUFFIX = ".sha256"
+
+class BackupRestarted(Exception):
+    """Raised from the progress callback to abandon a stepped copy that keeps restarting"""
+
+def sha256_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def copy_database(source_path: str, target_path: str, pages: int = BACKUP_PAGES_PER_STEP,
+                  sleep: float = BACKUP_STEP_SLEEP, max_restarts: int = MAX_BACKUP_RESTARTS) -> Dict[str, Any]:
+    """
+    Copy a live database with the SQLite online backup API
+
+    The copy runs `pages` pages per step with a sleep in between, so it never
+    competes with the app for long. SQLite restarts a stepped copy whenever
+    another connection writes to the source; after max_restarts the copy is
+    redone in one step instead. In WAL mode that single step only holds a
+    read snapshot, so writers still proceed and the result is consistent.
+
+    Returns:
+        Dictionary with pages, steps, restarts, mode ('stepped' or 'snapshot') and seconds
+    """
+    stats = {"pages": 0, "steps": 0, "restarts": 0, "mode": "stepped", "seconds": 0.0}
+    start = time.perf_counter()
+    last_remaining = [None]
+
+    def progress(status, remaining, total):
+        stats["steps"] += 1
+        stats["pages"] = total
+        if last_remaining[0] is not None and remaining > last_remaining[0]:
+            stats["restarts"] += 1
+            if stats["restarts"] > max_restarts:
+                raise BackupRestarted()
+        last_remaining[0] = remaining
+        print(f"   … copied {total - remaining}/{total} pages", end="\r")
+
+    source = sqlite3.connect(source_path, timeout=BUSY_TIMEOUT_MS / 1000)
+    try:
+        target = sqlite3.connect(target_path)
+        try:
+            try:
+                source.backup(target, pages=pages, progress=progress, sleep=sleep)
+            except BackupRestarted:
+                print(f"\n⚠️ Copy restarted {stats['restarts']} times by live writes, taking a single-step snapshot")
+                stats["mode"] = "snapshot"
+                source.backup(target, pages=-1)
+                stats["steps"] += 1
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+    if stats["mode"] == "stepped":
+        print()
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    return stats
+
+def snapshot_paths(backup_dir: str) -> List[str]:
+    """Snapshots in backup_dir, oldest first (names sort by timestamp)"""
+    if not os.path.isdir(backup_dir):
+        return []
+    return [os.path.join(backup_dir, name) for name in sorted(os.listdir(backup_dir))
+            if name.endswith(SNAPSHOT_SUFFIX)]
+
+def rotate_snapshots(backup_dir: str, keep: int = KEEP_SNAPSHOTS) -> List[str]:
+    """Delete all but the newest `keep` snapshots with their checksum files; returns the removed paths"""
+    removed = []
+    snapshots = snapshot_paths(backup_dir)
+    for path in snapshots[:max(0, len(snapshots) - keep)]:
+        for file_path in (path, path + CHECKSUM_SUFFIX):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        removed.append(path)
+    return removed
+
+def create_snapshot(db_path: str = "nutrition.db", backup_dir: str = BACKUP_DIR, keep: int = KEEP_SNAPSHOTS,
+                    pages: int = BACKUP_PAGES_PER_STEP, sleep: float = BACKUP_STEP_SLEEP,
+                    verify: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Take a compressed, checksummed snapshot of a live database
+
+    Writes <backup_dir>/<name>-YYYYmmdd-HHMMSS.db.gz plus a sha256sum-compatible
+    .sha256 file, verifies it and rotates old snapshots. Nothing is left in
+    backup_dir if any step fails.
+
+    Args:
+        db_path: Live database
+        backup_dir: Snapshot directory
+        keep: Snapshots to retain after rotation
+        pages: Pages per backup step
+        sleep: Seconds between backup steps
+        verify: Restore the snapshot to a temp file and run PRAGMA integrity_check
+
+    Returns:
+        Dictionary with the snapshot path, sizes, checksum and copy statistics, or None on failure
+    """
+    if not os.path.exists(db_path):
+        print(f"❌ Database '{db_path}' not found!")
+        return None
+    os.makedirs(backup_dir, exist_ok=True)
+
+    name = os.path.splitext(os.path.basename(db_path))[0]
+    snapshot_path = os.path.join(backup_dir, f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}{SNAPSHOT_SUFFIX}")
+    print(f"💾 Backing up {db_path} → {snapshot_path}")
+
+    start = time.perf_counter()
+    try:
+        with tempfile.TemporaryDirectory(dir=backup_dir) as tmp:
+            copy_path = os.path.join(tmp, f"{name}.db")
+            copy_stats = copy_database(db_path, copy_path, pages, sleep)
+            raw_bytes = os.path.getsize(copy_path)
+
+            partial_path = os.path.join(tmp, os.path.basename(snapshot_path))
+            with open(copy_path, "rb") as src, gzip.open(partial_path, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            checksum = sha256_file(partial_path)
+            os.replace(partial_path, snapshot_path)
+        with open(snapshot_path + CHECKSUM_SUFFIX, "w", encoding="utf-8") as f:
+            f.write(f"{checksum}  {os.path.basename(snapshot_path)}\n")
+    except Exception as e:
+        print(f"❌ Backup failed: {e}")
+        for file_path in (snapshot_path, snapshot_path + CHECKSUM_SUFFIX):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        return None
+
+    result = {
+        "path": snapshot_path,
+        "sha256": checksum,
+        "raw_bytes": raw_bytes,
+        "compressed_bytes": os.path.getsize(snapshot_path),
+        "copy": copy_stats,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    print(f"✅ Snapshot {os.path.basename(snapshot_path)}: {raw_bytes / 1024:.1f} KB → "
+          f"{result['compressed_bytes'] / 1024:.1f} KB ({copy_stats['pages']} pages, {copy_stats['mode']} copy, "
+          f"{copy_stats['restarts']} restarts) in {result['seconds']}s")
+
+    if verify:
+        result["verified"] = verify_snapshot(snapshot_path)["ok"]
+        if not result["verified"]:
+            return result
+    for path in rotate_snapshots(backup_dir, keep):
+        print(f"🗑️ Rotated out {os.path.basename(path)}")
+    return result
+
+def verify_snapshot(snapshot_path: str) -> Dict[str, Any]:
+    """
+    Check a snapshot's sha256, restore it to a temp file and run PRAGMA integrity_check
+
+    Returns:
+        Dictionary with ok, checksum_ok, integrity, schema version, row counts and seconds
+    """
+    start = time.perf_counter()
+    result = {"ok": False, "checksum_ok": False, "integrity": None, "schema_version": None,
+              "users": None, "entries": None, "seconds": 0.0}
+    try:
+        with open(snapshot_path + CHECKSUM_SUFFIX, "r", encoding="utf-8") as f:
+            expected = f.read().split()[0]
+        result["checksum_ok"] = sha256_file(snapshot_path) == expected
+        if not result["checksum_ok"]:
+            print(f"❌ Checksum mismatch for {snapshot_path}")
+            return result
+
+        with tempfile.TemporaryDirectory() as tmp:
+            restored_path = os.path.join(tmp, "restore.db")
+            with gzip.open(snapshot_path, "rb") as src, open(restored_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            conn = sqlite3.connect(restored_path)
+            try:
+                result["integrity"] = "; ".join(row[0] for row in conn.execute("PRAGMA integrity_check"))
+                result["schema_version"] = conn.execute("PRAGMA user_version").fetchone()[0]
+                result["users"] = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+                result["entries"] = conn.execute("SELECT COUNT(*) FROM daily_entries").fetchone()[0]
+            finally:
+                conn.close()
+    except Exception as e:
+        print(f"❌ Error verifying {snapshot_path}: {e}")
+        return result
+
+    result["ok"] = result["integrity"] == "ok"
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    if result["ok"]:
+        print(f"✅ Verified {os.path.basename(snapshot_path)}: integrity ok, schema v{result['schema_version']}, "
+              f"{result['users']} users, {result['entries']} entries ({result['seconds']}s)")
+    else:
+        print(f"❌ Integrity check failed for {snapshot_path}: {result['integrity']}")
+    return result
+
+def restore_snapshot(snapshot_path: str, target_path: str) -> bool:
+    """
+    Verify a snapshot and decompress it to a new database file
+
+    Refuses to overwrite an existing file: stop the app, move the live
+    database (and its -wal/-shm files) aside, then restore to its path.
+    """
+    if os.path.exists(target_path):
+        print(f"❌ {target_path} already exists; move it aside first")
+        return False
+    if not verify_snapshot(snapshot_path)["ok"]:
+        return False
+    partial_path = target_path + ".partial"
+    with gzip.open(snapshot_path, "rb") as src, open(partial_path, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(partial_path, target_path)
+    print(f"✅ Restored {os.path.basename(snapshot_path)} to {target_path}")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Online backups of the nutrition database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backup = commands.add_parser("backup", help="Take a compressed, checksummed snapshot of the live database")
+    backup.add_argument("--db", default="nutrition.db", help="Database path")
+    backup.add_argument("--dir", default=BACKUP_DIR, help="Snapshot directory")
+    backup.add_argument("--keep", type=int, default=KEEP_SNAPSHOTS, help="Snapshots to retain")
+    backup.add_argument("--pages", type=int, default=BACKUP_PAGES_PER_STEP, help="Pages per backup step")
+    backup.add_argument("--sleep", type=float, default=BACKUP_STEP_SLEEP, help="Seconds between steps")
+    backup.add_argument("--no-verify", action="store_true", help="Skip the integrity check of the new snapshot")
+
+    listing = commands.add_parser("list", help="List snapshots, oldest first")
+    listing.add_argument("--dir", default=BACKUP_DIR, help="Snapshot directory")
+
+    verify = commands.add_parser("verify", help="Check a snapshot's checksum and integrity")
+    verify.add_argument("snapshot", nargs="?", help="Snapshot file (default: newest)")
+    verify.add_argument("--dir", default=BACKUP_DIR, help="Snapshot directory")
+
+    restore = commands.add_parser("restore", help="Verify a snapshot and decompress it to a new file")
+    restore.add_argument("snapshot")
+    restore.add_argument("target", help="Path of the restored database (must not exist)")
+
+    args = parser.parse_args()
+    if args.command == "backup":
+        result = create_snapshot(args.db, args.dir, args.keep, args.pages, args.sleep, verify=not args.no_verify)
+        raise SystemExit(0 if result and result.get("verified", True) else 1)
+    elif args.command == "list":
+        for path in snapshot_paths(args.dir):
+            print(f"  • {os.path.basename(path)} ({os.path.getsize(path) / 1024:.1f} KB)")
+    elif args.command == "verify":
+        snapshots = [args.snapshot] if args.snapshot else snapshot_paths(args.dir)[-1:]
+        if not snapshots:
+            print(f"❌ No snapshots in {args.dir}")
+            raise SystemExit(1)
+        raise SystemExit(0 if verify_snapshot(snapshots[0])["ok"] else 1)
+    else:
+        raise SystemExit(0 if restore_snapshot(args.snapshot, args.target) else 1)
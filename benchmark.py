@@ -0,0 +1,337 @@
+# benchmark.py
+import argparse
+import io
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from database import NutritionDatabase
+from sharding import ShardedNutritionDatabase
+from workload import (
+    ACTIVITY_EXPONENT, DEFAULT_DAYS, WORKLOAD_PASSWORD, WorkloadGenerator, populate, workload_users, zipf_weights
+)
+
+# Default operation mix for the workload replay (relative weights)
+DEFAULT_MIX = {
+    "add_daily_entry": 0.25,
+    "get_daily_entries": 0.40,
+    "get_user_summary": 0.15,
+    "delete_entry": 0.05,
+    "authenticate_user": 0.15,
+}
+
+class UnpooledDatabase(NutritionDatabase):
+    """Baseline: a fresh rollback-journal connection per operation (pre-pool behaviour)"""
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=DELETE")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self.get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """Count and p50/p95/p99/max latency in milliseconds"""
+    ms = [value * 1000 for value in latencies]
+    return {
+        "count": len(ms),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3) if ms else 0.0,
+    }
+
+def run_concurrency_benchmark(db: NutritionDatabase, threads: int = 8, ops_per_thread: int = 200,
+                              write_ratio: float = 0.3, users: int = 20, seed: int = 42) -> Dict:
+    """
+    Mixed reads (get_daily_entries) and inserts (add_daily_entry) across threads
+
+    Returns:
+        Throughput, latency percentiles per operation and failed operation count
+    """
+    today = datetime.now().strftime('%Y-%m-%d')
+    user_ids = [db.create_user(f"bench{i}_{time.time_ns()}@example.com", "bench123", f"Bench {i}") for i in range(users)]
+    latencies = {"read": [], "write": []}
+    failures = [0]
+    lock = threading.Lock()
+
+    def worker(index: int):
+        rng = random.Random(seed + index)
+        local = {"read": [], "write": []}
+        local_failures = 0
+        for _ in range(ops_per_thread):
+            user_id = rng.choice(user_ids)
+            start = time.perf_counter()
+            if rng.random() < write_ratio:
+                ok = db.add_daily_entry(user_id, {
+                    'food': 'Nasi Goreng',
+                    'nutrition': {'calories': '250 kcal', 'protein': '8 g', 'fat': '10 g', 'carbs': '30 g'},
+                    'water': 250,
+                    'date': today
+                })
+                local["write"].append(time.perf_counter() - start)
+                local_failures += 0 if ok else 1
+            else:
+                db.get_daily_entries(user_id, today)
+                local["read"].append(time.perf_counter() - start)
+        with lock:
+            latencies["read"].extend(local["read"])
+            latencies["write"].extend(local["write"])
+            failures[0] += local_failures
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total_ops = threads * ops_per_thread
+    return {
+        "threads": threads,
+        "ops": total_ops,
+        "write_ratio": write_ratio,
+        "seconds": round(elapsed, 3),
+        "ops_per_sec": round(total_ops / elapsed, 1) if elapsed else 0.0,
+        "read": latency_summary(latencies["read"]),
+        "write": latency_summary(latencies["write"]),
+        "failed_ops": failures[0],
+    }
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """'add_daily_entry=0.3,get_daily_entries=0.7' -> weights; unknown operations are rejected"""
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown operation '{name}' (choose from {', '.join(DEFAULT_MIX)})")
+        mix[name] = float(weight)
+    return mix
+
+def run_workload_benchmark(db: NutritionDatabase, users: List[Dict], mix: Optional[Dict[str, float]] = None,
+                           threads: int = 8, ops_per_thread: int = 500, seed: int = 42) -> Dict:
+    """
+    Replay a weighted mix of app operations against a populated database
+
+    Users are picked with the same power-law skew as the generated
+    histories, so the most active users also get the most traffic.
+
+    Args:
+        db: Database (plain or sharded) holding the workload users
+        users: Workload users, most active first (dicts with id and email)
+        mix: Operation name -> relative weight (default DEFAULT_MIX)
+        threads: Worker threads
+        ops_per_thread: Operations each thread runs
+
+    Returns:
+        Throughput and latency percentiles per operation
+    """
+    mix = {name: weight for name, weight in (mix or DEFAULT_MIX).items() if weight > 0}
+    operations, op_weights = list(mix), list(mix.values())
+    user_weights = zipf_weights(len(users), ACTIVITY_EXPONENT)
+    latencies = defaultdict(list)
+    failures = defaultdict(int)
+    lock = threading.Lock()
+    # Entry ids handed to delete workers, fetched outside the timed calls
+    delete_ids = defaultdict(list)
+    handed_out = defaultdict(set)
+
+    def next_delete_id(user_id: int) -> Optional[int]:
+        with lock:
+            if not delete_ids[user_id]:
+                rows = db.query_entries(user_id, columns=['id'], limit=64)
+                delete_ids[user_id] = [row['id'] for row in rows if row['id'] not in handed_out[user_id]]
+            if not delete_ids[user_id]:
+                return None
+            entry_id = delete_ids[user_id].pop()
+            handed_out[user_id].add(entry_id)
+            return entry_id
+
+    # Built up front: the generator silences the nutrition table's logging, which is not thread-safe
+    generators = [WorkloadGenerator(seed + index, days=7) for index in range(threads)]
+
+    def worker(index: int):
+        rng = random.Random(seed + index)
+        generator = generators[index]
+        today = datetime.now()
+        local = defaultdict(list)
+        local_failures = defaultdict(int)
+        for _ in range(ops_per_thread):
+            operation = rng.choices(operations, op_weights)[0]
+            user = rng.choices(users, user_weights)[0]
+            user_id = user['id']
+            if operation == "add_daily_entry":
+                entry = generator.entry(today.strftime('%Y-%m-%d'))
+                start = time.perf_counter()
+                ok = db.add_daily_entry(user_id, entry)
+            elif operation == "get_daily_entries":
+                date = (today - timedelta(days=int(7 * rng.random() ** 2))).strftime('%Y-%m-%d')
+                start = time.perf_counter()
+                ok = db.get_daily_entries(user_id, date) is not None
+            elif operation == "get_user_summary":
+                start_date = (today - timedelta(days=30)).strftime('%Y-%m-%d')
+                start = time.perf_counter()
+                ok = bool(db.get_user_summary(user_id, start_date, today.strftime('%Y-%m-%d')))
+            elif operation == "delete_entry":
+                entry_id = next_delete_id(user_id)
+                if entry_id is None:
+                    continue
+                start = time.perf_counter()
+                ok = db.delete_entry(user_id, entry_id)
+            else:
+                start = time.perf_counter()
+                ok = db.authenticate_user(user['email'], WORKLOAD_PASSWORD) is not None
+            local[operation].append(time.perf_counter() - start)
+            local_failures[operation] += 0 if ok else 1
+        with lock:
+            for operation, values in local.items():
+                latencies[operation].extend(values)
+            for operation, count in local_failures.items():
+                failures[operation] += count
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total_ops = sum(len(values) for values in latencies.values())
+    result = {
+        "threads": threads,
+        "ops": total_ops,
+        "users": len(users),
+        "mix": mix,
+        "seconds": round(elapsed, 3),
+        "ops_per_sec": round(total_ops / elapsed, 1) if elapsed else 0.0,
+        "operations": {},
+    }
+    for operation in operations:
+        summary = latency_summary(latencies[operation])
+        summary["ops_per_sec"] = round(summary["count"] / elapsed, 1) if elapsed else 0.0
+        summary["failed"] = failures[operation]
+        result["operations"][operation] = summary
+    return result
+
+def compare_results(result: Dict, baseline: Dict) -> Dict:
+    """Percent change of throughput and p50/p99 latency per operation against a saved run"""
+    def change(new, old):
+        return round((new - old) / old * 100, 1) if old else None
+
+    comparison = {"ops_per_sec_pct": change(result["ops_per_sec"], baseline.get("ops_per_sec", 0))}
+    for operation, summary in result["operations"].items():
+        old = baseline.get("operations", {}).get(operation)
+        if old:
+            comparison[operation] = {key + "_pct": change(summary[key], old[key]) for key in ("ops_per_sec", "p50_ms", "p99_ms")}
+    return comparison
+
+def workload_command(args):
+    mix = args.mix or DEFAULT_MIX
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "workload.db")
+        with redirect_stdout(io.StringIO()):
+            if args.shards > 1:
+                db = ShardedNutritionDatabase(db_path, args.shards, cache=args.cache, write_behind=args.write_behind)
+            else:
+                db = NutritionDatabase(db_path, cache=args.cache, write_behind=args.write_behind)
+            generated = None
+            users = workload_users(db)
+            if not users:
+                generated = populate(db, args.users, args.entries, args.days, args.seed)
+                users = workload_users(db)
+            result = run_workload_benchmark(db, users, mix, args.threads, args.ops, args.seed)
+            result["write_behind"] = db.get_write_metrics() or None
+            db.close()
+
+    result["dataset"] = generated or {"db": args.db, "users": len(users)}
+    result["shards"] = args.shards
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            result["vs_baseline"] = compare_results(result, json.load(f))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+
+def concurrency_command(args):
+    results = {}
+    modes = [("pooled_wal", NutritionDatabase, {})]
+    if args.write_behind:
+        modes.append(("pooled_wal_write_behind", NutritionDatabase, {"write_behind": True}))
+    if args.compare:
+        modes.append(("unpooled_rollback_journal", UnpooledDatabase, {}))
+
+    for name, db_class, options in modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            # Database methods log every call; keep the report readable
+            with redirect_stdout(io.StringIO()):
+                # Measure the database itself, not the query cache
+                db = db_class(os.path.join(tmp, "bench.db"), cache=False, **options)
+                results[name] = run_concurrency_benchmark(
+                    db, args.threads, args.ops, args.write_ratio, args.users, args.seed
+                )
+                results[name]["write_behind"] = db.get_write_metrics() or None
+                db.close()
+
+    print(json.dumps(results, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description="NutritionDatabase benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    concurrency = commands.add_parser("concurrency", help="Mixed reads and inserts across threads")
+    concurrency.add_argument("--threads", type=int, default=8)
+    concurrency.add_argument("--ops", type=int, default=200, help="Operations per thread")
+    concurrency.add_argument("--write-ratio", type=float, default=0.3)
+    concurrency.add_argument("--users", type=int, default=20)
+    concurrency.add_argument("--seed", type=int, default=42)
+    concurrency.add_argument("--compare", action="store_true", help="Also run the unpooled rollback-journal baseline")
+    concurrency.add_argument("--write-behind", action="store_true", help="Also run with the write-behind queue enabled")
+    concurrency.set_defaults(func=concurrency_command)
+
+    workload = commands.add_parser("workload", help="Replay an app operation mix over a power-law dataset")
+    workload.add_argument("--db", help="Database with workload.py users (default: generate into a temp file)")
+    workload.add_argument("--users", type=int, default=200, help="Users to generate")
+    workload.add_argument("--entries", type=int, default=60, help="Mean entries per generated user")
+    workload.add_argument("--days", type=int, default=DEFAULT_DAYS, help="Days of generated history")
+    workload.add_argument("--threads", type=int, default=8)
+    workload.add_argument("--ops", type=int, default=500, help="Operations per thread")
+    workload.add_argument("--mix", type=parse_mix, help="Operation weights, e.g. add_daily_entry=0.3,get_daily_entries=0.7")
+    workload.add_argument("--seed", type=int, default=42)
+    workload.add_argument("--shards", type=int, default=1, help="Use the sharded database with this many shards")
+    workload.add_argument("--cache", action="store_true", help="Enable the query cache")
+    workload.add_argument("--write-behind", action="store_true", help="Enable the write-behind queue")
+    workload.add_argument("--output", help="Also write the JSON report to this file")
+    workload.add_argument("--baseline", help="Earlier JSON report to compare against")
+    workload.set_defaults(func=workload_command)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
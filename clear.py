@@ -41,6 +41,9 @@ def clear_database(db_path="nutrition.db"):
         
         # Commit perubahan
         conn.commit()
+        
+        # Kembalikan halaman kosong ke filesystem; tanpa VACUUM ukuran file tidak berkurang
+        conn.execute("VACUUM")
         conn.close()
         
         # Tampilkan hasil
@@ -2,78 +2,1009 @@
 import sqlite3
 import json
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Hashable, Iterable, Iterator
+import atexit
+import base64
 import hashlib
 import os
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from itertools import islice
+
+from nutrition_codec import NutritionCodec
+from nutrition_parser import parse_quantity
+
+# History pages are capped so a single request stays cheap
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Query cache lifetimes in seconds. Writes through this object invalidate
+# profiles and entries at once; the TTLs only bound staleness from other
+# processes (importer, maintenance scripts) and for the global stats.
+PROFILE_CACHE_TTL = 300
+ENTRIES_CACHE_TTL = 60
+STATS_CACHE_TTL = 30
+
+# Write-behind mode: queued inserts are grouped into one transaction per flush interval
+WRITE_QUEUE_SIZE = 1000
+WRITE_FLUSH_INTERVAL = 0.005    # seconds to wait for more rows after the first
+WRITE_MAX_BATCH = 500
+READ_YOUR_WRITES_TIMEOUT = 5.0
+
+# Login telemetry (last_login, login_count) is buffered and written in one transaction per interval
+LOGIN_FLUSH_INTERVAL = 10.0
+
+LOGIN_FLUSH_SQL = '''
+UPDATE users
+SET last_login = MAX(COALESCE(last_login, ''), ?), login_count = COALESCE(login_count, 0) + ?
+WHERE id = ?
+'''
+
+# Large deletes run as many short transactions
+PURGE_BATCH_SIZE = 2000         # rows per transaction when deleting a user's entries
+PURGE_BATCH_PAUSE = 0.01        # seconds between those transactions, so other writers get the lock
+
+# Connection tuning (applied to every pooled connection)
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KB = 16384           # page cache per connection
+MMAP_SIZE = 128 * 1024 * 1024   # memory-mapped reads
+
+# WAL lets readers proceed while another session writes. auto_vacuum only takes
+# effect on a new file (or after one VACUUM, see maintenance.py enable-incremental);
+# freed pages are then returned by PRAGMA incremental_vacuum instead of piling up.
+CONNECTION_PRAGMAS = [
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    f"PRAGMA cache_size=-{CACHE_SIZE_KB}",
+    f"PRAGMA mmap_size={MMAP_SIZE}",
+    "PRAGMA temp_store=MEMORY",
+]
+
+# Index set for daily_entries, shaped after the hot queries:
+# - idx_user_timeline serves every per-user read in (date, created_at, id) order: a day's
+#   entries, full history, keyset pages and per-user deletes, without a temp sort
+# - idx_entries_date answers MIN(date)/MAX(date) in get_database_stats with one seek each
+# Per-day sums come from daily_totals (PRIMARY KEY (user_id, date)), not from entry scans.
+ENTRY_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_user_timeline ON daily_entries(user_id, date, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_entries_date ON daily_entries(date)',
+]
+
+# Both are prefixes of idx_user_timeline and only cost write amplification
+OBSOLETE_INDEXES = ('idx_user_id', 'idx_user_date')
+
+# Shared by single and bulk inserts so SQLite reuses one prepared statement
+INSERT_ENTRY_SQL = '''
+INSERT INTO daily_entries 
+(user_id, date, food_name, portion, calories, protein, fat, carbs, fiber, sugar, sodium,
+ water_ml, exercise_min, nutrition_data, source, prediction_confidence, nutrition_blob)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Nutrients stored only as numeric columns besides the daily_totals macros
+EXTRA_NUTRIENTS = ('fiber', 'sugar', 'sodium')
+
+# Rollup of daily_entries per (user_id, date); the triggers keep it exact for inserts,
+# deletes and updates in the writer's own transaction
+DAILY_TOTALS_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS daily_totals (
+        user_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        entry_count INTEGER NOT NULL DEFAULT 0,
+        calories REAL NOT NULL DEFAULT 0,
+        protein REAL NOT NULL DEFAULT 0,
+        fat REAL NOT NULL DEFAULT 0,
+        carbs REAL NOT NULL DEFAULT 0,
+        water INTEGER NOT NULL DEFAULT 0,
+        exercise INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, date)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_daily_totals_insert AFTER INSERT ON daily_entries
+    BEGIN
+        INSERT INTO daily_totals (user_id, date, entry_count, calories, protein, fat, carbs, water, exercise)
+        VALUES (NEW.user_id, NEW.date, 1, COALESCE(NEW.calories, 0), COALESCE(NEW.protein, 0),
+                COALESCE(NEW.fat, 0), COALESCE(NEW.carbs, 0), COALESCE(NEW.water_ml, 0), COALESCE(NEW.exercise_min, 0))
+        ON CONFLICT (user_id, date) DO UPDATE SET
+            entry_count = entry_count + 1,
+            calories = calories + excluded.calories,
+            protein = protein + excluded.protein,
+            fat = fat + excluded.fat,
+            carbs = carbs + excluded.carbs,
+            water = water + excluded.water,
+            exercise = exercise + excluded.exercise;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_daily_totals_delete AFTER DELETE ON daily_entries
+    BEGIN
+        UPDATE daily_totals SET
+            entry_count = entry_count - 1,
+            calories = calories - COALESCE(OLD.calories, 0),
+            protein = protein - COALESCE(OLD.protein, 0),
+            fat = fat - COALESCE(OLD.fat, 0),
+            carbs = carbs - COALESCE(OLD.carbs, 0),
+            water = water - COALESCE(OLD.water_ml, 0),
+            exercise = exercise - COALESCE(OLD.exercise_min, 0)
+        WHERE user_id = OLD.user_id AND date = OLD.date;
+        DELETE FROM daily_totals WHERE user_id = OLD.user_id AND date = OLD.date AND entry_count <= 0;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_daily_totals_update
+    AFTER UPDATE OF user_id, date, calories, protein, fat, carbs, water_ml, exercise_min ON daily_entries
+    BEGIN
+        UPDATE daily_totals SET
+            entry_count = entry_count - 1,
+            calories = calories - COALESCE(OLD.calories, 0),
+            protein = protein - COALESCE(OLD.protein, 0),
+            fat = fat - COALESCE(OLD.fat, 0),
+            carbs = carbs - COALESCE(OLD.carbs, 0),
+            water = water - COALESCE(OLD.water_ml, 0),
+            exercise = exercise - COALESCE(OLD.exercise_min, 0)
+        WHERE user_id = OLD.user_id AND date = OLD.date;
+        DELETE FROM daily_totals WHERE user_id = OLD.user_id AND date = OLD.date AND entry_count <= 0;
+        INSERT INTO daily_totals (user_id, date, entry_count, calories, protein, fat, carbs, water, exercise)
+        VALUES (NEW.user_id, NEW.date, 1, COALESCE(NEW.calories, 0), COALESCE(NEW.protein, 0),
+                COALESCE(NEW.fat, 0), COALESCE(NEW.carbs, 0), COALESCE(NEW.water_ml, 0), COALESCE(NEW.exercise_min, 0))
+        ON CONFLICT (user_id, date) DO UPDATE SET
+            entry_count = entry_count + 1,
+            calories = calories + excluded.calories,
+            protein = protein + excluded.protein,
+            fat = fat + excluded.fat,
+            carbs = carbs + excluded.carbs,
+            water = water + excluded.water,
+            exercise = exercise + excluded.exercise;
+    END
+    ''',
+]
+
+REBUILD_DAILY_TOTALS_SQL = '''
+INSERT INTO daily_totals (user_id, date, entry_count, calories, protein, fat, carbs, water, exercise)
+SELECT user_id, date, COUNT(*), TOTAL(calories), TOTAL(protein), TOTAL(fat), TOTAL(carbs),
+       TOTAL(water_ml), TOTAL(exercise_min)
+FROM daily_entries
+GROUP BY user_id, date
+'''
+
+# One-row running counts, so get_database_stats reads totals instead of scanning
+# users and daily_totals; kept exact by triggers in the writer's own transaction
+ROW_COUNTS_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS row_counts (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        users INTEGER NOT NULL DEFAULT 0,
+        entries INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_row_counts_user_insert AFTER INSERT ON users
+    BEGIN
+        UPDATE row_counts SET users = users + 1 WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_row_counts_user_delete AFTER DELETE ON users
+    BEGIN
+        UPDATE row_counts SET users = users - 1 WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_row_counts_entry_insert AFTER INSERT ON daily_entries
+    BEGIN
+        UPDATE row_counts SET entries = entries + 1 WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_row_counts_entry_delete AFTER DELETE ON daily_entries
+    BEGIN
+        UPDATE row_counts SET entries = entries - 1 WHERE id = 1;
+    END
+    ''',
+]
+
+REBUILD_ROW_COUNTS_SQL = '''
+INSERT INTO row_counts (id, users, entries)
+VALUES (1, (SELECT COUNT(*) FROM users), (SELECT COUNT(*) FROM daily_entries))
+ON CONFLICT (id) DO UPDATE SET users = excluded.users, entries = excluded.entries
+'''
+
+# Rows present on only one side, or whose sums drift by more than rounding noise
+CHECK_DAILY_TOTALS_SQL = '''
+WITH live AS (
+    SELECT user_id, date, COUNT(*) AS entry_count, TOTAL(calories) AS calories, TOTAL(protein) AS protein,
+           TOTAL(fat) AS fat, TOTAL(carbs) AS carbs, TOTAL(water_ml) AS water, TOTAL(exercise_min) AS exercise
+    FROM daily_entries
+    GROUP BY user_id, date
+)
+SELECT COALESCE(l.user_id, t.user_id) AS user_id, COALESCE(l.date, t.date) AS date,
+       l.entry_count AS live_count, t.entry_count AS rollup_count,
+       l.calories AS live_calories, t.calories AS rollup_calories
+FROM live l LEFT JOIN daily_totals t ON t.user_id = l.user_id AND t.date = l.date
+WHERE t.user_id IS NULL
+   OR l.entry_count != t.entry_count
+   OR ABS(l.calories - t.calories) > 0.01 OR ABS(l.protein - t.protein) > 0.01
+   OR ABS(l.fat - t.fat) > 0.01 OR ABS(l.carbs - t.carbs) > 0.01
+   OR l.water != t.water OR l.exercise != t.exercise
+UNION ALL
+SELECT t.user_id, t.date, NULL, t.entry_count, NULL, t.calories
+FROM daily_totals t
+WHERE NOT EXISTS (SELECT 1 FROM daily_entries e WHERE e.user_id = t.user_id AND e.date = t.date)
+'''
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections shared by all threads"""
+    
+    def __init__(self, factory, max_size: int = 8, timeout: float = 30.0):
+        self.factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._connections = []
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; uncommitted work is rolled back when it is returned"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError("Timed out waiting for a pooled database connection")
+        
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self.factory()
+                with self._lock:
+                    self._connections.append(conn)
+            yield conn
+        finally:
+            if conn is not None:
+                try:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    self._idle.put(conn)
+                except sqlite3.Error:
+                    # Broken connection: drop it, a fresh one is opened on demand
+                    with self._lock:
+                        if conn in self._connections:
+                            self._connections.remove(conn)
+            self._slots.release()
+    
+    def size(self) -> int:
+        """Number of open connections"""
+        with self._lock:
+            return len(self._connections)
+    
+    def close_all(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+
+# ===== SCHEMA MIGRATIONS =====
+# Each migration runs in its own transaction and bumps PRAGMA user_version.
+# Append new steps; never edit one that has shipped.
+BACKFILL_BATCH_SIZE = 5000
+BACKFILL_BATCH_PAUSE = 0.01     # seconds between back-fill transactions, so waiting writers get the lock
+
+# Where a batched back-fill got to, so a restarted migration resumes instead of starting over
+MIGRATION_PROGRESS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS migration_progress (
+    version INTEGER PRIMARY KEY,
+    last_id INTEGER NOT NULL
+)
+'''
+
+def migrate_v1_baseline(conn):
+    """Original users/daily_entries schema (no-op on databases created before versioning)"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        name TEXT NOT NULL,
+        weight REAL DEFAULT 65.0,
+        height REAL DEFAULT 170.0,
+        age INTEGER DEFAULT 25,
+        activity_level TEXT DEFAULT 'medium',
+        goal TEXT DEFAULT 'maintain',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_login TIMESTAMP
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS daily_entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        food_name TEXT NOT NULL,
+        portion TEXT DEFAULT 'Normal',
+        calories REAL DEFAULT 0,
+        protein REAL DEFAULT 0,
+        fat REAL DEFAULT 0,
+        carbs REAL DEFAULT 0,
+        water_ml INTEGER DEFAULT 0,
+        exercise_min INTEGER DEFAULT 0,
+        nutrition_data TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_user_date ON daily_entries(user_id, date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_user_id ON daily_entries(user_id)')
+
+def migrate_v2_daily_totals(conn):
+    """Per-user per-day rollup, kept in sync by triggers in the same transaction"""
+    for statement in DAILY_TOTALS_SCHEMA:
+        conn.execute(statement)
+    conn.execute("DELETE FROM daily_totals")
+    conn.execute(REBUILD_DAILY_TOTALS_SQL)
+
+def migrate_v3_indexes(conn):
+    """Index set shaped after the hot queries (see query_plans.py)"""
+    for statement in ENTRY_INDEXES:
+        conn.execute(statement)
+    for name in OBSOLETE_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+def add_column(conn, table: str, column: str, definition: str):
+    """ALTER TABLE ADD COLUMN unless the column already exists"""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in existing:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def migrate_v4_extra_nutrients(conn):
+    """Promote fiber, sugar and sodium from the nutrition JSON to REAL columns"""
+    for column in EXTRA_NUTRIENTS:
+        add_column(conn, 'daily_entries', column, 'REAL DEFAULT 0')
+    conn.execute(MIGRATION_PROGRESS_SCHEMA)
+    conn.commit()
+    
+    # Walk the table in id order. Each batch is read and parsed outside any
+    # transaction (WAL readers don't block writers), then written in one short
+    # write transaction, so other connections get the lock in between;
+    # migration_progress records the last id done. The final (empty) batch is
+    # left open for apply_migrations to bump user_version in the same commit.
+    updated = 0
+    while True:
+        marker = conn.execute("SELECT last_id FROM migration_progress WHERE version = 4").fetchone()
+        last_id = marker[0] if marker else 0
+        rows = conn.execute(
+            "SELECT id, nutrition_data FROM daily_entries WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, BACKFILL_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM migration_progress WHERE version = 4")
+            break
+        nutritions = []
+        for row in rows:
+            try:
+                nutrition = json.loads(row[1]) if row[1] else {}
+            except (TypeError, ValueError):
+                nutrition = {}
+            nutritions.append(nutrition if isinstance(nutrition, dict) else {})
+        columns = [extract_numbers([n.get(field, 0) for n in nutritions]) for field in EXTRA_NUTRIENTS]
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            "UPDATE daily_entries SET fiber = ?, sugar = ?, sodium = ? WHERE id = ?",
+            [(columns[0][i], columns[1][i], columns[2][i], row[0]) for i, row in enumerate(rows)]
+        )
+        conn.execute('''
+        INSERT INTO migration_progress (version, last_id) VALUES (4, ?)
+        ON CONFLICT (version) DO UPDATE SET last_id = excluded.last_id
+        ''', (rows[-1][0],))
+        conn.commit()
+        updated += len(rows)
+        time.sleep(BACKFILL_BATCH_PAUSE)
+        print(f"   … back-filled {updated} entries", end="\r")
+    if updated:
+        print()
+
+def migrate_v5_entry_source(conn):
+    """Keep where an entry came from and the classifier confidence for photo entries"""
+    add_column(conn, 'daily_entries', 'source', 'TEXT')
+    add_column(conn, 'daily_entries', 'prediction_confidence', 'REAL')
+
+def migrate_v6_compact_nutrition(conn):
+    """Binary nutrition encoding (see nutrition_codec.py); existing rows convert online via compact-nutrition"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS nutrition_notes (
+        id INTEGER PRIMARY KEY,
+        text TEXT NOT NULL UNIQUE
+    )
+    ''')
+    add_column(conn, 'daily_entries', 'nutrition_blob', 'BLOB')
+
+def migrate_v7_login_count(conn):
+    """Number of successful logins, counted from this version on (see LoginRecorder)"""
+    add_column(conn, 'users', 'login_count', 'INTEGER DEFAULT 0')
+
+def migrate_v8_row_counts(conn):
+    """Trigger-maintained user and entry counts for get_database_stats (counted once here)"""
+    for statement in ROW_COUNTS_SCHEMA:
+        conn.execute(statement)
+    conn.execute(REBUILD_ROW_COUNTS_SQL)
+
+MIGRATIONS = [
+    (1, "baseline schema", migrate_v1_baseline),
+    (2, "daily_totals rollup", migrate_v2_daily_totals),
+    (3, "entry index redesign", migrate_v3_indexes),
+    (4, "fiber/sugar/sodium columns", migrate_v4_extra_nutrients),
+    (5, "entry source and prediction confidence", migrate_v5_entry_source),
+    (6, "compact nutrition encoding", migrate_v6_compact_nutrition),
+    (7, "login counter", migrate_v7_login_count),
+    (8, "row counters", migrate_v8_row_counts),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def apply_migrations(conn) -> int:
+    """
+    Bring a sqlite3 connection's database up to SCHEMA_VERSION; returns the number of steps run
+    
+    Each step starts inside BEGIN IMMEDIATE. Long steps may commit in batches
+    (see migrate_v4_extra_nutrients) as long as they can resume after a crash;
+    user_version is only bumped, and committed, once the step returns.
+    """
+    applied = 0
+    for version, description, migrate in MIGRATIONS:
+        # BEGIN IMMEDIATE serializes concurrent starters; re-read the version under the lock
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+            conn.rollback()
+            continue
+        start = time.perf_counter()
+        migrate(conn)
+        conn.execute(f"PRAGMA user_version = {version}")
+        conn.commit()
+        applied += 1
+        print(f"✅ Migrated database to v{version} ({description}) in {time.perf_counter() - start:.2f}s")
+    return applied
+
+MISSING = object()
+
+class QueryCache:
+    """
+    Thread-safe LRU cache of query results, grouped by namespace and user.
+
+    Every (namespace, user) scope has a version that invalidation bumps; a
+    result read before a concurrent write committed carries the old version
+    and is dropped instead of being cached.
+    """
+    
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # (namespace, user_id, key) -> (expires_at, value)
+        self._versions = defaultdict(int)
+        self._lock = threading.Lock()
+        self._hits = defaultdict(int)
+        self._misses = defaultdict(int)
+    
+    def _version(self, namespace: str, user_id) -> tuple:
+        return (self._versions[(namespace, None)], self._versions[(namespace, user_id)])
+    
+    def lookup(self, namespace: str, user_id, key=None):
+        """Return (value or MISSING, version to pass to store)"""
+        with self._lock:
+            item = self._data.get((namespace, user_id, key))
+            if item is not None and item[0] > time.monotonic():
+                self._data.move_to_end((namespace, user_id, key))
+                self._hits[namespace] += 1
+                return item[1], None
+            if item is not None:
+                del self._data[(namespace, user_id, key)]
+            self._misses[namespace] += 1
+            return MISSING, self._version(namespace, user_id)
+    
+    def store(self, namespace: str, user_id, key, value, ttl: float, version: tuple):
+        with self._lock:
+            if version != self._version(namespace, user_id):
+                return
+            self._data[(namespace, user_id, key)] = (time.monotonic() + ttl, value)
+            self._data.move_to_end((namespace, user_id, key))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+    
+    def invalidate(self, namespace: str, user_id=None):
+        """Drop one user's results in namespace, or the whole namespace when user_id is None"""
+        with self._lock:
+            self._versions[(namespace, user_id)] += 1
+            for cache_key in [k for k in self._data if k[0] == namespace and (user_id is None or k[1] == user_id)]:
+                del self._data[cache_key]
+    
+    def get_stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            stats = {}
+            for namespace in sorted(set(self._hits) | set(self._misses)):
+                hits, misses = self._hits[namespace], self._misses[namespace]
+                stats[namespace] = {
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                    'entries': sum(1 for k in self._data if k[0] == namespace),
+                }
+            return stats
+
+class WriteBehindWriter:
+    """
+    Background thread that commits queued entry inserts in groups.
+
+    add_daily_entry returns as soon as its row is queued; the writer takes the
+    first waiting row, collects whatever else arrives within flush_interval and
+    commits them in one transaction. Readers call wait_for_user to see their
+    own queued rows (read-your-writes).
+    """
+    
+    def __init__(self, db, max_queue: int = WRITE_QUEUE_SIZE, flush_interval: float = WRITE_FLUSH_INTERVAL,
+                 max_batch: int = WRITE_MAX_BATCH, submit_timeout: float = 1.0):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.submit_timeout = submit_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._cond = threading.Condition()
+        self._pending = defaultdict(int)   # user_id -> queued, not yet committed rows
+        self._pending_total = 0
+        self._commit_latencies = deque(maxlen=1000)
+        self._queue_latencies = deque(maxlen=1000)
+        self._stats = {'submitted': 0, 'committed': 0, 'failed': 0, 'rejected': 0, 'batches': 0}
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="nutrition-db-writer", daemon=True)
+        self._thread.start()
+    
+    def submit(self, row: tuple) -> bool:
+        """Queue an INSERT_ENTRY_SQL row; False if the writer is stopped or the queue stays full"""
+        if self._stopped:
+            return False
+        user_id = row[0]
+        with self._cond:
+            self._pending[user_id] += 1
+            self._pending_total += 1
+        try:
+            self._queue.put((row, time.perf_counter()), timeout=self.submit_timeout)
+        except queue.Full:
+            with self._cond:
+                self._release([user_id])
+                self._stats['rejected'] += 1
+            return False
+        with self._cond:
+            self._stats['submitted'] += 1
+        return True
+    
+    def _release(self, user_ids: List[int]):
+        # Caller holds self._cond
+        for user_id in user_ids:
+            self._pending[user_id] -= 1
+            if self._pending[user_id] <= 0:
+                del self._pending[user_id]
+            self._pending_total -= 1
+        self._cond.notify_all()
+    
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.perf_counter() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+    
+    def _commit(self, batch: List[tuple]):
+        rows = [row for row, _ in batch]
+        start = time.perf_counter()
+        failed = 0
+        try:
+            with self.db.connection() as conn:
+                conn.executemany(INSERT_ENTRY_SQL, rows)
+                conn.commit()
+        except Exception as e:
+            # Retry row by row so one bad entry does not drop the whole group
+            print(f"⚠️ Write-behind batch of {len(rows)} failed ({e}), retrying rows individually")
+            for row in rows:
+                try:
+                    with self.db.connection() as conn:
+                        conn.execute(INSERT_ENTRY_SQL, row)
+                        conn.commit()
+                except Exception as row_error:
+                    failed += 1
+                    print(f"❌ Write-behind insert failed for user {row[0]}: {row_error}")
+        done = time.perf_counter()
+        
+        # Invalidate before releasing waiters so they never read a stale cache
+        for user_id in {row[0] for row in rows}:
+            self.db.invalidate('entries', user_id)
+        
+        with self._cond:
+            self._commit_latencies.append(done - start)
+            self._queue_latencies.extend(done - submitted for _, submitted in batch)
+            self._stats['batches'] += 1
+            self._stats['committed'] += len(rows) - failed
+            self._stats['failed'] += failed
+            self._release([row[0] for row in rows])
+    
+    def wait_for_user(self, user_id: int, timeout: float = READ_YOUR_WRITES_TIMEOUT) -> bool:
+        """Block until user's queued rows are committed; False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending.get(user_id, 0) == 0, timeout)
+    
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until every queued row is committed; False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending_total == 0, timeout)
+    
+    def stop(self, timeout: float = 10.0):
+        """Flush and stop the writer thread (registered with atexit)"""
+        if self._stopped:
+            return
+        self._stopped = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+        
+        # Rows that raced the stop flag into the queue after the sentinel
+        leftovers = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                leftovers.append(item)
+        if leftovers:
+            self._commit(leftovers)
+        print(f"✅ Write-behind writer stopped ({self._stats['committed']} entries committed)")
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            commit_ms = sorted(value * 1000 for value in self._commit_latencies)
+            queue_ms = sorted(value * 1000 for value in self._queue_latencies)
+            stats = dict(self._stats)
+            stats.update({
+                'queue_depth': self._queue.qsize(),
+                'pending': self._pending_total,
+                'avg_batch_size': round(stats['committed'] / stats['batches'], 1) if stats['batches'] else 0.0,
+                'commit_latency_p50_ms': round(commit_ms[len(commit_ms) // 2], 3) if commit_ms else 0.0,
+                'commit_latency_max_ms': round(commit_ms[-1], 3) if commit_ms else 0.0,
+                'queue_to_commit_p50_ms': round(queue_ms[len(queue_ms) // 2], 3) if queue_ms else 0.0,
+                'queue_to_commit_max_ms': round(queue_ms[-1], 3) if queue_ms else 0.0,
+            })
+            return stats
+
+class LoginRecorder:
+    """
+    Buffers login telemetry so authentication stays a read.
+
+    record() only updates an in-memory map of user_id -> (last login,
+    logins since the last flush); a background thread writes the map in one
+    transaction every flush_interval seconds, and stop() writes whatever is
+    left (registered with atexit and called by close()). The thread starts
+    on the first login, so instances that never authenticate cost nothing.
+    """
+    
+    def __init__(self, connection: Callable, flush_interval: float = LOGIN_FLUSH_INTERVAL):
+        """
+        Args:
+            connection: Callable returning a context manager that yields a sqlite3 connection
+            flush_interval: Seconds between batched writes
+        """
+        self.connection = connection
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending: Dict[int, List] = {}   # user_id -> [last_login, count]
+        self._wake = threading.Event()
+        self._thread = None
+        self._stopped = False
+        self._stats = {'recorded': 0, 'flushed': 0, 'batches': 0, 'failed_batches': 0}
+    
+    def record(self, user_id: int):
+        """Note a successful login now (UTC, same format as CURRENT_TIMESTAMP)"""
+        now = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+        with self._lock:
+            pending = self._pending.setdefault(user_id, [now, 0])
+            pending[0] = now
+            pending[1] += 1
+            self._stats['recorded'] += 1
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name="nutrition-login-recorder", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+        if self._stopped:
+            self.flush()
+    
+    def _run(self):
+        while not self._wake.wait(self.flush_interval):
+            self.flush()
+    
+    def flush(self) -> int:
+        """Write buffered logins now; returns the number of users updated"""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        try:
+            with self.connection() as conn:
+                conn.executemany(LOGIN_FLUSH_SQL, [(last, count, user_id) for user_id, (last, count) in batch.items()])
+                conn.commit()
+        except Exception as e:
+            print(f"❌ Error flushing login telemetry for {len(batch)} users: {e}")
+            # Keep the logins for the next attempt, merged with any recorded meanwhile
+            with self._lock:
+                self._stats['failed_batches'] += 1
+                for user_id, (last, count) in batch.items():
+                    pending = self._pending.setdefault(user_id, [last, 0])
+                    pending[0] = max(pending[0], last)
+                    pending[1] += count
+            return 0
+        with self._lock:
+            self._stats['flushed'] += len(batch)
+            self._stats['batches'] += 1
+        return len(batch)
+    
+    def stop(self):
+        """Stop the flush thread and write what is left"""
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+    
+    def get_metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, pending=len(self._pending))
+
+ENTRY_COLUMNS = (
+    'id', 'user_id', 'date', 'food_name', 'portion', 'calories', 'protein', 'fat', 'carbs',
+    'water_ml', 'exercise_min', 'nutrition_data', 'created_at', 'fiber', 'sugar', 'sodium',
+    'source', 'prediction_confidence', 'nutrition_blob'
+)
+
+# Everything decode_nutrition may read
+NUTRITION_SOURCE_COLUMNS = ('nutrition_data', 'nutrition_blob', 'calories', 'protein', 'fat', 'carbs')
+
+def select_entry_columns(columns: Optional[Iterable[str]] = None) -> List[str]:
+    """Validate a column projection; 'nutrition' pulls in what is needed to decode it"""
+    if columns is None:
+        return list(ENTRY_COLUMNS)
+    
+    select = []
+    for name in columns:
+        needed = NUTRITION_SOURCE_COLUMNS if name == 'nutrition' else (name,)
+        for column in needed:
+            if column not in ENTRY_COLUMNS:
+                raise ValueError(f"Unknown entry column: {column}")
+            if column not in select:
+                select.append(column)
+    return select
+
+def encode_cursor(date: str, created_at: str, entry_id: int) -> str:
+    """Opaque continuation token for the (date, created_at, id) position of the last row of a page"""
+    raw = json.dumps([date, created_at, entry_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token: str) -> tuple:
+    """Inverse of encode_cursor; raises ValueError for tokens it did not produce"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        date, created_at, entry_id = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid page cursor") from None
+    if not isinstance(date, str) or not isinstance(created_at, str) or not isinstance(entry_id, int):
+        raise ValueError("Invalid page cursor")
+    return date, created_at, entry_id
+
+def entry_row(user_id: int, entry_data: Dict[str, Any], codec: Optional[NutritionCodec] = None) -> tuple:
+    """INSERT_ENTRY_SQL parameters for an add_daily_entry dict (nutrition packed by codec, else JSON)"""
+    nutrition = entry_data.get('nutrition', {})
+    blob = codec.encode(nutrition) if codec is not None else None
+    fiber, sugar, sodium = (extract_number(nutrition.get(field, 0)) for field in EXTRA_NUTRIENTS)
+    return (
+        user_id,
+        entry_data.get('date', datetime.now().strftime('%Y-%m-%d')),
+        entry_data.get('food', 'Unknown'),
+        entry_data.get('portion', 'Normal'),
+        extract_number(nutrition.get('calories', '0 kcal')),
+        extract_number(nutrition.get('protein', '0 g')),
+        extract_number(nutrition.get('fat', '0 g')),
+        extract_number(nutrition.get('carbs', '0 g')),
+        fiber, sugar, sodium,
+        entry_data.get('water', 0),
+        entry_data.get('exercise', 0),
+        # Store nutrition data as JSON unless it is packed
+        json.dumps(nutrition) if blob is None else None,
+        entry_data.get('source'),
+        entry_data.get('prediction_confidence'),
+        blob
+    )
+
+def insert_entry_rows(conn, rows: List[tuple]) -> int:
+    """
+    Insert INSERT_ENTRY_SQL rows one at a time, skipping the ones SQLite rejects
+
+    Fallback for a bulk chunk whose executemany failed, so one bad entry does
+    not drop the whole chunk. Runs in the caller's transaction; the caller
+    commits. Returns the number of rows inserted.
+    """
+    inserted = 0
+    for row in rows:
+        try:
+            conn.execute(INSERT_ENTRY_SQL, row)
+            inserted += 1
+        except sqlite3.Error as row_error:
+            print(f"❌ Error inserting entry for user {row[0]}: {row_error}")
+    return inserted
+
+def decode_nutrition(entry, codec: Optional[NutritionCodec] = None) -> Dict[str, Any]:
+    """Nutrition dict of an entry row: packed blob, stored JSON, or rebuilt from the numeric columns"""
+    nutrition_blob = entry.get('nutrition_blob')
+    if nutrition_blob and codec is not None:
+        return codec.decode(nutrition_blob)
+    nutrition_data = entry.get('nutrition_data')
+    if nutrition_data:
+        return json.loads(nutrition_data)
+    return {
+        'calories': f"{entry.get('calories', 0)} kcal",
+        'protein': f"{entry.get('protein', 0)} g",
+        'fat': f"{entry.get('fat', 0)} g",
+        'carbs': f"{entry.get('carbs', 0)} g"
+    }
+
+class EntryRow:
+    """Lightweight daily entry row; nutrition is decoded on first access"""
+    
+    __slots__ = ('_index', '_values', '_nutrition', '_codec')
+    
+    def __init__(self, index: Dict[str, int], values: tuple, codec: Optional[NutritionCodec] = None):
+        self._index = index      # shared by every row of one query
+        self._values = values
+        self._nutrition = None
+        self._codec = codec
+    
+    def __getattr__(self, name):
+        try:
+            return self._values[self._index[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+    
+    def __getitem__(self, key):
+        if key == 'nutrition':
+            return self.nutrition
+        return self._values[self._index[key]]
+    
+    def __contains__(self, key):
+        return key in self._index or (key == 'nutrition' and 'nutrition_data' in self._index)
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    @property
+    def nutrition(self) -> Dict[str, Any]:
+        if self._nutrition is None:
+            self._nutrition = decode_nutrition(self, self._codec)
+        return self._nutrition
+    
+    def keys(self) -> List[str]:
+        return list(self._index)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        entry = dict(zip(self._index, self._values))
+        if 'nutrition_data' in self._index:
+            entry['nutrition'] = self.nutrition
+        # The packed form is storage detail; 'nutrition' carries its content
+        entry.pop('nutrition_blob', None)
+        return entry
+    
+    def __repr__(self):
+        return f"EntryRow({dict(zip(self._index, self._values))})"
 
 class NutritionDatabase:
-    def __init__(self, db_path: str = "nutrition.db"):
-        """Initialize SQLite database"""
+    def __init__(self, db_path: str = "nutrition.db", pool_size: int = 8, cache: bool = True,
+                 write_behind: bool = False, compact_nutrition: bool = False):
+        """
+        Initialize SQLite database
+        
+        Args:
+            db_path: Path to the SQLite file
+            pool_size: Maximum number of connections shared across threads
+            cache: Cache profiles, per-day entries/totals and global stats in memory
+            write_behind: Queue add_daily_entry inserts for a background writer thread
+            compact_nutrition: Store new entries' nutrition in the packed encoding instead of JSON
+                (about 3.5x smaller, but still slower to decode than json.loads)
+        """
         self.db_path = db_path
+        self.pool = ConnectionPool(self.get_connection, max_size=pool_size)
+        self.cache = QueryCache() if cache else None
+        # Reads decode packed rows either way; the flag only picks the format for new rows
+        self.codec = NutritionCodec(self.connection)
+        self.compact_nutrition = compact_nutrition
         self.init_database()
+        self.logins = LoginRecorder(self.connection)
+        self.writer = None
+        if write_behind:
+            self.writer = WriteBehindWriter(self)
+            atexit.register(self.writer.stop)
     
     def get_connection(self):
-        """Get database connection with row factory"""
-        conn = sqlite3.connect(self.db_path)
+        """Open a new database connection with row factory and WAL tuning"""
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
         conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
         return conn
     
+    def connection(self):
+        """Borrow a pooled connection (use as a context manager)"""
+        return self.pool.connection()
+    
+    def close(self):
+        """Flush queued writes and login telemetry, then close pooled connections"""
+        if self.writer is not None:
+            self.writer.stop()
+        self.logins.stop()
+        self.pool.close_all()
+    
+    def sync_user(self, user_id: int):
+        """Read-your-writes: wait until the user's queued entries are committed"""
+        if self.writer is not None and not self.writer.wait_for_user(user_id):
+            print(f"⚠️ Timed out waiting for queued entries of user {user_id}")
+    
+    def get_write_metrics(self) -> Dict[str, Any]:
+        """Write-behind queue depth, batch sizes and commit latency (empty when disabled)"""
+        return self.writer.get_metrics() if self.writer is not None else {}
+    
+    def cached(self, namespace: str, user_id, key, ttl: float, load: Callable[[], Any]):
+        """Return a cached result, or load() it and cache it (None results are not cached)"""
+        if self.cache is None:
+            return load()
+        value, version = self.cache.lookup(namespace, user_id, key)
+        if value is MISSING:
+            value = load()
+            if value is not None:
+                self.cache.store(namespace, user_id, key, value, ttl, version)
+        return value
+    
+    def invalidate(self, namespace: str, user_id=None):
+        if self.cache is not None:
+            self.cache.invalidate(namespace, user_id)
+    
+    def get_cache_stats(self) -> Dict[str, Dict]:
+        """Hits, misses, hit rate and cached results per namespace"""
+        return self.cache.get_stats() if self.cache is not None else {}
+    
     def init_database(self):
-        """Create tables if they don't exist"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Users table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            name TEXT NOT NULL,
-            weight REAL DEFAULT 65.0,
-            height REAL DEFAULT 170.0,
-            age INTEGER DEFAULT 25,
-            activity_level TEXT DEFAULT 'medium',
-            goal TEXT DEFAULT 'maintain',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_login TIMESTAMP
-        )
-        ''')
-        
-        # Daily entries table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS daily_entries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            date TEXT NOT NULL,
-            food_name TEXT NOT NULL,
-            portion TEXT DEFAULT 'Normal',
-            calories REAL DEFAULT 0,
-            protein REAL DEFAULT 0,
-            fat REAL DEFAULT 0,
-            carbs REAL DEFAULT 0,
-            water_ml INTEGER DEFAULT 0,
-            exercise_min INTEGER DEFAULT 0,
-            nutrition_data TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-        ''')
-        
-        # Create indexes for performance
-        cursor.execute('''
-        CREATE INDEX IF NOT EXISTS idx_user_date 
-        ON daily_entries(user_id, date)
-        ''')
-        
-        cursor.execute('''
-        CREATE INDEX IF NOT EXISTS idx_user_id 
-        ON daily_entries(user_id)
-        ''')
-        
-        conn.commit()
-        conn.close()
-        print("✅ Database initialized successfully")
+        """Create the schema or upgrade it to SCHEMA_VERSION"""
+        with self.connection() as conn:
+            apply_migrations(conn)
+            print("✅ Database initialized successfully")
     
     def hash_password(self, password: str) -> str:
         """Hash password using SHA256"""
@@ -83,22 +1014,21 @@ class NutritionDatabase:
     def create_user(self, email: str, password: str, name: str) -> Optional[int]:
         """Create new user and return user_id"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            password_hash = self.hash_password(password)
-            
-            cursor.execute('''
-            INSERT INTO users (email, password_hash, name)
-            VALUES (?, ?, ?)
-            ''', (email, password_hash, name))
-            
-            user_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
-            
-            print(f"✅ User created: {email} (ID: {user_id})")
-            return user_id
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                
+                password_hash = self.hash_password(password)
+                
+                cursor.execute('''
+                INSERT INTO users (email, password_hash, name)
+                VALUES (?, ?, ?)
+                ''', (email, password_hash, name))
+                
+                user_id = cursor.lastrowid
+                conn.commit()
+                
+                print(f"✅ User created: {email} (ID: {user_id})")
+                return user_id
         except sqlite3.IntegrityError:
             print(f"❌ User already exists: {email}")
             return None
@@ -109,56 +1039,53 @@ class NutritionDatabase:
     def authenticate_user(self, email: str, password: str) -> Optional[Dict]:
         """Authenticate user and return user data"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            password_hash = self.hash_password(password)
-            
-            cursor.execute('''
-            SELECT id, email, name, weight, height, age, activity_level, goal
-            FROM users 
-            WHERE email = ? AND password_hash = ?
-            ''', (email, password_hash))
-            
-            user = cursor.fetchone()
-            
-            if user:
-                # Update last login
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                
+                password_hash = self.hash_password(password)
+                
                 cursor.execute('''
-                UPDATE users 
-                SET last_login = CURRENT_TIMESTAMP
-                WHERE id = ?
-                ''', (user['id'],))
-                conn.commit()
+                SELECT id, email, name, weight, height, age, activity_level, goal
+                FROM users 
+                WHERE email = ? AND password_hash = ?
+                ''', (email, password_hash))
                 
-                user_dict = dict(user)
-                conn.close()
-                print(f"✅ User authenticated: {email}")
-                return user_dict
-            
-            conn.close()
-            print(f"❌ Authentication failed for: {email}")
-            return None
+                user = cursor.fetchone()
+                
+                if user:
+                    # last_login/login_count are written later in a batch; no write here
+                    self.logins.record(user['id'])
+                    
+                    user_dict = dict(user)
+                    print(f"✅ User authenticated: {email}")
+                    return user_dict
+                
+                print(f"❌ Authentication failed for: {email}")
+                return None
         except Exception as e:
             print(f"❌ Error authenticating user: {e}")
             return None
     
     def get_user_profile(self, user_id: int) -> Optional[Dict]:
-        """Get user profile by ID"""
+        """Get user profile by ID (cached until the profile is updated)"""
+        profile = self.cached('profile', user_id, None, PROFILE_CACHE_TTL, lambda: self.load_user_profile(user_id))
+        return dict(profile) if profile else None
+    
+    def load_user_profile(self, user_id: int) -> Optional[Dict]:
+        """Read user profile from the database"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-            SELECT id, email, name, weight, height, age, activity_level, goal
-            FROM users 
-            WHERE id = ?
-            ''', (user_id,))
-            
-            user = cursor.fetchone()
-            conn.close()
-            
-            return dict(user) if user else None
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                SELECT id, email, name, weight, height, age, activity_level, goal
+                FROM users 
+                WHERE id = ?
+                ''', (user_id,))
+                
+                user = cursor.fetchone()
+                
+                return dict(user) if user else None
         except Exception as e:
             print(f"❌ Error getting user profile: {e}")
             return None
@@ -166,32 +1093,32 @@ class NutritionDatabase:
     def update_user_profile(self, user_id: int, **kwargs) -> bool:
         """Update user profile fields"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            allowed_fields = ['name', 'weight', 'height', 'age', 'activity_level', 'goal']
-            updates = []
-            values = []
-            
-            for field, value in kwargs.items():
-                if field in allowed_fields:
-                    updates.append(f"{field} = ?")
-                    values.append(value)
-            
-            if not updates:
-                return False
-            
-            values.append(user_id)
-            query = f"UPDATE users SET {', '.join(updates)} WHERE id = ?"
-            
-            cursor.execute(query, values)
-            conn.commit()
-            conn.close()
-            
-            success = cursor.rowcount > 0
-            if success:
-                print(f"✅ Profile updated for user ID: {user_id}")
-            return success
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                
+                allowed_fields = ['name', 'weight', 'height', 'age', 'activity_level', 'goal']
+                updates = []
+                values = []
+                
+                for field, value in kwargs.items():
+                    if field in allowed_fields:
+                        updates.append(f"{field} = ?")
+                        values.append(value)
+                
+                if not updates:
+                    return False
+                
+                values.append(user_id)
+                query = f"UPDATE users SET {', '.join(updates)} WHERE id = ?"
+                
+                cursor.execute(query, values)
+                conn.commit()
+                
+                success = cursor.rowcount > 0
+                self.invalidate('profile', user_id)
+                if success:
+                    print(f"✅ Profile updated for user ID: {user_id}")
+                return success
         except Exception as e:
             print(f"❌ Error updating profile: {e}")
             return False
@@ -199,236 +1126,627 @@ class NutritionDatabase:
     def user_exists(self, email: str) -> bool:
         """Check if user with email exists"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT 1 FROM users WHERE email = ?', (email,))
-            exists = cursor.fetchone() is not None
-            conn.close()
-            
-            return exists
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('SELECT 1 FROM users WHERE email = ?', (email,))
+                exists = cursor.fetchone() is not None
+                
+                return exists
         except Exception as e:
             print(f"❌ Error checking user existence: {e}")
             return False
     
     # ===== DAILY ENTRIES MANAGEMENT =====
     def add_daily_entry(self, user_id: int, entry_data: Dict[str, Any]) -> bool:
-        """Add a new daily entry for user"""
+        """Add a new daily entry for user (queued for the writer thread in write-behind mode)"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            # Extract data
-            date = entry_data.get('date', datetime.now().strftime('%Y-%m-%d'))
-            food_name = entry_data.get('food', 'Unknown')
-            portion = entry_data.get('portion', 'Normal')
-            
-            nutrition = entry_data.get('nutrition', {})
-            calories = extract_number(nutrition.get('calories', '0 kcal'))
-            protein = extract_number(nutrition.get('protein', '0 g'))
-            fat = extract_number(nutrition.get('fat', '0 g'))
-            carbs = extract_number(nutrition.get('carbs', '0 g'))
-            
-            water_ml = entry_data.get('water', 0)
-            exercise_min = entry_data.get('exercise', 0)
-            
-            # Store nutrition data as JSON
-            nutrition_json = json.dumps(nutrition)
+            row = entry_row(user_id, entry_data, self.codec if self.compact_nutrition else None)
+            food_name = row[2]
             
-            cursor.execute('''
-            INSERT INTO daily_entries 
-            (user_id, date, food_name, portion, calories, protein, fat, carbs, water_ml, exercise_min, nutrition_data)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (user_id, date, food_name, portion, calories, protein, fat, carbs, water_ml, exercise_min, nutrition_json))
+            if self.writer is not None and self.writer.submit(row):
+                print(f"✅ Entry queued: {food_name} for user {user_id}")
+                return True
             
-            conn.commit()
-            entry_id = cursor.lastrowid
-            conn.close()
-            
-            print(f"✅ Entry added: {food_name} (ID: {entry_id}) for user {user_id}")
-            return True
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(INSERT_ENTRY_SQL, row)
+                
+                conn.commit()
+                entry_id = cursor.lastrowid
+                self.invalidate('entries', user_id)
+                
+                print(f"✅ Entry added: {food_name} (ID: {entry_id}) for user {user_id}")
+                return True
         except Exception as e:
             print(f"❌ Error adding daily entry: {e}")
             return False
     
-    def get_daily_entries(self, user_id: int, date: Optional[str] = None) -> List[Dict]:
-        """Get daily entries for user, optionally filtered by date"""
-        try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
+    def add_daily_entries_bulk(self, entries: Iterable[Dict[str, Any]], user_id: Optional[int] = None,
+                               chunk_size: int = 1000, progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Insert many daily entries with one transaction per chunk
+        
+        Args:
+            entries: Iterable of entry dicts (same shape as add_daily_entry); consumed lazily
+            user_id: Owner of all entries, or None to read 'user_id' from each entry
+            chunk_size: Rows per transaction
+            progress: Optional callback receiving the running stats after each chunk
             
-            if date:
-                cursor.execute('''
-                SELECT * FROM daily_entries 
-                WHERE user_id = ? AND date = ?
-                ORDER BY created_at DESC
-                ''', (user_id, date))
+        Returns:
+            Dictionary with inserted/failed row counts, seconds and rows_per_sec
+        """
+        stats = {'inserted': 0, 'failed': 0, 'chunks': 0, 'seconds': 0.0, 'rows_per_sec': 0.0}
+        start = time.perf_counter()
+        iterator = iter(entries)
+        default_date = datetime.now().strftime('%Y-%m-%d')
+        
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                break
+            
+            # Nutrient strings are parsed column-wise: each distinct value is parsed once per chunk
+            nutritions = [entry.get('nutrition') or {} for entry in chunk]
+            columns = {
+                field: extract_numbers([nutrition.get(field, 0) for nutrition in nutritions])
+                for field in ('calories', 'protein', 'fat', 'carbs') + EXTRA_NUTRIENTS
+            }
+            if self.compact_nutrition:
+                self.codec.register_notes(n['notes'] for n in nutritions if isinstance(n.get('notes'), str))
+                blobs = [self.codec.encode(nutrition) for nutrition in nutritions]
             else:
-                cursor.execute('''
-                SELECT * FROM daily_entries 
-                WHERE user_id = ?
-                ORDER BY date DESC, created_at DESC
-                ''', (user_id,))
+                blobs = [None] * len(nutritions)
             
-            rows = cursor.fetchall()
-            conn.close()
+            rows = [
+                (
+                    user_id if user_id is not None else entry.get('user_id'),
+                    entry.get('date', default_date),
+                    entry.get('food', 'Unknown'),
+                    entry.get('portion', 'Normal'),
+                    columns['calories'][i],
+                    columns['protein'][i],
+                    columns['fat'][i],
+                    columns['carbs'][i],
+                    columns['fiber'][i],
+                    columns['sugar'][i],
+                    columns['sodium'][i],
+                    entry.get('water', 0),
+                    entry.get('exercise', 0),
+                    json.dumps(nutritions[i]) if blobs[i] is None else None,
+                    entry.get('source'),
+                    entry.get('prediction_confidence'),
+                    blobs[i]
+                )
+                for i, entry in enumerate(chunk)
+            ]
             
-            entries = []
-            for row in rows:
-                entry = dict(row)
-                # Parse JSON nutrition data
-                if entry.get('nutrition_data'):
-                    entry['nutrition'] = json.loads(entry['nutrition_data'])
-                else:
-                    entry['nutrition'] = {
-                        'calories': f"{entry.get('calories', 0)} kcal",
-                        'protein': f"{entry.get('protein', 0)} g",
-                        'fat': f"{entry.get('fat', 0)} g",
-                        'carbs': f"{entry.get('carbs', 0)} g"
-                    }
-                entries.append(entry)
+            try:
+                with self.connection() as conn:
+                    conn.executemany(INSERT_ENTRY_SQL, rows)
+                    conn.commit()
+                stats['inserted'] += len(rows)
+            except Exception as e:
+                # Retry row by row (in one transaction) so one bad entry does not drop the whole chunk
+                print(f"⚠️ Chunk of {len(rows)} entries failed ({e}), retrying rows individually")
+                inserted = 0
+                try:
+                    with self.connection() as conn:
+                        inserted = insert_entry_rows(conn, rows)
+                        conn.commit()
+                except Exception as retry_error:
+                    print(f"❌ Error inserting chunk of {len(rows)} entries: {retry_error}")
+                    inserted = 0
+                stats['inserted'] += inserted
+                stats['failed'] += len(rows) - inserted
             
-            print(f"✅ Retrieved {len(entries)} entries for user {user_id}")
-            return entries
+            self.invalidate('entries')
+            stats['chunks'] += 1
+            stats['seconds'] = time.perf_counter() - start
+            stats['rows_per_sec'] = stats['inserted'] / stats['seconds'] if stats['seconds'] else 0.0
+            if progress:
+                progress(dict(stats))
+        
+        stats['seconds'] = round(time.perf_counter() - start, 3)
+        stats['rows_per_sec'] = round(stats['inserted'] / stats['seconds'], 1) if stats['seconds'] else 0.0
+        print(f"✅ Bulk insert: {stats['inserted']} entries in {stats['seconds']}s ({stats['rows_per_sec']} rows/sec)")
+        return stats
+    
+    def get_daily_entries(self, user_id: int, date: Optional[str] = None) -> List[Dict]:
+        """Get daily entries for user, optionally filtered by date (a single day is cached)"""
+        self.sync_user(user_id)
+        if not date:
+            return self.load_daily_entries(user_id)
+        return list(self.cached('entries', user_id, ('entries', date), ENTRIES_CACHE_TTL,
+                                lambda: self.load_daily_entries(user_id, date)))
+    
+    def load_daily_entries(self, user_id: int, date: Optional[str] = None) -> List[Dict]:
+        """Read daily entries for user from the database"""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                
+                if date:
+                    cursor.execute('''
+                    SELECT * FROM daily_entries 
+                    WHERE user_id = ? AND date = ?
+                    ORDER BY created_at DESC, id DESC
+                    ''', (user_id, date))
+                else:
+                    cursor.execute('''
+                    SELECT * FROM daily_entries 
+                    WHERE user_id = ?
+                    ORDER BY date DESC, created_at DESC, id DESC
+                    ''', (user_id,))
+                
+                rows = cursor.fetchall()
+                
+                entries = []
+                for row in rows:
+                    entry = dict(row)
+                    # Decode packed or JSON nutrition data
+                    entry['nutrition'] = decode_nutrition(entry, self.codec)
+                    entry.pop('nutrition_blob', None)
+                    entries.append(entry)
+                
+                print(f"✅ Retrieved {len(entries)} entries for user {user_id}")
+                return entries
         except Exception as e:
             print(f"❌ Error getting daily entries: {e}")
             return []
     
-    def get_user_summary(self, user_id: int, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict:
-        """Get summary statistics for user"""
-        try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            query = '''
-            SELECT 
-                date,
-                COUNT(*) as entry_count,
-                SUM(calories) as total_calories,
-                SUM(protein) as total_protein,
-                SUM(fat) as total_fat,
-                SUM(carbs) as total_carbs,
-                SUM(water_ml) as total_water,
-                SUM(exercise_min) as total_exercise
-            FROM daily_entries 
-            WHERE user_id = ?
-            '''
+    def iter_entries(self, user_id: int, date: Optional[str] = None, columns: Optional[Iterable[str]] = None,
+                     limit: Optional[int] = None, batch_size: int = 500) -> Iterator[EntryRow]:
+        """
+        Stream entries for user as lightweight rows, newest first
+        
+        Args:
+            user_id: Owner of the entries
+            date: Optional 'YYYY-MM-DD' filter
+            columns: Columns to select (default: all); include 'nutrition' to get the parsed nutrition dict
+            limit: Maximum number of rows
+            batch_size: Rows fetched from SQLite per round-trip
             
-            params = [user_id]
+        Yields:
+            EntryRow objects; nutrition JSON is only decoded when accessed
+        
+        The pooled connection stays borrowed until the generator is exhausted or closed.
+        """
+        self.sync_user(user_id)
+        select = select_entry_columns(columns)
+        query = f"SELECT {', '.join(select)} FROM daily_entries WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if date:
+            query += " AND date = ? ORDER BY created_at DESC, id DESC"
+            params.append(date)
+        else:
+            query += " ORDER BY date DESC, created_at DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        
+        index = {name: i for i, name in enumerate(select)}
+        with self.connection() as conn:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield EntryRow(index, tuple(row), self.codec)
+    
+    def query_entries(self, user_id: int, date: Optional[str] = None, columns: Optional[Iterable[str]] = None,
+                      limit: Optional[int] = None) -> List[EntryRow]:
+        """Column-projected entries for user as a list of EntryRow objects (a single day is cached)"""
+        self.sync_user(user_id)
+        def load():
+            try:
+                return list(self.iter_entries(user_id, date, columns, limit))
+            except Exception as e:
+                print(f"❌ Error querying entries: {e}")
+                return []
+        
+        if not date:
+            return load()
+        key = ('query', date, tuple(columns) if columns is not None else None, limit)
+        return list(self.cached('entries', user_id, key, ENTRIES_CACHE_TTL, load))
+    
+    def get_entries_page(self, user_id: int, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE,
+                         columns: Optional[Iterable[str]] = None) -> Dict:
+        """
+        One page of a user's history, newest first
+        
+        Seeks to the cursor position on idx_user_timeline instead of skipping
+        rows, so every page costs the same however long the history is.
+        
+        Args:
+            user_id: Owner of the entries
+            cursor: next_cursor from the previous page (None for the first page)
+            page_size: Rows per page, capped at MAX_PAGE_SIZE
+            columns: Columns to return (default: all, plus parsed 'nutrition')
             
-            if start_date:
-                query += " AND date >= ?"
-                params.append(start_date)
-            if end_date:
-                query += " AND date <= ?"
-                params.append(end_date)
+        Returns:
+            Dict with 'entries' (list of dicts) and 'next_cursor' (None on the last page)
+        """
+        self.sync_user(user_id)
+        page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+        try:
+            select = select_entry_columns(columns)
+            # The cursor is built from these, so they are always fetched
+            key_columns = [name for name in ('date', 'created_at', 'id') if name not in select]
             
-            query += " GROUP BY date ORDER BY date DESC"
+            query = f"SELECT {', '.join(select + key_columns)} FROM daily_entries WHERE user_id = ?"
+            params: List[Any] = [user_id]
+            if cursor:
+                query += " AND (date, created_at, id) < (?, ?, ?)"
+                params.extend(decode_cursor(cursor))
+            query += " ORDER BY date DESC, created_at DESC, id DESC LIMIT ?"
+            # One extra row tells whether another page exists
+            params.append(page_size + 1)
             
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            conn.close()
+            index = {name: i for i, name in enumerate(select + key_columns)}
+            with self.connection() as conn:
+                rows = [EntryRow(index, tuple(row), self.codec) for row in conn.execute(query, params)]
             
-            summary = {
-                'daily_summaries': [dict(row) for row in rows],
-                'total_days': len(rows),
-                'total_entries': sum(row['entry_count'] for row in rows) if rows else 0,
-                'avg_calories': sum(row['total_calories'] for row in rows) / len(rows) if rows else 0,
-                'avg_water': sum(row['total_water'] for row in rows) / len(rows) if rows else 0,
-                'avg_exercise': sum(row['total_exercise'] for row in rows) / len(rows) if rows else 0
-            }
+            has_more = len(rows) > page_size
+            rows = rows[:page_size]
+            next_cursor = None
+            if has_more:
+                last = rows[-1]
+                next_cursor = encode_cursor(last.date, last.created_at, last.id)
             
-            return summary
+            entries = []
+            for row in rows:
+                entry = row.to_dict()
+                for name in key_columns:
+                    entry.pop(name)
+                entries.append(entry)
+            return {'entries': entries, 'next_cursor': next_cursor}
+        except Exception as e:
+            print(f"❌ Error getting entries page: {e}")
+            return {'entries': [], 'next_cursor': None}
+    
+    def get_user_summary(self, user_id: int, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict:
+        """Get summary statistics for user"""
+        self.sync_user(user_id)
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                
+                # One pre-aggregated row per day instead of a GROUP BY over every entry
+                query = '''
+                SELECT 
+                    date,
+                    entry_count,
+                    calories as total_calories,
+                    protein as total_protein,
+                    fat as total_fat,
+                    carbs as total_carbs,
+                    water as total_water,
+                    exercise as total_exercise
+                FROM daily_totals 
+                WHERE user_id = ?
+                '''
+                
+                params = [user_id]
+                
+                if start_date:
+                    query += " AND date >= ?"
+                    params.append(start_date)
+                if end_date:
+                    query += " AND date <= ?"
+                    params.append(end_date)
+                
+                query += " ORDER BY date DESC"
+                
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+                
+                summary = {
+                    'daily_summaries': [dict(row) for row in rows],
+                    'total_days': len(rows),
+                    'total_entries': sum(row['entry_count'] for row in rows) if rows else 0,
+                    'avg_calories': sum(row['total_calories'] for row in rows) / len(rows) if rows else 0,
+                    'avg_water': sum(row['total_water'] for row in rows) / len(rows) if rows else 0,
+                    'avg_exercise': sum(row['total_exercise'] for row in rows) / len(rows) if rows else 0
+                }
+                
+                return summary
         except Exception as e:
             print(f"❌ Error getting user summary: {e}")
             return {}
     
-    def delete_entry(self, user_id: int, entry_id: int) -> bool:
-        """Delete a specific entry"""
+    def get_daily_totals(self, user_id: int, date: str) -> Dict:
+        """Get one day's totals for user from the rollup table (cached)"""
+        self.sync_user(user_id)
+        return dict(self.cached('entries', user_id, ('totals', date), ENTRIES_CACHE_TTL,
+                                lambda: self.load_daily_totals(user_id, date)))
+    
+    def load_daily_totals(self, user_id: int, date: str) -> Dict:
+        """Read one day's totals for user from the rollup table"""
+        totals = {'entry_count': 0, 'calories': 0.0, 'protein': 0.0, 'fat': 0.0,
+                  'carbs': 0.0, 'water': 0, 'exercise': 0}
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                SELECT entry_count, calories, protein, fat, carbs, water, exercise
+                FROM daily_totals 
+                WHERE user_id = ? AND date = ?
+                ''', (user_id, date))
+                
+                row = cursor.fetchone()
+                if row:
+                    totals.update(dict(row))
+                return totals
+        except Exception as e:
+            print(f"❌ Error getting daily totals: {e}")
+            return totals
+    
+    def get_daily_totals_range(self, user_id: int, start_date: Optional[str] = None,
+                               end_date: Optional[str] = None) -> List[tuple]:
+        """Rollup rows (date, entry_count, calories, protein, fat, carbs, water, exercise) in date order"""
+        self.sync_user(user_id)
+        query = '''
+        SELECT date, entry_count, calories, protein, fat, carbs, water, exercise
+        FROM daily_totals 
+        WHERE user_id = ?
+        '''
+        params: List[Any] = [user_id]
+        if start_date:
+            query += " AND date >= ?"
+            params.append(start_date)
+        if end_date:
+            query += " AND date <= ?"
+            params.append(end_date)
+        query += " ORDER BY date"
         try:
-            conn = self.get_connection()
+            with self.connection() as conn:
+                return [tuple(row) for row in conn.execute(query, params)]
+        except Exception as e:
+            print(f"❌ Error getting daily totals range: {e}")
+            return []
+    
+    def get_user_food_names(self, user_id: int, limit: Optional[int] = None) -> List[tuple]:
+        """Distinct food names the user has logged as (food_name, times logged), most logged first"""
+        self.sync_user(user_id)
+        query = '''
+        SELECT food_name, COUNT(*) AS times
+        FROM daily_entries
+        WHERE user_id = ?
+        GROUP BY food_name
+        ORDER BY times DESC, food_name
+        '''
+        params: List[Any] = [user_id]
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        try:
+            with self.connection() as conn:
+                return [tuple(row) for row in conn.execute(query, params)]
+        except Exception as e:
+            print(f"❌ Error getting food names: {e}")
+            return []
+    
+    def get_entry_version(self, user_id: int) -> tuple:
+        """(last entry id, entry count) for user; changes whenever an entry is added or deleted"""
+        self.sync_user(user_id)
+        try:
+            with self.connection() as conn:
+                row = conn.execute(
+                    "SELECT COALESCE(MAX(id), 0), COUNT(*) FROM daily_entries WHERE user_id = ?", (user_id,)
+                ).fetchone()
+                return (row[0], row[1])
+        except Exception as e:
+            print(f"❌ Error getting entry version: {e}")
+            return (0, 0)
+    
+    def rebuild_daily_totals(self) -> int:
+        """Recompute the daily_totals rollup (and row_counts) from daily_entries; returns the number of day rows"""
+        with self.connection() as conn:
             cursor = conn.cursor()
-            
-            cursor.execute('''
-            DELETE FROM daily_entries 
-            WHERE id = ? AND user_id = ?
-            ''', (entry_id, user_id))
-            
+            cursor.execute("DELETE FROM daily_totals")
+            cursor.execute(REBUILD_DAILY_TOTALS_SQL)
+            cursor.execute(REBUILD_ROW_COUNTS_SQL)
             conn.commit()
-            deleted = cursor.rowcount > 0
-            conn.close()
+            self.invalidate('stats')
+            self.invalidate('entries')
+            cursor.execute("SELECT COUNT(*) FROM daily_totals")
+            count = cursor.fetchone()[0]
+        print(f"✅ Rebuilt daily_totals: {count} day rows")
+        return count
+    
+    def check_daily_totals(self) -> List[Dict]:
+        """Compare the rollup with a fresh aggregation; returns the (user_id, date) rows that differ"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(CHECK_DAILY_TOTALS_SQL)
+            mismatches = [dict(row) for row in cursor.fetchall()]
+        
+        if mismatches:
+            print(f"❌ daily_totals has {len(mismatches)} inconsistent day rows")
+        else:
+            print("✅ daily_totals is consistent with daily_entries")
+        return mismatches
+    
+    def compact_nutrition_data(self, batch_size: int = BACKFILL_BATCH_SIZE) -> Dict:
+        """
+        Convert JSON nutrition_data rows to nutrition_blob in place
+        
+        Walks daily_entries in id order with one short write transaction per
+        batch, so the app keeps reading and writing while it runs, and can be
+        stopped and restarted at any point. A row is only rewritten if its JSON
+        is unchanged since it was read and the packed form decodes to exactly the
+        same dict; everything else keeps its JSON.
+        
+        Returns:
+            Dictionary with converted/skipped counts, JSON and packed bytes, seconds
+        """
+        stats = {'converted': 0, 'skipped': 0, 'json_bytes': 0, 'blob_bytes': 0, 'seconds': 0.0}
+        start = time.perf_counter()
+        last_id = 0
+        
+        while True:
+            with self.connection() as conn:
+                rows = conn.execute(
+                    "SELECT id, nutrition_data FROM daily_entries WHERE id > ? AND nutrition_data IS NOT NULL "
+                    "ORDER BY id LIMIT ?", (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
             
-            if deleted:
-                print(f"✅ Entry {entry_id} deleted for user {user_id}")
-            else:
-                print(f"❌ Entry {entry_id} not found for user {user_id}")
+            parsed = []
+            for entry_id, nutrition_data in rows:
+                try:
+                    nutrition = json.loads(nutrition_data)
+                except ValueError:
+                    nutrition = None
+                if isinstance(nutrition, dict):
+                    parsed.append((entry_id, nutrition_data, nutrition))
+                else:
+                    stats['skipped'] += 1
+            
+            self.codec.register_notes(n['notes'] for _, _, n in parsed if isinstance(n.get('notes'), str))
+            updates = []
+            for entry_id, nutrition_data, nutrition in parsed:
+                blob = self.codec.encode(nutrition)
+                if self.codec.decode(blob) != nutrition:
+                    stats['skipped'] += 1
+                    continue
+                updates.append((blob, entry_id, nutrition_data))
             
-            return deleted
+            with self.connection() as conn:
+                cursor = conn.executemany(
+                    "UPDATE daily_entries SET nutrition_blob = ?, nutrition_data = NULL "
+                    "WHERE id = ? AND nutrition_data = ?", updates
+                )
+                conn.commit()
+            # Rows edited or deleted since the read are left alone
+            stats['converted'] += cursor.rowcount
+            stats['skipped'] += len(updates) - cursor.rowcount
+            stats['json_bytes'] += sum(len(nutrition_data.encode('utf-8')) for _, _, nutrition_data in updates)
+            stats['blob_bytes'] += sum(len(blob) for blob, _, _ in updates)
+            print(f"   … converted {stats['converted']} entries (last id {last_id})", end="\r")
+        
+        if stats['converted'] or stats['skipped']:
+            print()
+        self.invalidate('entries')
+        stats['seconds'] = round(time.perf_counter() - start, 3)
+        print(f"✅ Compacted nutrition of {stats['converted']} entries ({stats['skipped']} kept as JSON): "
+              f"{stats['json_bytes']} → {stats['blob_bytes']} bytes in {stats['seconds']}s")
+        return stats
+    
+    def delete_entry(self, user_id: int, entry_id: int) -> bool:
+        """Delete a specific entry"""
+        self.sync_user(user_id)
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                DELETE FROM daily_entries 
+                WHERE id = ? AND user_id = ?
+                ''', (entry_id, user_id))
+                
+                conn.commit()
+                deleted = cursor.rowcount > 0
+                self.invalidate('entries', user_id)
+                
+                if deleted:
+                    print(f"✅ Entry {entry_id} deleted for user {user_id}")
+                else:
+                    print(f"❌ Entry {entry_id} not found for user {user_id}")
+                
+                return deleted
         except Exception as e:
             print(f"❌ Error deleting entry: {e}")
             return False
     
     def get_all_users(self) -> List[Dict]:
         """Get all users (for admin purposes)"""
+        # Show up-to-date last_login values
+        self.logins.flush()
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-            SELECT id, email, name, created_at, last_login
-            FROM users 
-            ORDER BY created_at DESC
-            ''')
-            
-            rows = cursor.fetchall()
-            conn.close()
-            
-            return [dict(row) for row in rows]
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                SELECT id, email, name, created_at, last_login, login_count
+                FROM users 
+                ORDER BY created_at DESC
+                ''')
+                
+                rows = cursor.fetchall()
+                
+                return [dict(row) for row in rows]
         except Exception as e:
             print(f"❌ Error getting users: {e}")
             return []
     
     def get_database_stats(self) -> Dict:
-        """Get database statistics"""
+        """Get database statistics (cached for STATS_CACHE_TTL seconds)"""
+        return dict(self.cached('stats', None, None, STATS_CACHE_TTL, self.load_database_stats))
+    
+    def load_database_stats(self) -> Dict:
+        """Compute database statistics"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            stats = {}
-            
-            # Get table counts
-            cursor.execute("SELECT COUNT(*) FROM users")
-            stats['total_users'] = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM daily_entries")
-            stats['total_entries'] = cursor.fetchone()[0]
-            
-            # Get earliest and latest dates
-            cursor.execute("SELECT MIN(date), MAX(date) FROM daily_entries")
-            date_range = cursor.fetchone()
-            stats['date_range'] = f"{date_range[0]} to {date_range[1]}" if date_range[0] and date_range[1] else "No data"
-            
-            # Get database file size
-            if os.path.exists(self.db_path):
-                stats['file_size_kb'] = os.path.getsize(self.db_path) / 1024
-            
-            conn.close()
-            return stats
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                
+                stats = {}
+                
+                # Running counts kept by triggers: one row, however large the tables
+                cursor.execute("SELECT users, entries FROM row_counts WHERE id = 1")
+                counts = cursor.fetchone()
+                stats['total_users'], stats['total_entries'] = (counts[0], counts[1]) if counts else (0, 0)
+                
+                # Get earliest and latest dates (separate subqueries so each is one index seek)
+                cursor.execute("SELECT (SELECT MIN(date) FROM daily_entries), (SELECT MAX(date) FROM daily_entries)")
+                date_range = cursor.fetchone()
+                stats['date_range'] = f"{date_range[0]} to {date_range[1]}" if date_range[0] and date_range[1] else "No data"
+                
+                # Get database file size
+                if os.path.exists(self.db_path):
+                    stats['file_size_kb'] = os.path.getsize(self.db_path) / 1024
+                
+                return stats
         except Exception as e:
             print(f"❌ Error getting database stats: {e}")
             return {}
     
-    def clear_user_data(self, user_id: int) -> bool:
-        """Clear all data for a specific user"""
+    def clear_user_data(self, user_id: int, batch_size: int = PURGE_BATCH_SIZE,
+                        progress: Optional[Callable[[int], None]] = None) -> bool:
+        """
+        Clear all data for a specific user
+        
+        Deletes in batches of batch_size rows, each in its own short transaction
+        with a pause in between, so a large history never holds the write lock
+        for long. progress receives the running deleted count after each batch.
+        """
+        self.sync_user(user_id)
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('DELETE FROM daily_entries WHERE user_id = ?', (user_id,))
-            deleted_count = cursor.rowcount
-            
-            conn.commit()
-            conn.close()
+            deleted_count = 0
+            while True:
+                with self.connection() as conn:
+                    cursor = conn.cursor()
+                    
+                    cursor.execute('''
+                    DELETE FROM daily_entries WHERE id IN (
+                        SELECT id FROM daily_entries WHERE user_id = ? LIMIT ?
+                    )
+                    ''', (user_id, batch_size))
+                    deleted = cursor.rowcount
+                    
+                    conn.commit()
+                self.invalidate('entries', user_id)
+                deleted_count += deleted
+                if progress:
+                    progress(deleted_count)
+                if deleted < batch_size:
+                    break
+                time.sleep(PURGE_BATCH_PAUSE)
             
             print(f"✅ Cleared {deleted_count} entries for user {user_id}")
             return True
@@ -436,21 +1754,30 @@ class NutritionDatabase:
             print(f"❌ Error clearing user data: {e}")
             return False
 
-# Helper function
+# Helper functions
+def extract_numbers(values: List[Any]) -> List[float]:
+    """Column-wise extract_number: each distinct value is parsed only once"""
+    parsed = {}
+    result = []
+    for val in values:
+        key = (type(val), val) if isinstance(val, Hashable) else None
+        if key is None:
+            result.append(extract_number(val))
+            continue
+        number = parsed.get(key)
+        if number is None:
+            number = parsed[key] = extract_number(val)
+        result.append(number)
+    return result
+
 def extract_number(val) -> float:
     """Extract number from string like '250 kcal'"""
     if isinstance(val, (int, float)):
         return float(val)
     
-    if isinstance(val, str):
-        try:
-            # Remove non-numeric characters except dot
-            num_str = ''.join(c for c in val if c.isdigit() or c == '.')
-            return float(num_str) if num_str else 0.0
-        except:
-            return 0.0
-    
-    return 0.0
+    # First number in the string, so '10-12 g' is 10 rather than 1012
+    quantity = parse_quantity(val)
+    return quantity.value if quantity else 0.0
 
 # Create a test user for demo
 def create_test_user():
@@ -498,8 +1825,25 @@ def create_test_user():
 
 # Run when imported
 if __name__ == "__main__":
-    print("Initializing database...")
-    db = NutritionDatabase()
-    create_test_user()
-    stats = db.get_database_stats()
-    print(f"Database Stats: {stats}")
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Nutrition database utilities")
+    parser.add_argument("command", nargs="?", default="init",
+                        choices=["init", "rebuild-totals", "check-totals", "compact-nutrition"],
+                        help="init: create schema and demo user; rebuild-totals / check-totals: daily_totals rollup; "
+                             "compact-nutrition: convert stored JSON nutrition to the packed encoding")
+    parser.add_argument("--db", default="nutrition.db", help="Database path")
+    args = parser.parse_args()
+    
+    if args.command == "rebuild-totals":
+        NutritionDatabase(args.db).rebuild_daily_totals()
+    elif args.command == "check-totals":
+        raise SystemExit(1 if NutritionDatabase(args.db).check_daily_totals() else 0)
+    elif args.command == "compact-nutrition":
+        NutritionDatabase(args.db).compact_nutrition_data()
+    else:
+        print("Initializing database...")
+        db = NutritionDatabase(args.db)
+        create_test_user()
+        stats = db.get_database_stats()
+        print(f"Database Stats: {stats}")
\ No newline at end of file
@@ -1,17 +1,34 @@
 # deepseek_api.py
 import requests
 import json
-import re
-from typing import Dict, Any, List, Optional
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 import os
 
+from nutrition_kb import get_nutrition_kb
+from nutrition_parser import extract_nutrients_from_text, normalize_nutrients, parse_json_response, parse_quantity
+from request_control import CircuitBreaker, SingleFlight, TokenBucket
+from stream_parser import IncrementalJSONObjectParser, iter_chat_deltas
+from text_index import normalize_food_name
+
+# Fields the UI needs before it can render the metric tiles
+CORE_MACROS = ("calories", "protein", "fat", "carbs")
+
 class DeepSeekNutritionAPI:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, use_local_kb=True, requests_per_second=2.0, burst=5,
+                 failure_threshold=3, cooldown=30.0, max_rate_limit_wait=5.0, timeout=30):
         """
         Initialize DeepSeek API for nutrition analysis
         
         Args:
             api_key: DeepSeek API key (or from environment)
+            use_local_kb: Answer known foods from the local nutrition table before calling the API
+            requests_per_second: Sustained request rate allowed across all sessions
+            burst: Requests allowed at once before rate limiting starts
+            failure_threshold: Consecutive failures/timeouts that open the circuit breaker
+            cooldown: Seconds the breaker stays open before probing the API again
+            max_rate_limit_wait: Longest a request waits for the rate limiter before falling back
+            timeout: HTTP timeout in seconds
         """
         self.api_url = "https://api.deepseek.com/chat/completions"
         self.api_key = api_key or os.environ.get("DEEPSEEK_API_KEY")
@@ -19,10 +36,34 @@ class DeepSeekNutritionAPI:
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}" if self.api_key else None
         }
-    
+        self.knowledge_base = get_nutrition_kb() if use_local_kb else None
+        self.single_flight = SingleFlight()
+        self.rate_limiter = TokenBucket(requests_per_second, burst)
+        self.circuit_breaker = CircuitBreaker(failure_threshold, cooldown)
+        self.max_rate_limit_wait = max_rate_limit_wait
+        self.timeout = timeout
+
     def is_available(self):
         """Check if API is available (has API key)"""
         return self.api_key is not None and len(self.api_key) > 10
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Upstream request, rate limiter and circuit breaker counters"""
+        flights = self.single_flight.get_stats()
+        limiter = self.rate_limiter.get_stats()
+        breaker = self.circuit_breaker.get_stats()
+        return {
+            "upstream_calls": flights["executed"],
+            "coalesced_calls": flights["shared"],
+            "in_flight": flights["in_flight"],
+            "circuit_state": breaker["state"],
+            "circuit_consecutive_failures": breaker["consecutive_failures"],
+            "circuit_times_opened": breaker["times_opened"],
+            "circuit_short_circuited": breaker["short_circuited"],
+            "rate_limit_wait_total_s": limiter["total_wait_s"],
+            "rate_limit_wait_max_s": limiter["max_wait_s"],
+            "rate_limit_rejected": limiter["rejected"],
+        }
     
     def analyze_food_nutrition(self, food_name: str, portion_size: str = "normal") -> Dict[str, Any]:
         """
@@ -35,12 +76,39 @@ class DeepSeekNutritionAPI:
         Returns:
             Dictionary with nutrition information
         """
+        # Known foods are answered from the local table without an API round-trip
+        if self.knowledge_base is not None:
+            local_result = self.knowledge_base.lookup(food_name, portion_size)
+            if local_result:
+                return local_result
+        
         if not self.is_available():
             return self.get_fallback_nutrition(food_name, portion_size)
+
+        # Concurrent callers asking for the same food share one upstream request
+        key = (normalize_food_name(food_name), portion_size.lower())
+        result, _ = self.single_flight.do(key, self.request_nutrition, food_name, portion_size)
+
+        # Every caller gets its own copy since callers annotate the result
+        return dict(result)
+
+    def admit_request(self) -> bool:
+        """Pass the circuit breaker and rate limiter before sending a request"""
+        # While the API is down, skip the network instead of waiting for the timeout
+        if not self.circuit_breaker.allow_request():
+            return False
         
-        try:
-            # Create prompt for nutrition analysis
-            prompt = f"""Anda adalah ahli gizi. Analisis makanan ini dan kembalikan HANYA JSON mentah.
+        if not self.rate_limiter.acquire(timeout=self.max_rate_limit_wait):
+            print("⚠️ Rate limit reached, using fallback estimation")
+            self.circuit_breaker.release()
+            return False
+        
+        return True
+    
+    def build_payload(self, food_name: str, portion_size: str, stream: bool = False) -> Dict[str, Any]:
+        """Chat completion payload for a nutrition analysis request"""
+        # Create prompt for nutrition analysis
+        prompt = f"""Anda adalah ahli gizi. Analisis makanan ini dan kembalikan HANYA JSON mentah.
 
 Makanan: {food_name}
 Ukuran porsi: {portion_size}
@@ -63,59 +131,136 @@ Format JSON yang harus dikembalikan:
 Jika tidak yakin, berikan estimasi yang masuk akal.
 Pastikan semua nilai dalam string dengan unit."""
 
-            payload = {
-                "model": "deepseek-chat",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "Anda adalah ahli gizi profesional. Kembalikan HANYA JSON tanpa penjelasan lain."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "max_tokens": 1000,
-                "temperature": 0.3,
-                "response_format": {"type": "json_object"}
-            }
-            
-            # Remove Authorization header if no API key
-            headers = {k: v for k, v in self.headers.items() if v is not None}
+        payload = {
+            "model": "deepseek-chat",
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "Anda adalah ahli gizi profesional. Kembalikan HANYA JSON tanpa penjelasan lain."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "max_tokens": 1000,
+            "temperature": 0.3,
+            "response_format": {"type": "json_object"}
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+    
+    def request_headers(self) -> Dict[str, str]:
+        """Request headers without the Authorization header if there is no API key"""
+        return {k: v for k, v in self.headers.items() if v is not None}
+    
+    def request_nutrition(self, food_name: str, portion_size: str) -> Dict[str, Any]:
+        """Send one nutrition analysis request to the DeepSeek API"""
+        if not self.admit_request():
+            return self.get_fallback_nutrition(food_name, portion_size)
+        
+        try:
+            payload = self.build_payload(food_name, portion_size)
+            headers = self.request_headers()
             
-            response = requests.post(self.api_url, headers=headers, json=payload, timeout=30)
+            response = requests.post(self.api_url, headers=headers, json=payload, timeout=self.timeout)
             
             if response.status_code == 200:
                 result = response.json()
                 content = result["choices"][0]["message"]["content"]
+                self.circuit_breaker.record_success()
                 
-                # Clean JSON response
-                content = re.sub(r'```json|```', '', content).strip()
+                # Strip fences/chatter and decode the JSON object
+                nutrition_data = parse_json_response(content)
                 
-                try:
-                    nutrition_data = json.loads(content)
-                    
-                    # Adjust for portion size
-                    nutrition_data = self.adjust_for_portion(nutrition_data, portion_size)
-                    
-                    # Add timestamp
-                    from datetime import datetime
-                    nutrition_data['analyzed_at'] = datetime.now().isoformat()
-                    
-                    return nutrition_data
-                    
-                except json.JSONDecodeError as e:
-                    print(f"❌ JSON decode error: {e}")
+                if nutrition_data is None:
+                    print("❌ JSON decode error: response is not a JSON object")
                     return self.extract_nutrition_from_text(content, food_name, portion_size)
+                
+                # Adjust for portion size
+                nutrition_data = self.adjust_for_portion(nutrition_data, portion_size)
+                
+                # Add timestamp
+                nutrition_data['analyzed_at'] = datetime.now().isoformat()
+                
+                return nutrition_data
                     
             else:
                 print(f"❌ API error {response.status_code}: {response.text}")
+                self.circuit_breaker.record_failure()
                 return self.get_fallback_nutrition(food_name, portion_size)
                 
         except Exception as e:
             print(f"❌ API request error: {e}")
+            self.circuit_breaker.record_failure()
             return self.get_fallback_nutrition(food_name, portion_size)
     
+    def stream_food_nutrition(self, food_name: str, portion_size: str = "normal") -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Analyze nutrition with a streamed completion
+        
+        Args:
+            food_name: Name of the food
+            portion_size: Size of portion (small, normal, large)
+            
+        Yields:
+            ("macros", dict) as soon as calories/protein/fat/carbs are complete,
+            then ("complete", dict) with the full nutrition information
+        """
+        if self.knowledge_base is not None:
+            local_result = self.knowledge_base.lookup(food_name, portion_size)
+            if local_result:
+                yield "complete", local_result
+                return
+        
+        if not self.is_available() or not self.admit_request():
+            yield "complete", self.get_fallback_nutrition(food_name, portion_size)
+            return
+        
+        parser = IncrementalJSONObjectParser()
+        macros_sent = False
+        try:
+            response = requests.post(
+                self.api_url,
+                headers=self.request_headers(),
+                json=self.build_payload(food_name, portion_size, stream=True),
+                timeout=self.timeout,
+                stream=True
+            )
+            
+            if response.status_code != 200:
+                print(f"❌ API error {response.status_code}: {response.text}")
+                self.circuit_breaker.record_failure()
+                yield "complete", self.get_fallback_nutrition(food_name, portion_size)
+                return
+            
+            try:
+                for delta in iter_chat_deltas(response.iter_lines(decode_unicode=True)):
+                    parser.feed(delta)
+                    if not macros_sent and all(field in parser.fields for field in CORE_MACROS):
+                        macros_sent = True
+                        macros = {field: parser.fields[field] for field in CORE_MACROS}
+                        yield "macros", self.adjust_for_portion(macros, portion_size)
+            finally:
+                response.close()
+            
+            self.circuit_breaker.record_success()
+        except Exception as e:
+            print(f"❌ API stream error: {e}")
+            self.circuit_breaker.record_failure()
+            yield "complete", self.get_fallback_nutrition(food_name, portion_size)
+            return
+        
+        if not parser.finished:
+            print("❌ Stream ended before the JSON object was complete")
+            yield "complete", self.extract_nutrition_from_text(parser.buffer, food_name, portion_size)
+            return
+        
+        nutrition_data = self.adjust_for_portion(dict(parser.fields), portion_size)
+        nutrition_data['analyzed_at'] = datetime.now().isoformat()
+        yield "complete", nutrition_data
+    
     def adjust_for_portion(self, nutrition_data: Dict, portion_size: str) -> Dict:
         """Adjust nutrition values based on portion size"""
         portion_factors = {
@@ -130,19 +275,9 @@ Pastikan semua nilai dalam string dengan unit."""
         factor = portion_factors.get(portion_size.lower(), 1.0)
         
         if factor != 1.0:
-            # Fields to adjust
-            nutrient_fields = ['calories', 'protein', 'fat', 'carbs', 'fiber', 'sugar']
-            
-            for field in nutrient_fields:
-                if field in nutrition_data:
-                    value_str = nutrition_data[field]
-                    # Extract number
-                    numbers = re.findall(r'\d+\.?\d*', value_str)
-                    if numbers:
-                        number = float(numbers[0])
-                        unit = value_str.replace(numbers[0], '').strip()
-                        adjusted_number = number * factor
-                        nutrition_data[field] = f"{adjusted_number:.1f} {unit}"
+            # Each nutrient is parsed once into (value, unit) and re-rendered scaled
+            for field, nutrient in normalize_nutrients(nutrition_data).items():
+                nutrition_data[field] = nutrient.scaled(factor).format()
         
         return nutrition_data
     
@@ -163,23 +298,9 @@ Pastikan semua nilai dalam string dengan unit."""
             "analyzed_at": datetime.now().isoformat()
         }
         
-        # Try to extract values using regex
-        patterns = {
-            'calories': r'(\d+)\s*kcal|kalori.*?(\d+)',
-            'protein': r'protein.*?(\d+\.?\d*)\s*g',
-            'fat': r'fat.*?(\d+\.?\d*)\s*g|lemak.*?(\d+\.?\d*)\s*g',
-            'carbs': r'carbs.*?(\d+\.?\d*)\s*g|karbohidrat.*?(\d+\.?\d*)\s*g',
-            'fiber': r'fiber.*?(\d+\.?\d*)\s*g|serat.*?(\d+\.?\d*)\s*g',
-            'sugar': r'sugar.*?(\d+\.?\d*)\s*g|gula.*?(\d+\.?\d*)\s*g'
-        }
-        
-        for field, pattern in patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                # Get the first non-None group
-                value = next((g for g in match.groups() if g is not None), None)
-                if value:
-                    result[field] = f"{value} {'kcal' if field == 'calories' else 'g'}"
+        # Single pass over the text; values that are found replace the defaults
+        for field, nutrient in extract_nutrients_from_text(text).items():
+            result[field] = f"{nutrient.value:g} {nutrient.unit}"
         
         return result
     
@@ -262,14 +383,8 @@ def extract_number(value: str) -> float:
     if isinstance(value, (int, float)):
         return float(value)
     
-    if isinstance(value, str):
-        try:
-            numbers = re.findall(r'\d+\.?\d*', value)
-            return float(numbers[0]) if numbers else 0.0
-        except:
-            return 0.0
-    
-    return 0.0
+    quantity = parse_quantity(value)
+    return quantity.value if quantity else 0.0
 
 if __name__ == "__main__":
     # Test the API
@@ -0,0 +1,192 @@
+# export.py
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+import zlib
+from contextlib import redirect_stdout
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from database import EntryRow, NutritionDatabase
+
+# Exported columns, in file order; importer.py reads these names back
+EXPORT_FIELDS = (
+    "id", "user_id", "date", "food_name", "portion", "calories", "protein", "fat", "carbs",
+    "fiber", "sugar", "sodium", "water_ml", "exercise_min", "source", "prediction_confidence", "created_at",
+)
+
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_CHUNK_BYTES = 64 * 1024     # text buffered before each yielded chunk
+EXPORT_BATCH_SIZE = 1000           # rows fetched from SQLite per round-trip
+GZIP_LEVEL = 6
+
+def iter_export_rows(db: NutritionDatabase, user_id: Optional[int] = None, with_nutrition: bool = False,
+                     batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[EntryRow]:
+    """
+    Entries of one user, or of every user in id order, straight off the cursor
+
+    Each user's rows come from db.iter_entries (newest first), so at most
+    batch_size rows are in memory at a time. Works with the sharded database too.
+    """
+    columns = EXPORT_FIELDS + ("nutrition",) if with_nutrition else EXPORT_FIELDS
+    if user_id is not None:
+        yield from db.iter_entries(user_id, columns=columns, batch_size=batch_size)
+        return
+    for user in sorted(db.get_all_users(), key=lambda u: u['id']):
+        yield from db.iter_entries(user['id'], columns=columns, batch_size=batch_size)
+
+def iter_export(db: NutritionDatabase, user_id: Optional[int] = None, file_format: str = "csv",
+                compress: bool = False, stats: Optional[Dict[str, Any]] = None,
+                chunk_bytes: int = EXPORT_CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    Stream an export as byte chunks
+
+    Args:
+        db: Database (plain or sharded)
+        user_id: Owner of the entries, or None for every user
+        file_format: 'csv' (flat columns) or 'jsonl' (flat columns plus the nutrition dict)
+        compress: gzip the stream
+        stats: Optional dict updated in place with rows, bytes, seconds and rows_per_sec
+        chunk_bytes: Approximate size of each chunk before compression
+
+    Yields:
+        UTF-8 (optionally gzip) bytes; the concatenation is the complete file
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {file_format} (choose from {', '.join(EXPORT_FORMATS)})")
+    stats = stats if stats is not None else {}
+    stats.update({'rows': 0, 'bytes': 0, 'seconds': 0.0, 'rows_per_sec': 0.0})
+    # wbits=31 writes a gzip header and trailer, so the output is a regular .gz file
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n") if file_format == "csv" else None
+    start = time.perf_counter()
+
+    def drain(final: bool = False) -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        if compressor is not None:
+            data = compressor.compress(data) + (compressor.flush() if final else b"")
+        stats['bytes'] += len(data)
+        stats['seconds'] = time.perf_counter() - start
+        stats['rows_per_sec'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+        return data
+
+    if writer is not None:
+        writer.writerow(EXPORT_FIELDS)
+    for row in iter_export_rows(db, user_id, with_nutrition=writer is None):
+        if writer is not None:
+            writer.writerow([row[name] for name in EXPORT_FIELDS])
+        else:
+            record = {name: row[name] for name in EXPORT_FIELDS}
+            record["nutrition"] = row.nutrition
+            buffer.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+            buffer.write("\n")
+        stats['rows'] += 1
+        if buffer.tell() >= chunk_bytes:
+            data = drain()
+            if data:
+                yield data
+
+    data = drain(final=True)
+    if data:
+        yield data
+    stats['seconds'] = round(stats['seconds'], 3)
+    stats['rows_per_sec'] = round(stats['rows_per_sec'], 1)
+
+class ExportStream(io.RawIOBase):
+    """
+    Read-only file object over an iter_export generator
+
+    Lets file-based APIs (shutil.copyfileobj, st.download_button) consume an
+    export without it being built up front; chunks are produced on read.
+    """
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._pending = b""
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        self._position += size
+        return size
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        # Only "rewind" before the first read is possible; callers often do that defensively
+        if (offset, whence) in ((0, io.SEEK_SET), (0, io.SEEK_CUR)) and self._position == 0:
+            return 0
+        raise io.UnsupportedOperation("export streams can only be read forward")
+
+    def close(self):
+        if hasattr(self._chunks, "close"):
+            self._chunks.close()
+        super().close()
+
+def export_filename(user_id: Optional[int], file_format: str, compress: bool) -> str:
+    """nutrition_user12.csv, nutrition_all.jsonl.gz, ..."""
+    owner = f"user{user_id}" if user_id is not None else "all"
+    return f"nutrition_{owner}.{file_format}" + (".gz" if compress else "")
+
+def export_to_file(db: NutritionDatabase, path: str, user_id: Optional[int] = None, file_format: Optional[str] = None,
+                   compress: Optional[bool] = None, progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Write an export to path ('-' for stdout)
+
+    Format and compression default to the file extension (.csv/.jsonl, .gz).
+
+    Returns:
+        Dictionary with rows, bytes, seconds and rows_per_sec
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    file_format = file_format or ("jsonl" if name.endswith((".jsonl", ".ndjson", ".json")) else "csv")
+    compress = path.endswith(".gz") if compress is None else compress
+    stats: Dict[str, Any] = {}
+    out = sys.stdout.buffer if path == "-" else open(path, "wb")
+    try:
+        for chunk in iter_export(db, user_id, file_format, compress, stats):
+            out.write(chunk)
+            if progress:
+                progress(stats)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream daily entries to CSV or JSONL (optionally gzip)")
+    parser.add_argument("out", help="Output file (.csv, .jsonl, add .gz to compress; '-' for stdout)")
+    parser.add_argument("--db", default="nutrition.db", help="Database path")
+    owner = parser.add_mutually_exclusive_group(required=True)
+    owner.add_argument("--user-id", type=int, help="Export one user's entries")
+    owner.add_argument("--all", action="store_true", help="Export every user's entries")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="Output format (default: from file extension)")
+    parser.add_argument("--gzip", action="store_true", help="Compress even without a .gz extension")
+    args = parser.parse_args()
+
+    # Progress and summaries go to stderr so '-' output stays clean
+    def report(stats):
+        print(f"   … {stats['rows']} rows ({stats['rows_per_sec']:.0f} rows/sec)", end="\r", file=sys.stderr)
+
+    with redirect_stdout(sys.stderr):
+        database = NutritionDatabase(args.db, cache=False)
+    result = export_to_file(database, args.out, args.user_id, args.format, args.gzip or None, report)
+    print(f"\n✅ Exported {result['rows']} entries to {args.out} ({result['bytes'] / 1024:.0f} KB) in "
+          f"{result['seconds']}s ({result['rows_per_sec']:.0f} rows/sec)", file=sys.stderr)
+    database.close()
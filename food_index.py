@@ -0,0 +1,244 @@
+# food_index.py
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from text_index import TrigramIndex, is_typo_of, normalize_food_name
+
+CLASS_NAMES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "class_names.txt")
+
+# Shortcut buttons in the home page "Pilihan Cepat" tab
+QUICK_FOODS = ["Nasi Goreng", "Ayam Goreng", "Tempe Goreng", "Buah Pisang",
+               "Sayur Bayam", "Telur Rebus", "Sate Ayam", "Rendang"]
+
+CANONICAL_MIN_SCORE = 0.72      # trigram similarity needed to replace typed text with a known name
+SUGGEST_MIN_SCORE = 0.3         # fuzzy matches below this are not suggested
+MAX_CACHED_USERS = 1024         # per-user indexes kept in memory (least recently used are dropped)
+
+def load_class_names(path: str = CLASS_NAMES_PATH) -> List[str]:
+    """Dish names, one per line (the classifier's classes)"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    except OSError as e:
+        print(f"⚠️ Class names not loaded ({e})")
+        return []
+
+class _TrieNode:
+    __slots__ = ('children', 'keys')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.keys: Set[str] = set()    # every key with a word starting with this node's prefix
+
+class FoodIndex:
+    """
+    Prefix trie plus trigram index over food names
+
+    Keys are normalized names; each word start is inserted into the trie,
+    so "gor" completes "nasi goreng" as well as "goreng pisang". Every trie
+    node keeps the keys below it, so a prefix lookup is one walk down the
+    query. Names can be added at any time; weights (e.g. times logged)
+    order equally good matches.
+    """
+
+    def __init__(self):
+        self._root = _TrieNode()
+        self._trigrams = TrigramIndex()
+        self.names: Dict[str, str] = {}       # key -> display name
+        self.weights: Dict[str, float] = defaultdict(float)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.names
+
+    def add(self, name: str, weight: float = 1.0) -> Optional[str]:
+        """Index name (or add weight to it if already known); returns its key"""
+        key = normalize_food_name(name)
+        if not key:
+            return None
+        if key not in self.names:
+            self.names[key] = name.strip()
+            self._trigrams.add(key)
+            words = key.split(' ')
+            for i in range(len(words)):
+                node = self._root
+                for char in ' '.join(words[i:]):
+                    node = node.children.setdefault(char, _TrieNode())
+                    node.keys.add(key)
+        self.weights[key] += weight
+        return key
+
+    def prefix(self, query: str) -> Set[str]:
+        """Keys with a word (or word sequence) starting with the normalized query"""
+        node = self._root
+        for char in query:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.keys
+
+    def fuzzy(self, query: str, limit: int, min_score: float = SUGGEST_MIN_SCORE) -> List[Tuple[str, float]]:
+        """Typo-tolerant matches of the normalized query as (key, score)"""
+        return self._trigrams.search(query, limit=limit, min_score=min_score)
+
+    def top(self, limit: int) -> List[str]:
+        """Heaviest keys"""
+        return sorted(self.names, key=lambda key: (-self.weights[key], key))[:limit]
+
+class FoodCatalog:
+    """
+    Food-name autocomplete for the manual input: the classifier's class names
+    and the quick foods for everyone, plus each user's own logged names
+
+    Per-user indexes are loaded from the database on first use and updated
+    with record() as entries are saved, so they never need a rebuild.
+    """
+
+    def __init__(self, db=None, class_names_path: str = CLASS_NAMES_PATH, quick_foods: Optional[List[str]] = None,
+                 max_users: int = MAX_CACHED_USERS):
+        """
+        Args:
+            db: Database with get_user_food_names (None for the shared names only)
+            class_names_path: Classifier class names, one per line
+            quick_foods: Quick-pick names (default QUICK_FOODS); weighted above class names
+            max_users: Per-user indexes kept in memory
+        """
+        self.db = db
+        self.max_users = max_users
+        self.shared = FoodIndex()
+        for name in load_class_names(class_names_path):
+            self.shared.add(name.title())
+        for name in (quick_foods if quick_foods is not None else QUICK_FOODS):
+            self.shared.add(name, weight=2.0)
+        self._users: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def user_index(self, user_id: Optional[int]) -> Optional[FoodIndex]:
+        """The user's own food names (loaded on first use)"""
+        if user_id is None or self.db is None:
+            return None
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is not None:
+                self._users.move_to_end(user_id)
+                return index
+        index = FoodIndex()
+        for name, times in self.db.get_user_food_names(user_id):
+            index.add(name, weight=times)
+        with self._lock:
+            # Another thread may have loaded it meanwhile; keep the first
+            index = self._users.setdefault(user_id, index)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return index
+
+    def record(self, user_id: int, food_name: str):
+        """Count a newly logged food (call after saving an entry)"""
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is not None:
+                index.add(food_name)
+
+    def suggest(self, query: str, user_id: Optional[int] = None, limit: int = 8) -> List[Tuple[str, float]]:
+        """
+        Completions and typo corrections for what the user has typed so far
+
+        Prefix matches score 1.0 and fuzzy matches their trigram similarity;
+        ties go to names the user logs most, then to shared names.
+
+        Returns:
+            List of (display name, score), best first; the user's most logged
+            foods and the quick foods when query is empty
+        """
+        key = normalize_food_name(query)
+        indexes = [index for index in (self.user_index(user_id), self.shared) if index is not None]
+        candidates: Dict[str, float] = {}
+        if not key:
+            for index in indexes:
+                for match in index.top(limit):
+                    candidates.setdefault(match, 1.0)
+        else:
+            for index in indexes:
+                for match in index.prefix(key):
+                    candidates[match] = 1.0
+            if len(candidates) < limit:
+                for index in indexes:
+                    for match, score in index.fuzzy(key, limit):
+                        candidates[match] = max(candidates.get(match, 0.0), score)
+
+        def weight(match):
+            return sum(index.weights.get(match, 0.0) * (10 if index is not self.shared else 1) for index in indexes)
+
+        ranked = sorted(candidates.items(), key=lambda item: (-item[1], -weight(item[0]), len(item[0]), item[0]))
+        return [(self.display_name(match, indexes), round(score, 3)) for match, score in ranked[:limit]]
+
+    def display_name(self, key: str, indexes: List[FoodIndex]) -> str:
+        # Shared spelling wins, so everyone logs "Nasi Goreng" the same way
+        if key in self.shared:
+            return self.shared.names[key]
+        return next(index.names[key] for index in indexes if key in index)
+
+    def canonical(self, food_name: str, user_id: Optional[int] = None,
+                  min_score: float = CANONICAL_MIN_SCORE) -> str:
+        """
+        Known spelling of food_name, or food_name itself when nothing is close enough
+
+        Used before nutrition lookups so "nasi gorng" and "Nasi Goreng" share
+        one cache entry and one API call. Only typo-level differences are
+        corrected (see is_typo_of); a more specific dish such as "nasi goreng
+        kambing" keeps its own name and gets the known one as a suggestion.
+        """
+        key = normalize_food_name(food_name)
+        if not key:
+            return food_name
+        indexes = [index for index in (self.user_index(user_id), self.shared) if index is not None]
+        if any(key in index for index in indexes):
+            return self.display_name(key, indexes)
+        best = None
+        for index in indexes:
+            for match, score in index.fuzzy(key, 5, min_score):
+                if is_typo_of(key, match) and (best is None or score > best[1]):
+                    best = (match, score)
+        return self.display_name(best[0], indexes) if best else food_name.strip()
+
+if __name__ == "__main__":
+    catalog = FoodCatalog()
+    queries = ["nasi", "gor", "nasi gorng", "ayam bkar", "sate", "rendan", "kopi susu", ""]
+    for query in queries:
+        print(f"{query!r}: {catalog.suggest(query, limit=5)}")
+
+    # Typos are corrected; other dishes, even if similar, keep the typed name
+    canonical_cases = [
+        ("nasi gorng", "Nasi Goreng"),
+        ("Nasi  Goreng!", "Nasi Goreng"),
+        ("ayam bkar", "Ayam Bakar"),
+        ("rendan", "Rendang"),
+        ("pasta carbonara", "pasta carbonara"),
+        ("nasi goreng kambing", "nasi goreng kambing"),
+        ("nasi goreng seafood", "nasi goreng seafood"),
+        ("ayam goreng kremes", "ayam goreng kremes"),
+        ("sate ayam madura", "sate ayam madura"),
+        ("mie goreng jawa", "mie goreng jawa"),
+        ("sate kambing", "sate kambing"),
+    ]
+    failures = 0
+    for query, expected in canonical_cases:
+        got = catalog.canonical(query)
+        if got != expected:
+            failures += 1
+            print(f"❌ canonical({query!r}) = {got!r}, expected {expected!r}")
+    print(f"{'✅' if not failures else '❌'} Canonical names: {len(canonical_cases)} cases, {failures} mismatches")
+
+    rounds = 2000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in queries:
+            catalog.suggest(query)
+    elapsed = time.perf_counter() - start
+    print(f"✅ {rounds * len(queries)} lookups, {elapsed / (rounds * len(queries)) * 1e6:.1f} µs each")
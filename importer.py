@@ -0,0 +1,134 @@
+# importer.py
+import argparse
+import csv
+import gzip
+import json
+from typing import Any, Dict, Iterator, Optional
+
+from database import NutritionDatabase
+
+NUTRIENT_COLUMNS = {
+    "calories": "kcal",
+    "protein": "g",
+    "fat": "g",
+    "carbs": "g",
+    "fiber": "g",
+    "sugar": "g",
+    "sodium": "mg",
+}
+
+def open_text(path: str):
+    """Open a text file, transparently decompressing .gz"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+def to_entry(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert an imported record to the add_daily_entry shape
+
+    Records may already carry a 'nutrition' dict or use flat columns
+    (calories, protein, ...) as exported by other trackers.
+    """
+    nutrition = record.get("nutrition")
+    if not isinstance(nutrition, dict):
+        nutrition = {}
+        for field, unit in NUTRIENT_COLUMNS.items():
+            value = record.get(field)
+            if value not in (None, ""):
+                value = str(value).strip()
+                # Bare numbers get the unit the rest of the app expects
+                nutrition[field] = value if not value.replace(".", "", 1).isdigit() else f"{value} {unit}"
+
+    entry = {
+        "food": record.get("food") or record.get("food_name") or "Unknown",
+        "portion": record.get("portion") or "Normal",
+        "nutrition": nutrition,
+        "water": int(float(record.get("water") or record.get("water_ml") or 0)),
+        "exercise": int(float(record.get("exercise") or record.get("exercise_min") or 0)),
+        "source": record.get("source") or "import",
+    }
+    if record.get("date"):
+        entry["date"] = record["date"]
+    if record.get("prediction_confidence") not in (None, ""):
+        entry["prediction_confidence"] = float(record["prediction_confidence"])
+    if record.get("user_id") not in (None, ""):
+        entry["user_id"] = int(record["user_id"])
+    return entry
+
+def skip_line(line_number: int, error: Exception, skipped: Optional[Dict[str, int]]):
+    """Report an unreadable input line and count it in skipped['skipped']"""
+    print(f"⚠️ Skipping line {line_number}: {error}")
+    if skipped is not None:
+        skipped['skipped'] = skipped.get('skipped', 0) + 1
+
+def iter_csv(path: str, skipped: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+    """Stream entries from a CSV file with a header row (bad rows are skipped and counted)"""
+    with open_text(path) as f:
+        reader = csv.DictReader(f)
+        for record in reader:
+            try:
+                entry = to_entry(record)
+            except (TypeError, ValueError) as e:
+                skip_line(reader.line_num, e, skipped)
+                continue
+            yield entry
+
+def iter_jsonl(path: str, skipped: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+    """Stream entries from a JSON Lines file (bad lines are skipped and counted)"""
+    with open_text(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = to_entry(json.loads(line))
+            except (json.JSONDecodeError, TypeError, ValueError, AttributeError) as e:
+                skip_line(line_number, e, skipped)
+                continue
+            yield entry
+
+def detect_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    return "jsonl" if name.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+def import_entries(db: NutritionDatabase, path: str, user_id: Optional[int] = None,
+                   file_format: Optional[str] = None, chunk_size: int = 1000) -> Dict:
+    """
+    Import a CSV/JSONL history file without loading it into memory
+
+    Args:
+        db: Target database
+        path: CSV or JSONL file (optionally .gz)
+        user_id: Owner of every row, or None to use each row's user_id column
+        file_format: 'csv' or 'jsonl' (detected from the extension if omitted)
+        chunk_size: Rows per transaction
+
+    Returns:
+        Bulk insert statistics, plus 'skipped' unreadable input lines
+    """
+    file_format = file_format or detect_format(path)
+    skipped = {'skipped': 0}
+    entries = iter_jsonl(path, skipped) if file_format == "jsonl" else iter_csv(path, skipped)
+
+    def report(stats):
+        print(f"   … {stats['inserted']} rows ({stats['rows_per_sec']:.0f} rows/sec)", end="\r")
+
+    print(f"📥 Importing {path} ({file_format})")
+    stats = db.add_daily_entries_bulk(entries, user_id=user_id, chunk_size=chunk_size, progress=report)
+    stats.update(skipped)
+    if skipped['skipped']:
+        print(f"⚠️ {skipped['skipped']} unreadable lines skipped")
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import daily entries from CSV or JSONL")
+    parser.add_argument("path", help="CSV or JSONL file (.gz supported)")
+    parser.add_argument("--db", default="nutrition.db", help="Database path")
+    parser.add_argument("--user-id", type=int, help="Assign every row to this user (otherwise use the user_id column)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Input format (default: from file extension)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Rows per transaction")
+    args = parser.parse_args()
+
+    database = NutritionDatabase(args.db)
+    import_entries(database, args.path, args.user_id, args.format, args.chunk_size)
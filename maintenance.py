@@ -0,0 +1,328 @@
+# maintenance.py
+import argparse
+import json
+import os
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, Optional
+
+from database import PURGE_BATCH_PAUSE, PURGE_BATCH_SIZE, NutritionDatabase
+
+ARCHIVE_BATCH_SIZE = 2000
+ARCHIVE_DAYS = 365              # default cutoff: entries older than a year
+VACUUM_STEP_PAGES = 512         # pages returned to the OS per incremental_vacuum pass (2 MB at 4 KB pages)
+VACUUM_PAUSE = 0.01             # seconds between passes
+
+AUTO_VACUUM_MODES = {0: "NONE", 1: "FULL", 2: "INCREMENTAL"}
+
+def file_size(path: str) -> int:
+    """Size of a database file plus its WAL, in bytes"""
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+def storage_status(db: NutritionDatabase) -> Dict[str, Any]:
+    """Page counts, free pages and auto_vacuum mode of the main database"""
+    with db.connection() as conn:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    return {
+        "auto_vacuum": AUTO_VACUUM_MODES.get(mode, str(mode)),
+        "page_size": page_size,
+        "page_count": page_count,
+        "freelist_count": freelist,
+        "free_bytes": freelist * page_size,
+        "file_bytes": file_size(db.db_path),
+    }
+
+def enable_incremental_vacuum(db: NutritionDatabase) -> bool:
+    """
+    Switch an existing database to auto_vacuum=INCREMENTAL
+
+    New files get the mode from CONNECTION_PRAGMAS; older ones need one full
+    VACUUM to add the pointer-map pages. That VACUUM rewrites the whole file
+    and blocks writers while it runs, so do it once in a quiet window.
+    """
+    status = storage_status(db)
+    if status["auto_vacuum"] == "INCREMENTAL":
+        print("✅ auto_vacuum is already INCREMENTAL")
+        return True
+
+    print(f"🧹 Rewriting {format_bytes(status['file_bytes'])} with VACUUM to enable incremental vacuum...")
+    start = time.perf_counter()
+    try:
+        # A dedicated connection: VACUUM cannot run inside a transaction
+        conn = db.get_connection()
+        try:
+            conn.isolation_level = None
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"❌ Error enabling incremental vacuum: {e}")
+        return False
+
+    after = storage_status(db)
+    print(f"✅ auto_vacuum={after['auto_vacuum']} in {time.perf_counter() - start:.2f}s "
+          f"({format_bytes(status['file_bytes'])} → {format_bytes(after['file_bytes'])})")
+    return after["auto_vacuum"] == "INCREMENTAL"
+
+def incremental_vacuum(db: NutritionDatabase, max_pages: Optional[int] = None, step: int = VACUUM_STEP_PAGES,
+                       pause: float = VACUUM_PAUSE) -> Dict[str, Any]:
+    """
+    Return free pages to the filesystem in short passes
+
+    Each pass frees at most `step` pages in its own write transaction, so the
+    app's writers only ever wait for one pass.
+
+    Args:
+        db: Database to shrink
+        max_pages: Stop after this many pages (default: the whole freelist)
+        step: Pages per pass
+        pause: Seconds to sleep between passes
+
+    Returns:
+        Dictionary with pages freed, passes, bytes before/after and seconds
+    """
+    status = storage_status(db)
+    stats = {"pages_freed": 0, "passes": 0, "bytes_before": status["file_bytes"], "bytes_after": status["file_bytes"],
+             "seconds": 0.0}
+    if status["auto_vacuum"] != "INCREMENTAL":
+        print(f"⚠️ auto_vacuum is {status['auto_vacuum']}; run `python maintenance.py enable-incremental` first")
+        return stats
+
+    target = status["freelist_count"] if max_pages is None else min(max_pages, status["freelist_count"])
+    start = time.perf_counter()
+    while stats["pages_freed"] < target:
+        pages = min(step, target - stats["pages_freed"])
+        with db.connection() as conn:
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # execute() steps the pragma once, freeing a single page; executescript runs it to completion
+            conn.executescript(f"PRAGMA incremental_vacuum({pages})")
+            freed = before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if freed <= 0:
+            break
+        stats["pages_freed"] += freed
+        stats["passes"] += 1
+        elapsed = time.perf_counter() - start
+        print(f"   … freed {stats['pages_freed']}/{target} pages "
+              f"({format_bytes(stats['pages_freed'] * status['page_size'])}, {elapsed:.1f}s)", end="\r")
+        time.sleep(pause)
+
+    if stats["passes"]:
+        print()
+        # Truncate the WAL too, or the freed pages just move there until the next checkpoint
+        with db.connection() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    stats["bytes_after"] = file_size(db.db_path)
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    print(f"✅ Incremental vacuum: {stats['pages_freed']} pages in {stats['passes']} passes, "
+          f"{format_bytes(stats['bytes_before'])} → {format_bytes(stats['bytes_after'])} in {stats['seconds']}s")
+    return stats
+
+def ensure_archive_schema(conn):
+    """Create (or widen) archive.daily_entries to match main.daily_entries"""
+    columns = [(row[1], row[2]) for row in conn.execute("PRAGMA main.table_info(daily_entries)")]
+    conn.execute(f'''
+    CREATE TABLE IF NOT EXISTS archive.daily_entries (
+        id INTEGER PRIMARY KEY,
+        {", ".join(f"{name} {col_type}" for name, col_type in columns if name != "id")},
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    # Columns added to the live table by later migrations
+    existing = {row[1] for row in conn.execute("PRAGMA archive.table_info(daily_entries)")}
+    for name, col_type in columns:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE archive.daily_entries ADD COLUMN {name} {col_type}")
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_archive_user_date ON daily_entries(user_id, date)")
+    # Packed nutrition refers to notes ids, which never change or get reused
+    conn.execute("CREATE TABLE IF NOT EXISTS archive.nutrition_notes (id INTEGER PRIMARY KEY, text TEXT NOT NULL)")
+    return [name for name, _ in columns]
+
+def archive_entries(db: NutritionDatabase, archive_path: str, before: str, batch_size: int = ARCHIVE_BATCH_SIZE,
+                    pause: float = PURGE_BATCH_PAUSE, max_rows: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Move entries dated before a cutoff into an attached archive database
+
+    Every batch copies up to batch_size rows into the archive and commits,
+    then deletes from the live table, in a second short transaction, only
+    the ids now present in the archive; it then sleeps so app writers get
+    the lock. The daily_totals triggers drop the archived days from the live
+    rollup. With WAL the two files never commit atomically together, so the
+    archive always commits first: a batch interrupted after the copy is
+    still in the live table and is copied again (INSERT OR REPLACE on the
+    original id) and deleted on the next run.
+
+    Args:
+        db: Live database
+        archive_path: Archive SQLite file (created on first use)
+        before: 'YYYY-MM-DD'; entries with an earlier date are archived
+        batch_size: Rows per transaction
+        pause: Seconds to sleep between batches
+        max_rows: Stop after this many rows (default: no limit)
+
+    Returns:
+        Dictionary with archived rows, batches, users touched and seconds
+    """
+    stats = {"archived": 0, "batches": 0, "users": 0, "seconds": 0.0}
+    start = time.perf_counter()
+    users = set()
+
+    # A dedicated connection, so the ATTACH never leaks into the pool
+    conn = db.get_connection()
+    try:
+        conn.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+        conn.execute("PRAGMA archive.journal_mode=WAL")
+        columns = ", ".join(ensure_archive_schema(conn))
+        conn.execute('''
+        INSERT INTO archive.nutrition_notes (id, text)
+        SELECT id, text FROM main.nutrition_notes
+        WHERE id > (SELECT COALESCE(MAX(id), 0) FROM archive.nutrition_notes)
+        ''')
+        conn.commit()
+
+        while max_rows is None or stats["archived"] < max_rows:
+            limit = batch_size if max_rows is None else min(batch_size, max_rows - stats["archived"])
+            # Copy first and commit the archive on its own ...
+            conn.execute("BEGIN")
+            rows = conn.execute(
+                "SELECT id, user_id FROM main.daily_entries WHERE date < ? LIMIT ?", (before, limit)
+            ).fetchall()
+            if not rows:
+                conn.rollback()
+                break
+            ids = json.dumps([row[0] for row in rows])
+            conn.execute(f'''
+            INSERT OR REPLACE INTO archive.daily_entries ({columns})
+            SELECT {columns} FROM main.daily_entries WHERE id IN (SELECT value FROM json_each(?))
+            ''', (ids,))
+            conn.commit()
+
+            # ... then delete only what the archive now holds
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute('''
+            DELETE FROM main.daily_entries WHERE id IN (
+                SELECT id FROM archive.daily_entries WHERE id IN (SELECT value FROM json_each(?))
+            )
+            ''', (ids,))
+            conn.commit()
+
+            for user_id in {row[1] for row in rows} - users:
+                db.invalidate("entries", user_id)
+            users.update(row[1] for row in rows)
+            stats["archived"] += len(rows)
+            stats["batches"] += 1
+            elapsed = time.perf_counter() - start
+            print(f"   … archived {stats['archived']} entries ({stats['archived'] / elapsed:,.0f} rows/s)", end="\r")
+            time.sleep(pause)
+    except Exception as e:
+        print(f"\n❌ Error archiving entries: {e}")
+        if conn.in_transaction:
+            conn.rollback()
+    finally:
+        try:
+            conn.execute("DETACH DATABASE archive")
+        except Exception:
+            pass
+        conn.close()
+
+    if stats["batches"]:
+        print()
+    db.invalidate("stats")
+    stats["users"] = len(users)
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    print(f"✅ Archived {stats['archived']} entries older than {before} for {stats['users']} users "
+          f"into {archive_path} in {stats['seconds']}s")
+    return stats
+
+def purge_user(db: NutritionDatabase, user_id: int, delete_account: bool = False,
+               batch_size: int = PURGE_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Delete a user's entries in short batches, optionally followed by the account itself
+
+    Returns:
+        Dictionary with deleted entries, whether the account was removed and seconds
+    """
+    start = time.perf_counter()
+    deleted = [0]
+
+    def progress(count: int):
+        deleted[0] = count
+        # Shorter than clear_user_data's closing line, which overwrites it
+        print(f"   … {count} deleted", end="\r")
+
+    ok = db.clear_user_data(user_id, batch_size=batch_size, progress=progress)
+    account_deleted = False
+    if ok and delete_account:
+        try:
+            with db.connection() as conn:
+                account_deleted = conn.execute("DELETE FROM users WHERE id = ?", (user_id,)).rowcount > 0
+                conn.commit()
+            db.invalidate("profile", user_id)
+            db.invalidate("stats")
+        except Exception as e:
+            print(f"❌ Error deleting user {user_id}: {e}")
+
+    seconds = round(time.perf_counter() - start, 3)
+    print(f"✅ Purged user {user_id}: {deleted[0]} entries"
+          f"{', account deleted' if account_deleted else ''} in {seconds}s")
+    return {"deleted": deleted[0], "account_deleted": account_deleted, "seconds": seconds}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archival, purge and vacuum tooling for the nutrition database")
+    parser.add_argument("--db", default="nutrition.db", help="Database path")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("status", help="Show file size, free pages and auto_vacuum mode")
+
+    archive = commands.add_parser("archive", help="Move old entries into an archive database")
+    archive.add_argument("--archive", default="nutrition_archive.db", help="Archive database path")
+    cutoff = archive.add_mutually_exclusive_group()
+    cutoff.add_argument("--before", help="Archive entries dated before YYYY-MM-DD")
+    cutoff.add_argument("--days", type=int, default=ARCHIVE_DAYS, help="Archive entries older than this many days")
+    archive.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    archive.add_argument("--max-rows", type=int, help="Stop after this many entries")
+    archive.add_argument("--vacuum", action="store_true", help="Run an incremental vacuum afterwards")
+
+    purge = commands.add_parser("purge", help="Delete a user's entries in batches")
+    purge.add_argument("user_id", type=int)
+    purge.add_argument("--delete-account", action="store_true", help="Also remove the users row")
+    purge.add_argument("--batch-size", type=int, default=PURGE_BATCH_SIZE)
+    purge.add_argument("--vacuum", action="store_true", help="Run an incremental vacuum afterwards")
+
+    commands.add_parser("enable-incremental", help="One-time VACUUM switching the file to auto_vacuum=INCREMENTAL")
+
+    vacuum = commands.add_parser("vacuum", help="Return free pages to the filesystem in short passes")
+    vacuum.add_argument("--max-pages", type=int, help="Stop after this many pages")
+    vacuum.add_argument("--step", type=int, default=VACUUM_STEP_PAGES, help="Pages per pass")
+
+    args = parser.parse_args()
+    db = NutritionDatabase(args.db, cache=False)
+
+    if args.command == "status":
+        status = storage_status(db)
+        print(f"📏 {args.db}: {format_bytes(status['file_bytes'])}, {status['page_count']} pages of "
+              f"{status['page_size']} B, {status['freelist_count']} free ({format_bytes(status['free_bytes'])}), "
+              f"auto_vacuum={status['auto_vacuum']}")
+    elif args.command == "archive":
+        before = args.before or (date.today() - timedelta(days=args.days)).isoformat()
+        archive_entries(db, args.archive, before, args.batch_size, max_rows=args.max_rows)
+        if args.vacuum:
+            incremental_vacuum(db)
+    elif args.command == "purge":
+        purge_user(db, args.user_id, args.delete_account, args.batch_size)
+        if args.vacuum:
+            incremental_vacuum(db)
+    elif args.command == "enable-incremental":
+        enable_incremental_vacuum(db)
+    else:
+        incremental_vacuum(db, args.max_pages, args.step)
+    db.close()
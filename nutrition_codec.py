@@ -0,0 +1,349 @@
+# nutrition_codec.py
+import json
+import re
+import struct
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+from nutrition_parser import NUTRIENT_FIELDS
+
+CODEC_VERSION = 1
+
+# Codes for the units a packed nutrient may carry (0 = bare number)
+UNITS = ("", "kcal", "g", "mg")
+UNIT_CODES = {unit: code for code, unit in enumerate(UNITS)}
+
+# Known sources are stored as one byte; anything else goes to the JSON tail
+SOURCES = (
+    "deepseek_api", "local_database", "text_extraction", "fallback_estimation",
+    "image_upload", "manual", "import",
+)
+SOURCE_CODES = {source: code for code, source in enumerate(SOURCES, 1)}
+
+# Presence bits after the per-nutrient bits
+NOTES_BIT = 1 << len(NUTRIENT_FIELDS)
+SOURCE_BIT = NOTES_BIT << 1
+ANALYZED_AT_BIT = NOTES_BIT << 2
+
+_HEADER = struct.Struct("<BH")          # version, presence mask
+_NUTRIENT = struct.Struct("<BI")        # unit code << 2 | decimals, decimal mantissa
+_NOTE_ID = struct.Struct("<I")
+_SOURCE = struct.Struct("<B")
+_TIMESTAMP = struct.Struct("<q")        # microseconds since 1970-01-01 (naive, as written)
+
+# Decoders for each presence mask, built on first use
+_LAYOUTS: Dict[int, tuple] = {}
+MAX_CACHED_TAILS = 65536        # distinct JSON tails kept parsed (mostly food name + portion pairs)
+
+_QUANTITY = re.compile(r"(\d+)(?:\.(\d{1,3}))?(?: (kcal|g|mg))?")
+_EPOCH = datetime(1970, 1, 1)
+_MICROS_PER_DAY = 86400 * 1000000
+
+def pack_quantity(value: Any) -> Optional[bytes]:
+    """'250 kcal' -> 5 bytes, or None when the string would not round-trip exactly"""
+    if not isinstance(value, str):
+        return None
+    match = _QUANTITY.fullmatch(value)
+    if not match:
+        return None
+    whole, fraction, unit = match.group(1), match.group(2) or "", match.group(3) or ""
+    mantissa = int(whole + fraction)
+    if mantissa > 0xFFFFFFFF:
+        return None
+    packed = _NUTRIENT.pack(UNIT_CODES[unit] << 2 | len(fraction), mantissa)
+    return packed if unpack_quantity(packed, 0) == value else None
+
+def unpack_quantity(blob: bytes, offset: int) -> str:
+    return format_quantity(*_NUTRIENT.unpack_from(blob, offset))
+
+@lru_cache(maxsize=65536)
+def format_quantity(meta: int, mantissa: int) -> str:
+    decimals = meta & 0b11
+    digits = str(mantissa)
+    if decimals:
+        digits = digits.rjust(decimals + 1, "0")
+        digits = f"{digits[:-decimals]}.{digits[-decimals:]}"
+    unit = UNITS[meta >> 2]
+    return f"{digits} {unit}" if unit else digits
+
+def pack_timestamp(value: Any) -> Optional[bytes]:
+    """datetime.isoformat() string -> 8 bytes, or None when it would not round-trip exactly"""
+    if not isinstance(value, str):
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if moment.tzinfo is not None:
+        return None
+    micros = (moment - _EPOCH) // timedelta(microseconds=1)
+    return _TIMESTAMP.pack(micros) if unpack_timestamp(micros) == value else None
+
+def unpack_timestamp(micros: int) -> str:
+    # Same text as datetime.isoformat(), without building a datetime per row
+    days, micros = divmod(micros, _MICROS_PER_DAY)
+    seconds, micros = divmod(micros, 1000000)
+    if micros:
+        return f"{day_prefix(days)}{time_of_day(seconds)}.{micros:06d}"
+    return day_prefix(days) + time_of_day(seconds)
+
+@lru_cache(maxsize=4096)
+def day_prefix(days: int) -> str:
+    return (_EPOCH + timedelta(days=days)).isoformat()[:11]
+
+@lru_cache(maxsize=86400)
+def time_of_day(seconds: int) -> str:
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+def mask_layout(mask: int) -> tuple:
+    """(struct for the header and every fixed-width field the mask marks present, packed nutrient names)"""
+    layout = _LAYOUTS.get(mask)
+    if layout is None:
+        fields = tuple(field for bit, field in enumerate(NUTRIENT_FIELDS) if mask & (1 << bit))
+        fmt = "<BH" + "BI" * len(fields)
+        fmt += "I" if mask & NOTES_BIT else ""
+        fmt += "B" if mask & SOURCE_BIT else ""
+        fmt += "q" if mask & ANALYZED_AT_BIT else ""
+        layout = _LAYOUTS[mask] = (struct.Struct(fmt), fields)
+    return layout
+
+def blob_note_id(blob: bytes) -> Optional[int]:
+    """Notes id a packed blob refers to, or None"""
+    version, mask = _HEADER.unpack_from(blob, 0)
+    if version != CODEC_VERSION or not mask & NOTES_BIT:
+        return None
+    layout, fields = mask_layout(mask)
+    return layout.unpack_from(blob, 0)[2 + 2 * len(fields)]
+
+@lru_cache(maxsize=MAX_CACHED_TAILS)
+def tail_items(tail: bytes) -> Optional[tuple]:
+    """
+    Parsed JSON tail as (key, value) pairs
+
+    Rows mostly repeat a few food name/portion tails, so these are parsed
+    once. None when a value is a list or dict: those must not be shared
+    between decoded rows and are parsed per row instead.
+    """
+    items = tuple(json.loads(tail.decode("utf-8")).items())
+    return None if any(isinstance(value, (dict, list)) for _, value in items) else items
+
+class NutritionCodec:
+    """
+    Versioned binary encoding of an entry's nutrition dict.
+
+    Layout (little-endian): version byte, 16-bit presence mask, then for each
+    present field in order a packed nutrient (unit/decimals byte + uint32
+    mantissa), a notes id into the nutrition_notes dictionary table, a source
+    code byte and an int64 timestamp. Every other key is kept in a compact JSON
+    tail. Encoding is exact: a value that would not decode to the same string
+    stays in the tail.
+
+    Note texts are deduplicated through nutrition_notes; ids never change, so
+    the id -> text mapping is cached for the life of the process.
+    """
+
+    def __init__(self, connection: Callable):
+        """
+        Args:
+            connection: Callable returning a context manager that yields a sqlite3 connection
+        """
+        self.connection = connection
+        self._note_ids: Dict[str, int] = {}
+        self._note_texts: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def note_id(self, text: str) -> int:
+        """Dictionary id for a notes text, inserting it on first use"""
+        with self._lock:
+            note_id = self._note_ids.get(text)
+        if note_id is not None:
+            return note_id
+
+        with self.connection() as conn:
+            conn.execute("INSERT INTO nutrition_notes (text) VALUES (?) ON CONFLICT (text) DO NOTHING", (text,))
+            conn.commit()
+            note_id = conn.execute("SELECT id FROM nutrition_notes WHERE text = ?", (text,)).fetchone()[0]
+        with self._lock:
+            self._note_ids[text] = note_id
+            self._note_texts[note_id] = text
+        return note_id
+
+    def register_notes(self, texts: Iterable[str]):
+        """Insert every unseen notes text in one transaction (bulk writers call this before encode)"""
+        with self._lock:
+            missing = {text for text in texts if text not in self._note_ids}
+        if not missing:
+            return
+
+        with self.connection() as conn:
+            conn.executemany("INSERT INTO nutrition_notes (text) VALUES (?) ON CONFLICT (text) DO NOTHING",
+                             [(text,) for text in missing])
+            conn.commit()
+            rows = []
+            missing = list(missing)
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows += conn.execute(f"SELECT id, text FROM nutrition_notes WHERE text IN ({', '.join('?' * len(chunk))})",
+                                     chunk).fetchall()
+        self.add_notes(rows)
+
+    def missing_note_ids(self, blobs: Iterable[Optional[bytes]]) -> Set[int]:
+        """Notes ids the blobs refer to that are not cached yet"""
+        ids = {blob_note_id(blob) for blob in blobs if blob}
+        return {note_id for note_id in ids if note_id is not None and note_id not in self._note_texts}
+
+    def add_notes(self, rows: Iterable[tuple]):
+        """Cache (id, text) rows of nutrition_notes read by the caller (e.g. on an async connection)"""
+        with self._lock:
+            for note_id, text in rows:
+                self._note_ids[text] = note_id
+                self._note_texts[note_id] = text
+
+    def note_text(self, note_id: int) -> str:
+        # Entries are only ever added, and a dict lookup is atomic, so hits need no lock
+        text = self._note_texts.get(note_id)
+        if text is not None:
+            return text
+
+        with self.connection() as conn:
+            row = conn.execute("SELECT text FROM nutrition_notes WHERE id = ?", (note_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"Unknown notes id {note_id}")
+        with self._lock:
+            self._note_texts[note_id] = row[0]
+            self._note_ids[row[0]] = note_id
+        return row[0]
+
+    def encode(self, nutrition: Dict[str, Any]) -> bytes:
+        mask = 0
+        parts = []
+        extras = dict(nutrition)
+
+        for bit, field in enumerate(NUTRIENT_FIELDS):
+            packed = pack_quantity(extras.get(field))
+            if packed is not None:
+                mask |= 1 << bit
+                parts.append(packed)
+                del extras[field]
+
+        notes = extras.get("notes")
+        if isinstance(notes, str):
+            mask |= NOTES_BIT
+            parts.append(_NOTE_ID.pack(self.note_id(notes)))
+            del extras["notes"]
+
+        source_code = SOURCE_CODES.get(extras.get("source")) if isinstance(extras.get("source"), str) else None
+        if source_code is not None:
+            mask |= SOURCE_BIT
+            parts.append(_SOURCE.pack(source_code))
+            del extras["source"]
+
+        timestamp = pack_timestamp(extras.get("analyzed_at"))
+        if timestamp is not None:
+            mask |= ANALYZED_AT_BIT
+            parts.append(timestamp)
+            del extras["analyzed_at"]
+
+        tail = json.dumps(extras, ensure_ascii=False, separators=(",", ":")).encode("utf-8") if extras else b""
+        return _HEADER.pack(CODEC_VERSION, mask) + b"".join(parts) + tail
+
+    def decode(self, blob: bytes) -> Dict[str, Any]:
+        version, mask = _HEADER.unpack_from(blob, 0)
+        if version != CODEC_VERSION:
+            raise ValueError(f"Unsupported nutrition encoding version {version}")
+
+        # One precompiled struct per mask reads the header and all fixed fields at once
+        layout, fields = mask_layout(mask)
+        values = layout.unpack_from(blob, 0)
+        tail = blob[layout.size:]
+
+        # Tail keys (food_name, portion_size, ...) come first, as in API responses
+        items = tail_items(tail) if tail else ()
+        nutrition = dict(items) if items is not None else json.loads(tail.decode("utf-8"))
+        position = 2 + 2 * len(fields)
+        nutrition.update(zip(fields, map(format_quantity, values[2:position:2], values[3:position:2])))
+
+        if mask & NOTES_BIT:
+            nutrition["notes"] = self.note_text(values[position])
+            position += 1
+        if mask & SOURCE_BIT:
+            nutrition["source"] = SOURCES[values[position] - 1]
+            position += 1
+        if mask & ANALYZED_AT_BIT:
+            nutrition["analyzed_at"] = unpack_timestamp(values[position])
+        return nutrition
+
+if __name__ == "__main__":
+    import os
+    import random
+    import sqlite3
+    import tempfile
+    import time
+    from contextlib import contextmanager
+
+    rng = random.Random(43)
+    foods = [line.strip() for line in open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "data",
+                                                        "class_names.txt"), encoding="utf-8") if line.strip()]
+
+    def sample_nutrition() -> Dict[str, Any]:
+        food = rng.choice(foods).replace("_", " ")
+        portion = rng.choice(["small", "normal", "large"])
+        source = rng.choice(["deepseek_api", "local_database", "fallback_estimation"])
+        return {
+            "food_name": food,
+            "portion_size": portion,
+            "calories": f"{rng.randint(80, 900)} kcal",
+            "protein": f"{rng.uniform(0, 40):.1f} g",
+            "fat": f"{rng.uniform(0, 35):.1f} g",
+            "carbs": f"{rng.uniform(0, 90):.1f} g",
+            "fiber": f"{rng.uniform(0, 8):.1f} g",
+            "sugar": f"{rng.uniform(0, 20):.1f} g",
+            "sodium": f"{rng.randint(0, 1500)} mg",
+            # Local and fallback notes repeat per food/portion; API notes are mostly unique
+            "notes": (f"Analisis {food} dengan porsi {portion}, perhatikan kandungan lemak dan natrium "
+                      f"{rng.randint(0, 10 ** 6) if source == 'deepseek_api' else ''}"),
+            "source": source,
+            "analyzed_at": datetime(2024, 1, 1, 12).isoformat() if rng.random() < 0.01 else
+            (datetime(2024, 1, 1) + timedelta(seconds=rng.randint(0, 10 ** 7), microseconds=rng.randint(1, 999999))).isoformat(),
+        }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "codec.db"), check_same_thread=False)
+        conn.execute("CREATE TABLE nutrition_notes (id INTEGER PRIMARY KEY, text TEXT NOT NULL UNIQUE)")
+
+        @contextmanager
+        def connection():
+            yield conn
+
+        codec = NutritionCodec(connection)
+        samples = [sample_nutrition() for _ in range(20000)]
+        samples.append({"calories": "12,5 kcal", "protein": 7, "notes": None, "analyzed_at": "2024-01-01T10:00",
+                        "extra": {"nested": [1, 2]}})
+
+        texts = [json.dumps(nutrition) for nutrition in samples]
+        blobs = [codec.encode(nutrition) for nutrition in samples]
+        mismatches = sum(codec.decode(blob) != nutrition for blob, nutrition in zip(blobs, samples))
+        print(f"{'✅' if not mismatches else '❌'} Round trip: {len(samples)} dicts, {mismatches} mismatches")
+
+        json_bytes = sum(len(text.encode("utf-8")) for text in texts) / len(texts)
+        blob_bytes = sum(len(blob) for blob in blobs) / len(blobs)
+        notes_bytes = conn.execute("SELECT TOTAL(LENGTH(text)) FROM nutrition_notes").fetchone()[0] / len(samples)
+        print(f"📦 Bytes per row: JSON {json_bytes:.0f}, packed {blob_bytes:.0f} "
+              f"(+{notes_bytes:.0f} amortized in nutrition_notes)")
+
+        def best_rate(decode, items, rounds: int = 5) -> float:
+            """Rows/s of the fastest of several passes (the others are mostly scheduler noise)"""
+            best = float("inf")
+            for _ in range(rounds):
+                start = time.perf_counter()
+                for item in items:
+                    decode(item)
+                best = min(best, time.perf_counter() - start)
+            return len(items) / best
+
+        json_rate = best_rate(json.loads, texts)
+        blob_rate = best_rate(codec.decode, blobs)
+        print(f"⏱️ Decode: json.loads {json_rate:,.0f} rows/s, codec {blob_rate:,.0f} rows/s")
@@ -0,0 +1,191 @@
+# nutrition_kb.py
+import csv
+import os
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from text_index import TrigramIndex, is_typo_of, normalize_food_name
+
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "nutrition_table.csv")
+
+NUTRIENT_UNITS = {
+    "calories": "kcal",
+    "protein": "g",
+    "fat": "g",
+    "carbs": "g",
+    "fiber": "g",
+    "sugar": "g",
+    "sodium": "mg",
+}
+
+PORTION_FACTORS = {"small": 0.7, "kecil": 0.7, "normal": 1.0, "sedang": 1.0, "large": 1.3, "besar": 1.3}
+
+class NutritionKnowledgeBase:
+    def __init__(self, table_path: str = DEFAULT_TABLE_PATH, min_score: float = 0.72):
+        """
+        Local per-100g nutrition table with exact and fuzzy (trigram) lookup
+
+        Args:
+            table_path: CSV file with one food per row (values per 100 g)
+            min_score: Minimum trigram similarity for a fuzzy match to count as confident
+        """
+        self.table_path = table_path
+        self.min_score = min_score
+        self.foods: Dict[str, Dict[str, Any]] = {}
+        self._names: Dict[str, str] = {}  # normalized name/alias -> canonical name
+        self._index = TrigramIndex()
+        self.load_table(table_path)
+
+    def load_table(self, table_path: str):
+        """Load the nutrition table and build the lookup index"""
+        if not os.path.exists(table_path):
+            print(f"⚠️ Nutrition table not found: {table_path}")
+            return
+
+        try:
+            with open(table_path, "r", encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f):
+                    name = row["name"].strip()
+                    self.foods[name] = {
+                        "name": name,
+                        "serving_g": float(row["serving_g"]),
+                        **{field: float(row[field]) for field in NUTRIENT_UNITS},
+                    }
+                    aliases = [a for a in row.get("aliases", "").split(";") if a.strip()]
+                    for key in [name] + aliases:
+                        normalized = normalize_food_name(key)
+                        # First row wins, so a dish name is never shadowed by a later alias
+                        if normalized and normalized not in self._names:
+                            self._names[normalized] = name
+                            self._index.add(normalized)
+            print(f"✅ Loaded {len(self.foods)} foods into local nutrition table")
+        except Exception as e:
+            print(f"❌ Error loading nutrition table: {e}")
+
+    def __len__(self):
+        return len(self.foods)
+
+    def match(self, food_name: str) -> Optional[Tuple[str, float]]:
+        """
+        Find the table entry for a food name
+
+        A fuzzy hit only counts when the name is a typo of the table entry
+        (see is_typo_of): "nasi goreng kambing" or "burger king" is another
+        dish, so it goes to the API rather than borrowing the base dish's values.
+
+        Returns:
+            (canonical_name, score) for a confident match, otherwise None
+        """
+        normalized = normalize_food_name(food_name)
+        if not normalized:
+            return None
+
+        canonical = self._names.get(normalized)
+        if canonical:
+            return canonical, 1.0
+
+        for key, score in self._index.search(normalized, limit=5, min_score=self.min_score):
+            if is_typo_of(normalized, key):
+                return self._names[key], score
+        return None
+
+    def suggest(self, food_name: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """Closest table entries for a food name, without the confidence cut-off"""
+        seen = {}
+        for key, score in self._index.search(normalize_food_name(food_name), limit=limit * 2):
+            canonical = self._names[key]
+            seen.setdefault(canonical, score)
+        return list(seen.items())[:limit]
+
+    def lookup(self, food_name: str, portion_size: str = "normal") -> Optional[Dict[str, Any]]:
+        """
+        Nutrition for a food from the local table, scaled to a serving
+
+        Args:
+            food_name: Name of the food
+            portion_size: Size of portion (small, normal, large)
+
+        Returns:
+            Nutrition dictionary in the same shape as the API result, or None if unknown
+        """
+        matched = self.match(food_name)
+        if not matched:
+            return None
+
+        canonical, score = matched
+        food = self.foods[canonical]
+        factor = PORTION_FACTORS.get(portion_size.lower(), 1.0)
+        grams = food["serving_g"] * factor
+        scale = grams / 100.0
+
+        result = {"food_name": food_name, "portion_size": portion_size}
+        for field, unit in NUTRIENT_UNITS.items():
+            value = food[field] * scale
+            if unit == "g":
+                result[field] = f"{value:.1f} {unit}"
+            else:
+                result[field] = f"{value:.0f} {unit}"
+
+        result.update({
+            "serving_grams": round(grams),
+            "notes": f"Data tabel gizi lokal untuk {canonical} (±{grams:.0f} g per porsi {portion_size})",
+            "source": "local_database",
+            "match_name": canonical,
+            "match_score": round(score, 3),
+            "analyzed_at": datetime.now().isoformat(),
+        })
+        return result
+
+# Singleton instance
+nutrition_kb = None
+
+def get_nutrition_kb(table_path: str = DEFAULT_TABLE_PATH):
+    """Get or create the local nutrition knowledge base"""
+    global nutrition_kb
+    if nutrition_kb is None:
+        nutrition_kb = NutritionKnowledgeBase(table_path)
+    return nutrition_kb
+
+if __name__ == "__main__":
+    import time
+
+    kb = get_nutrition_kb()
+    for query in ["Nasi Goreng", "nasi gorng", "fried chicken", "sate kambing", "pasta carbonara"]:
+        print(f"🔎 {query!r}: {kb.match(query)}")
+
+    # Typos find the dish; more specific dishes (as in food_index.py's checks) find nothing
+    match_cases = [
+        ("nasi gorng", "nasi goreng"),
+        ("Nasi  Goreng!", "nasi goreng"),
+        ("ayam bkar", "ayam bakar"),
+        ("rendan", "rendang"),
+        ("pasta carbonara", None),
+        ("nasi goreng kambing", None),
+        ("nasi goreng seafood", None),
+        ("ayam goreng kremes", None),
+        ("ayam goreng kalasan", None),
+        ("sate ayam madura", None),
+        ("mie goreng jawa", None),
+        ("burger king", None),
+        ("pizza hut", None),
+    ]
+    failures = 0
+    for query, expected in match_cases:
+        matched = kb.match(query)
+        got = matched[0] if matched else None
+        if got != expected:
+            failures += 1
+            print(f"❌ match({query!r}) = {got!r}, expected {expected!r}")
+    print(f"{'✅' if not failures else '❌'} Matches: {len(match_cases)} cases, {failures} mismatches")
+
+    rounds = 100000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        kb.lookup("nasi goreng", "normal")
+    exact_us = (time.perf_counter() - start) / rounds * 1e6
+
+    start = time.perf_counter()
+    for _ in range(rounds // 10):
+        kb.lookup("nasi gorng", "normal")
+    fuzzy_us = (time.perf_counter() - start) / (rounds // 10) * 1e6
+    print(f"⏱️ Exact lookup: {exact_us:.1f} µs, fuzzy lookup: {fuzzy_us:.1f} µs")
@@ -0,0 +1,225 @@
+# nutrition_parser.py
+import json
+import re
+from typing import Any, Dict, NamedTuple, Optional
+
+NUTRIENT_FIELDS = ("calories", "protein", "fat", "carbs", "fiber", "sugar", "sodium")
+
+DEFAULT_UNITS = {
+    "calories": "kcal",
+    "protein": "g",
+    "fat": "g",
+    "carbs": "g",
+    "fiber": "g",
+    "sugar": "g",
+    "sodium": "mg",
+}
+
+# Spellings seen in responses -> canonical unit
+UNIT_ALIASES = {
+    "kcal": "kcal", "kkal": "kcal", "kal": "kcal", "cal": "kcal", "kalori": "kcal", "calories": "kcal",
+    "g": "g", "gr": "g", "gram": "g", "grams": "g",
+    "mg": "mg", "miligram": "mg", "milligram": "mg", "milligrams": "mg",
+}
+
+# Words in free text that introduce a nutrient value
+NUTRIENT_KEYWORDS = {
+    "calories": "calories", "calorie": "calories", "kalori": "calories", "energi": "calories", "energy": "calories",
+    "protein": "protein",
+    "fat": "fat", "lemak": "fat",
+    "carbs": "carbs", "carb": "carbs", "carbohydrate": "carbs", "carbohydrates": "carbs",
+    "karbohidrat": "carbs", "karbo": "carbs",
+    "fiber": "fiber", "fibre": "fiber", "serat": "fiber",
+    "sugar": "sugar", "sugars": "sugar", "gula": "sugar",
+    "sodium": "sodium", "natrium": "sodium",
+}
+
+_FENCE = re.compile(r"```(?:json)?", re.IGNORECASE)
+# '1,200' (comma before exactly three trailing digits) is a thousands separator; '12,5' is a decimal comma
+_NUMBER = r"(\d{1,3}(?:,\d{3})+(?:\.\d+)?(?![\d,])|\d+(?:[.,]\d+)?)"
+_THOUSANDS = re.compile(r"\d{1,3}(?:,\d{3})+(?:\.\d+)?")
+_UNIT = r"(kcal|kkal|kalori|kal|calories|cal|milligrams|milligram|miligram|mg|grams|gram|gr|g)(?![^\W\d_])"
+_QUANTITY = re.compile(_NUMBER + r"\s*(?:" + _UNIT + ")?", re.IGNORECASE)
+_TOKEN = re.compile(r"(?P<word>[^\W\d_]+)|" + _NUMBER + r"\s*(?:" + _UNIT + ")?", re.IGNORECASE)
+
+# A keyword only claims a number that follows within this many words
+_KEYWORD_REACH = 6
+
+# '<word> 100 g' is a reference amount ("protein per 100 g ... 8 g"), not a value
+_REFERENCE_WORDS = {"per", "tiap", "setiap"}
+
+class Nutrient(NamedTuple):
+    value: float
+    unit: str
+
+    def scaled(self, factor: float) -> "Nutrient":
+        return Nutrient(self.value * factor, self.unit)
+
+    def format(self, decimals: int = 1) -> str:
+        return f"{self.value:.{decimals}f} {self.unit}"
+
+def _to_float(number: str) -> float:
+    if _THOUSANDS.fullmatch(number):
+        return float(number.replace(",", ""))
+    return float(number.replace(",", "."))
+
+def parse_quantity(value: Any, default_unit: str = "") -> Optional[Nutrient]:
+    """
+    Parse a nutrient value such as '250 kcal', '12,5g', 30 or '~200 kal'
+
+    Returns:
+        Nutrient(value, unit) with a canonical unit, or None if there is no number
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return Nutrient(float(value), default_unit)
+    if not isinstance(value, str):
+        return None
+
+    match = _QUANTITY.search(value)
+    if not match:
+        return None
+    unit = match.group(2)
+    return Nutrient(_to_float(match.group(1)), UNIT_ALIASES[unit.lower()] if unit else default_unit)
+
+def normalize_nutrients(data: Dict[str, Any]) -> Dict[str, Nutrient]:
+    """Typed (value, unit) record for every nutrient field present in a response dict"""
+    nutrients = {}
+    for field in NUTRIENT_FIELDS:
+        if field in data:
+            quantity = parse_quantity(data[field], DEFAULT_UNITS[field])
+            if quantity is not None:
+                nutrients[field] = quantity
+    return nutrients
+
+def parse_json_response(content: str) -> Optional[Dict[str, Any]]:
+    """
+    Decode a model response that should be a JSON object
+
+    Strips markdown fences and surrounding chatter; returns None if no object can be decoded.
+    """
+    text = _FENCE.sub("", content).strip()
+    try:
+        data = json.loads(text)
+        return data if isinstance(data, dict) else None
+    except json.JSONDecodeError:
+        pass
+
+    start, end = text.find("{"), text.rfind("}")
+    if 0 <= start < end:
+        try:
+            data = json.loads(text[start:end + 1])
+            return data if isinstance(data, dict) else None
+        except json.JSONDecodeError:
+            pass
+    return None
+
+def extract_nutrients_from_text(text: str) -> Dict[str, Nutrient]:
+    """
+    Pull nutrient values out of free text in a single left-to-right pass
+
+    A number is assigned to the most recent nutrient keyword within reach;
+    a bare '<n> kcal' counts as calories.
+    """
+    nutrients: Dict[str, Nutrient] = {}
+    pending = None
+    distance = 0
+    reference = False
+
+    for match in _TOKEN.finditer(text):
+        word = match.group("word")
+        if word is not None:
+            reference = word.lower() in _REFERENCE_WORDS
+            field = NUTRIENT_KEYWORDS.get(word.lower())
+            if field is not None:
+                pending, distance = field, 0
+            elif pending is not None:
+                distance += 1
+                if distance > _KEYWORD_REACH:
+                    pending = None
+            continue
+        if reference:
+            reference = False
+            continue
+
+        unit = match.group(3)
+        unit = UNIT_ALIASES[unit.lower()] if unit else None
+        if pending is not None and pending not in nutrients:
+            nutrients[pending] = Nutrient(_to_float(match.group(2)), unit or DEFAULT_UNITS[pending])
+            pending = None
+        elif unit == "kcal" and "calories" not in nutrients:
+            nutrients["calories"] = Nutrient(_to_float(match.group(2)), unit)
+
+    return nutrients
+
+if __name__ == "__main__":
+    import os
+    import random
+    import time
+
+    corpus_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "response_corpus.jsonl")
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    # 1. Expected values
+    failures = 0
+    for case in corpus:
+        data = parse_json_response(case["content"])
+        nutrients = normalize_nutrients(data) if data is not None else extract_nutrients_from_text(case["content"])
+        got = {field: [n.value, n.unit] for field, n in nutrients.items()}
+        for field, expected in case.get("expect", {}).items():
+            if got.get(field) != expected:
+                failures += 1
+                print(f"❌ {case['name']}: {field} = {got.get(field)}, expected {expected}")
+    print(f"{'✅' if not failures else '❌'} Corpus: {len(corpus)} cases, {failures} mismatches")
+
+    # 2. Fuzz: truncations and byte-level mutations must never raise
+    rng = random.Random(1234)
+    alphabet = '{}[]":,.0123456789 kcalgm\n\\'
+    fuzz_cases = 0
+    for case in corpus:
+        content = case["content"]
+        for _ in range(200):
+            mutated = list(content[:rng.randint(0, len(content))])
+            for _ in range(rng.randint(0, 5)):
+                if mutated:
+                    mutated[rng.randrange(len(mutated))] = rng.choice(alphabet)
+            mutated = "".join(mutated)
+            data = parse_json_response(mutated)
+            if data is not None:
+                normalize_nutrients(data)
+            extract_nutrients_from_text(mutated)
+            fuzz_cases += 1
+    print(f"✅ Fuzz: {fuzz_cases} mutated responses parsed without errors")
+
+    # 3. Benchmark against the previous per-field lazy regex scans
+    legacy_patterns = {
+        'calories': r'(\d+)\s*kcal|kalori.*?(\d+)',
+        'protein': r'protein.*?(\d+\.?\d*)\s*g',
+        'fat': r'fat.*?(\d+\.?\d*)\s*g|lemak.*?(\d+\.?\d*)\s*g',
+        'carbs': r'carbs.*?(\d+\.?\d*)\s*g|karbohidrat.*?(\d+\.?\d*)\s*g',
+        'fiber': r'fiber.*?(\d+\.?\d*)\s*g|serat.*?(\d+\.?\d*)\s*g',
+        'sugar': r'sugar.*?(\d+\.?\d*)\s*g|gula.*?(\d+\.?\d*)\s*g'
+    }
+    texts = [case["content"] for case in corpus]
+    texts.append("protein " + "lemak serat gula 1 " * 300)
+
+    rounds = 20
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            for pattern in legacy_patterns.values():
+                re.search(pattern, text, re.IGNORECASE)
+    legacy_ms = (time.perf_counter() - start) * 1000 / rounds
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            data = parse_json_response(text)
+            if data is not None:
+                normalize_nutrients(data)
+            else:
+                extract_nutrients_from_text(text)
+    single_pass_ms = (time.perf_counter() - start) * 1000 / rounds
+    print(f"⏱️ Corpus pass: legacy regex scans {legacy_ms:.2f} ms, single-pass parser {single_pass_ms:.2f} ms")
@@ -0,0 +1,215 @@
+# nutrition_stats.py
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from database import NutritionDatabase
+
+# Same daily targets the home page shows
+CALORIES_PER_KG = 30
+DEFAULT_WATER_TARGET = 2000     # ml
+DEFAULT_EXERCISE_TARGET = 30    # minutes
+CALORIE_TOLERANCE = 0.10        # a day "meets" the calorie goal within ±10%
+
+ROLLING_WINDOWS = (7, 30)
+MACRO_KCAL_PER_GRAM = {"protein": 4.0, "carbs": 4.0, "fat": 9.0}
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+DAILY_COLUMNS = ["entry_count", "calories", "protein", "fat", "carbs", "water", "exercise"]
+
+def user_targets(profile: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Daily calorie, water and exercise targets for a user profile"""
+    weight = (profile or {}).get("weight") or 65
+    return {
+        "calories": float(weight * CALORIES_PER_KG),
+        "water": float(DEFAULT_WATER_TARGET),
+        "exercise": float(DEFAULT_EXERCISE_TARGET),
+    }
+
+def daily_frame(rows) -> pd.DataFrame:
+    """
+    Per-day totals on a continuous calendar index
+
+    Days without entries are NaN rather than 0 so means only count logged days.
+    """
+    frame = pd.DataFrame.from_records(rows, columns=["date"] + DAILY_COLUMNS)
+    if frame.empty:
+        return frame.set_index("date")
+    frame["date"] = pd.to_datetime(frame["date"], errors="coerce")
+    frame = frame.dropna(subset=["date"]).set_index("date").sort_index()
+    calendar = pd.date_range(frame.index.min(), frame.index.max(), freq="D")
+    return frame.reindex(calendar).astype("float64")
+
+def rolling_means(daily: pd.DataFrame) -> pd.DataFrame:
+    """Trailing 7- and 30-day means of the logged days for each nutrient"""
+    columns = {}
+    for window in ROLLING_WINDOWS:
+        rolled = daily[DAILY_COLUMNS[1:]].rolling(window, min_periods=1).mean()
+        for name in rolled.columns:
+            columns[f"{name}_{window}d"] = rolled[name]
+    return pd.DataFrame(columns, index=daily.index)
+
+def macro_ratios(daily: pd.DataFrame) -> Dict[str, float]:
+    """Share of macro energy from protein, carbs and fat over all logged days"""
+    grams = daily[list(MACRO_KCAL_PER_GRAM)].sum()
+    kcal = grams * pd.Series(MACRO_KCAL_PER_GRAM)
+    total = kcal.sum()
+    if not total:
+        return {name: 0.0 for name in MACRO_KCAL_PER_GRAM}
+    return {name: round(float(value / total), 4) for name, value in kcal.items()}
+
+def streaks(logged: np.ndarray, days_since_last: int = 0) -> Dict[str, int]:
+    """
+    Current and longest run of consecutive logged days
+
+    The last run only counts as current while it can still be extended:
+    its last day must be today or yesterday (days_since_last <= 1).
+    """
+    if not logged.any():
+        return {"current": 0, "longest": 0}
+    # Run boundaries are where the logged flag flips
+    padded = np.concatenate(([False], logged, [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    lengths = edges[1::2] - edges[::2]
+    return {"current": int(lengths[-1]) if days_since_last <= 1 else 0, "longest": int(lengths.max())}
+
+def weekday_profile(daily: pd.DataFrame) -> pd.DataFrame:
+    """Mean logged-day totals per weekday, Monday first"""
+    logged = daily.dropna(subset=["entry_count"])
+    profile = logged[DAILY_COLUMNS[1:]].groupby(logged.index.day_name()).mean()
+    return profile.reindex(WEEKDAYS)
+
+def goal_adherence(daily: pd.DataFrame, targets: Dict[str, float]) -> Dict[str, float]:
+    """Fraction of logged days meeting each target"""
+    logged = daily.dropna(subset=["entry_count"])
+    if logged.empty:
+        return {"calories": 0.0, "water": 0.0, "exercise": 0.0}
+    calories = np.abs(logged["calories"].to_numpy() - targets["calories"]) <= targets["calories"] * CALORIE_TOLERANCE
+    water = logged["water"].to_numpy() >= targets["water"]
+    exercise = logged["exercise"].to_numpy() >= targets["exercise"]
+    return {
+        "calories": round(float(calories.mean()), 4),
+        "water": round(float(water.mean()), 4),
+        "exercise": round(float(exercise.mean()), 4),
+    }
+
+def compute_stats(rows, targets: Dict[str, float], today: Optional[date] = None) -> Dict[str, Any]:
+    """All dashboard statistics from per-day total rows (date, entry_count, calories, ...) as of today"""
+    daily = daily_frame(rows)
+    if daily.empty:
+        return {
+            "days_logged": 0, "targets": targets, "daily": daily, "rolling": pd.DataFrame(),
+            "macro_ratios": macro_ratios(pd.DataFrame(columns=list(MACRO_KCAL_PER_GRAM))),
+            "streaks": {"current": 0, "longest": 0}, "weekday": pd.DataFrame(),
+            "adherence": goal_adherence(daily, targets), "averages": {},
+        }
+
+    logged = daily["entry_count"].notna().to_numpy()
+    days_since_last = (pd.Timestamp(today or date.today()) - daily.index.max()).days
+    return {
+        "days_logged": int(logged.sum()),
+        "targets": targets,
+        "daily": daily,
+        "rolling": rolling_means(daily),
+        "macro_ratios": macro_ratios(daily),
+        "streaks": streaks(logged, days_since_last),
+        "weekday": weekday_profile(daily),
+        "adherence": goal_adherence(daily, targets),
+        "averages": {name: round(float(value), 1) for name, value in daily[DAILY_COLUMNS[1:]].mean().items()},
+    }
+
+class NutritionStats:
+    """
+    Vectorized per-user statistics over the daily_totals rollup.
+
+    Results are cached per (user_id, last_entry_id, entry_count, targets, day),
+    so repeat dashboard views cost one index lookup and one (cached) profile
+    read until the user's entries or profile change, or the day rolls over
+    (which can end the current streak). Cached results are shared: treat the
+    returned frames as read-only.
+    """
+
+    def __init__(self, db: NutritionDatabase, max_users: int = 256):
+        self.db = db
+        self.max_users = max_users
+        self._cache: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_stats(self, user_id: int) -> Dict[str, Any]:
+        today = date.today()
+        targets = user_targets(self.db.get_user_profile(user_id))
+        entry_version = self.db.get_entry_version(user_id)
+        version = (entry_version, tuple(sorted(targets.items())), today)
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached is not None and cached[0] == version:
+                self._cache.move_to_end(user_id)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        stats = compute_stats(self.db.get_daily_totals_range(user_id), targets, today)
+        stats["last_entry_id"] = entry_version[0]
+
+        with self._lock:
+            self._cache[user_id] = (version, stats)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.max_users:
+                self._cache.popitem(last=False)
+        return stats
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "cached_users": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+if __name__ == "__main__":
+    import io
+    import os
+    import tempfile
+    import time
+    from contextlib import redirect_stdout
+    from datetime import timedelta
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with redirect_stdout(io.StringIO()):
+            db = NutritionDatabase(os.path.join(tmp, "stats.db"))
+            user_id = db.create_user("stats@example.com", "stats123", "Stats")
+            rng = np.random.default_rng(7)
+            start = date.today() - timedelta(days=729)
+            # Two years, skipping roughly one day in six
+            db.add_daily_entries_bulk((
+                {
+                    "food": "Nasi Goreng",
+                    "date": (start + timedelta(days=day)).isoformat(),
+                    "nutrition": {"calories": f"{rng.normal(650, 150):.0f} kcal", "protein": "20 g",
+                                  "fat": "18 g", "carbs": "90 g"},
+                    "water": 750,
+                    "exercise": int(rng.integers(0, 20)),
+                }
+                for day in range(730) if rng.random() > 1 / 6 for _ in range(3)
+            ), user_id=user_id)
+
+        stats_cache = NutritionStats(db)
+        t0 = time.perf_counter()
+        stats = stats_cache.get_stats(user_id)
+        cold_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        stats_cache.get_stats(user_id)
+        warm_ms = (time.perf_counter() - t0) * 1000
+
+        print(f"📅 Days logged: {stats['days_logged']}, streaks: {stats['streaks']}")
+        print(f"🥗 Macro energy split: {stats['macro_ratios']}")
+        print(f"🎯 Goal adherence: {stats['adherence']}")
+        print(stats["weekday"][["calories", "water", "exercise"]].round(1).to_string())
+        print(f"⏱️ Cold {cold_ms:.1f} ms, cached {warm_ms:.2f} ms ({stats_cache.get_cache_stats()})")
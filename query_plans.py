@@ -0,0 +1,167 @@
+# query_plans.py
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List, Optional, Tuple
+
+from database import (
+    NutritionDatabase, DAILY_TOTALS_SCHEMA, ENTRY_INDEXES, REBUILD_DAILY_TOTALS_SQL, REBUILD_ROW_COUNTS_SQL,
+    ROW_COUNTS_SCHEMA
+)
+
+ENTRIES_PER_USER = 1000
+DAYS = 1095
+
+# Plan details that mean a hot query degrades with table size: any SCAN (of a
+# table or a whole index) and any temp sort. "SCAN CONSTANT ROW" is the single
+# row a SELECT of scalar subqueries runs on, not a table.
+TEMP_SORT = "USE TEMP B-TREE"
+CONSTANT_ROW = "SCAN CONSTANT ROW"
+
+# Scans a hot call may still do, per call name, each with the reason it is bounded:
+# {"call name": {"SCAN table ...": "why this stays small"}}. Empty: none are needed.
+ALLOWED_SCANS: Dict[str, Dict[str, str]] = {}
+
+SYNTHETIC_ENTRIES_SQL = f'''
+WITH RECURSIVE seq(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n < ? - 1)
+INSERT INTO daily_entries
+(user_id, date, food_name, portion, calories, protein, fat, carbs, water_ml, exercise_min, created_at)
+SELECT n / {ENTRIES_PER_USER} + 1,
+       date('2023-01-01', '+' || ((n * 7919) % {DAYS}) || ' days'),
+       'Food ' || (n % 127),
+       'Normal',
+       100 + n % 500, n % 30, n % 25, n % 80, (n % 4) * 250, n % 45,
+       datetime('2023-01-01', '+' || ((n * 7919) % {DAYS}) || ' days', '+' || (n % 86400) || ' seconds')
+FROM seq
+'''
+
+class TracedDatabase(NutritionDatabase):
+    """NutritionDatabase that records every SQL statement its connections run"""
+
+    def __init__(self, db_path: str):
+        self.statements: List[str] = []
+        # Every call has to reach SQLite to be traced
+        super().__init__(db_path, cache=False)
+
+    def get_connection(self):
+        conn = super().get_connection()
+        # Bound parameters arrive already expanded into the statement text
+        conn.set_trace_callback(self.statements.append)
+        return conn
+
+def build_synthetic_database(db_path: str, rows: int):
+    """Fill a fresh database with rows entries spread over rows / ENTRIES_PER_USER users"""
+    users = max(1, rows // ENTRIES_PER_USER)
+    with redirect_stdout(io.StringIO()):
+        db = NutritionDatabase(db_path)
+
+    start = time.perf_counter()
+    with db.connection() as conn:
+        # Load without indexes or triggers, then recreate them
+        conn.execute("DROP TRIGGER IF EXISTS trg_daily_totals_insert")
+        conn.execute("DROP TRIGGER IF EXISTS trg_row_counts_entry_insert")
+        for statement in ENTRY_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {statement.split()[5]}")
+        conn.execute(
+            "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?) "
+            "INSERT INTO users (email, password_hash, name) "
+            "SELECT 'user' || n || '@example.com', 'x', 'User ' || n FROM seq",
+            (users,)
+        )
+        conn.execute(SYNTHETIC_ENTRIES_SQL, (rows,))
+        conn.execute("DELETE FROM daily_totals")
+        conn.execute(REBUILD_DAILY_TOTALS_SQL)
+        conn.execute(REBUILD_ROW_COUNTS_SQL)
+        conn.commit()
+    print(f"   … {rows} entries loaded in {time.perf_counter() - start:.1f}s")
+
+    with db.connection() as conn:
+        for statement in DAILY_TOTALS_SCHEMA + ROW_COUNTS_SCHEMA + ENTRY_INDEXES:
+            conn.execute(statement)
+        conn.execute("ANALYZE")
+        conn.commit()
+    db.close()
+    print(f"   … indexes and statistics built after {time.perf_counter() - start:.1f}s")
+
+def hot_calls(db: NutritionDatabase) -> List[Tuple[str, Callable]]:
+    """The queries the app runs on every page view, with representative arguments"""
+    user_id = 1
+    date = "2024-06-15"
+    first_page = db.get_entries_page(user_id, page_size=20)
+    return [
+        ("get_daily_entries(date)", lambda: db.get_daily_entries(user_id, date)),
+        ("get_daily_entries(all)", lambda: db.get_daily_entries(user_id)),
+        ("query_entries(recent)", lambda: db.query_entries(user_id, date, columns=('food_name', 'calories'), limit=3)),
+        ("get_entries_page(first)", lambda: db.get_entries_page(user_id, page_size=20)),
+        ("get_entries_page(next)", lambda: db.get_entries_page(user_id, first_page['next_cursor'], page_size=20)),
+        ("get_user_summary(all)", lambda: db.get_user_summary(user_id)),
+        ("get_user_summary(range)", lambda: db.get_user_summary(user_id, "2024-01-01", "2024-03-31")),
+        ("get_daily_totals", lambda: db.get_daily_totals(user_id, date)),
+        ("get_daily_totals_range", lambda: db.get_daily_totals_range(user_id)),
+        ("get_entry_version", lambda: db.get_entry_version(user_id)),
+        ("get_user_profile", lambda: db.get_user_profile(user_id)),
+        ("user_exists", lambda: db.user_exists("user1@example.com")),
+        ("get_database_stats", lambda: db.get_database_stats()),
+    ]
+
+def plan_problems(plan: List[str], allowed: Optional[Dict[str, str]] = None) -> List[str]:
+    """Plan lines that scan or temp-sort, except the scans in allowed"""
+    problems = []
+    for detail in plan:
+        if TEMP_SORT in detail:
+            problems.append(detail)
+        elif detail.startswith("SCAN") and detail != CONSTANT_ROW and detail not in (allowed or {}):
+            problems.append(detail)
+    return problems
+
+def check_query_plans(db_path: str) -> Dict[str, List[str]]:
+    """
+    Run every hot call, EXPLAIN QUERY PLAN each SELECT it issued
+
+    Returns:
+        Offending plan lines per call (empty dict when every plan is an index search)
+    """
+    with redirect_stdout(io.StringIO()):
+        db = TracedDatabase(db_path)
+        calls = hot_calls(db)
+    failures = {}
+
+    for name, call in calls:
+        db.statements.clear()
+        with redirect_stdout(io.StringIO()):
+            call()
+        selects = [sql.strip() for sql in db.statements if sql.lstrip().upper().startswith(("SELECT", "WITH"))]
+
+        with db.connection() as conn:
+            for sql in selects:
+                plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+                problems = plan_problems(plan, ALLOWED_SCANS.get(name))
+                print(f"{'❌' if problems else '✅'} {name}: {' | '.join(plan)}")
+                if problems:
+                    failures.setdefault(name, []).extend(problems)
+
+    db.close()
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that hot queries stay on index searches")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Synthetic daily entries")
+    parser.add_argument("--db", help="Reuse (or create) this synthetic database instead of a temporary one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "query_plans.db")
+        if not os.path.exists(db_path):
+            print(f"🏗️ Building synthetic database with {args.rows} entries")
+            build_synthetic_database(db_path, args.rows)
+
+        failures = check_query_plans(db_path)
+
+    if failures:
+        print(f"❌ {len(failures)} hot queries fall back to a scan or temp sort")
+        sys.exit(1)
+    print("✅ All hot queries use index searches")
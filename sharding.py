@@ -0,0 +1,483 @@
+# sharding.py
+import argparse
+import os
+import threading
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from database import (
+    DEFAULT_PAGE_SIZE, ENTRY_COLUMNS, PURGE_BATCH_SIZE, PROFILE_CACHE_TTL, EntryRow, NutritionDatabase
+)
+
+DEFAULT_SHARDS = 4
+MOVE_BATCH_SIZE = 2000
+ROUTING_CACHE_TTL = PROFILE_CACHE_TTL
+
+# Users moved off their hash shard; lives in the central database
+SHARD_ROUTING_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS shard_routing (
+    user_id INTEGER PRIMARY KEY,
+    shard INTEGER NOT NULL,
+    moved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+'''
+
+# Every stored entry column except the per-shard id
+MOVE_COLUMNS = [name for name in ENTRY_COLUMNS if name != 'id']
+
+def shard_paths(db_path: str, shards: int) -> List[str]:
+    """nutrition.db -> nutrition.shard0.db, nutrition.shard1.db, ..."""
+    root, ext = os.path.splitext(db_path)
+    return [f"{root}.shard{i}{ext or '.db'}" for i in range(shards)]
+
+def hash_shard(user_id: int, shards: int) -> int:
+    """Stable across processes and Python versions, unlike hash()"""
+    return zlib.crc32(str(user_id).encode('ascii')) % shards
+
+class ShardedNutritionDatabase:
+    """
+    NutritionDatabase with daily entries partitioned across several SQLite files.
+
+    The users table stays in the central file (db_path); each user's entries,
+    daily_totals and nutrition notes live in one shard file, chosen by a hash
+    of user_id unless shard_routing pins the user elsewhere. Per-user calls go
+    to that shard only, so writers for different shards never share a lock;
+    global statistics fan out to all shards in parallel.
+
+    move_user relocates a user online. Per-user calls in this process wait
+    while the move switches over; other processes writing the same files
+    should be stopped for the switch, or cleaned up afterwards with
+    `python sharding.py repair`.
+    """
+
+    def __init__(self, db_path: str = "nutrition.db", shards: int = DEFAULT_SHARDS, pool_size: int = 8,
+                 cache: bool = True, write_behind: bool = False):
+        """
+        Args:
+            db_path: Central database with the users table; shard files are named after it
+            shards: Number of shard files
+            pool_size: Connections per file
+            cache: Cache profiles, routing, entries and stats in memory
+            write_behind: One background writer per shard for add_daily_entry
+        """
+        self.db_path = db_path
+        self.central = NutritionDatabase(db_path, pool_size, cache)
+        self.shards = [NutritionDatabase(path, pool_size, cache, write_behind) for path in shard_paths(db_path, shards)]
+        with self.central.connection() as conn:
+            conn.execute(SHARD_ROUTING_SCHEMA)
+            conn.commit()
+        self._pool = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="nutrition-shard")
+        self._gate = threading.Condition()
+        self._active = defaultdict(int)    # user_id -> per-user calls in flight
+        self._moving = set()               # users whose move is switching over
+        print(f"✅ Sharded database ready ({len(self.shards)} shards)")
+
+    # ===== ROUTING =====
+    def shard_index(self, user_id: int) -> int:
+        """Shard holding a user's entries (routing override, else hash)"""
+        return self.central.cached('routing', user_id, None, ROUTING_CACHE_TTL, lambda: self.load_shard_index(user_id))
+
+    def load_shard_index(self, user_id: int) -> int:
+        with self.central.connection() as conn:
+            row = conn.execute("SELECT shard FROM shard_routing WHERE user_id = ?", (user_id,)).fetchone()
+        if row is not None and row[0] < len(self.shards):
+            return row[0]
+        return hash_shard(user_id, len(self.shards))
+
+    @contextmanager
+    def routed(self, user_id: int):
+        """The user's shard, held so a concurrent move_user cannot switch it mid-call"""
+        with self._gate:
+            self._gate.wait_for(lambda: user_id not in self._moving)
+            self._active[user_id] += 1
+        try:
+            yield self.shards[self.shard_index(user_id)]
+        finally:
+            with self._gate:
+                self._active[user_id] -= 1
+                if self._active[user_id] <= 0:
+                    del self._active[user_id]
+                self._gate.notify_all()
+
+    def fan_out(self, call: Callable[[NutritionDatabase], Any]) -> List[Any]:
+        """Run call on every shard in parallel; results in shard order"""
+        return list(self._pool.map(call, self.shards))
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+        self.central.close()
+        self._pool.shutdown(wait=False)
+
+    # ===== USER MANAGEMENT (central) =====
+    def create_user(self, email: str, password: str, name: str) -> Optional[int]:
+        return self.central.create_user(email, password, name)
+
+    def authenticate_user(self, email: str, password: str) -> Optional[Dict]:
+        return self.central.authenticate_user(email, password)
+
+    def get_user_profile(self, user_id: int) -> Optional[Dict]:
+        return self.central.get_user_profile(user_id)
+
+    def update_user_profile(self, user_id: int, **kwargs) -> bool:
+        return self.central.update_user_profile(user_id, **kwargs)
+
+    def user_exists(self, email: str) -> bool:
+        return self.central.user_exists(email)
+
+    def get_all_users(self) -> List[Dict]:
+        return self.central.get_all_users()
+
+    # ===== DAILY ENTRIES (routed to the user's shard) =====
+    def sync_user(self, user_id: int):
+        with self.routed(user_id) as shard:
+            shard.sync_user(user_id)
+
+    def add_daily_entry(self, user_id: int, entry_data: Dict[str, Any]) -> bool:
+        with self.routed(user_id) as shard:
+            return shard.add_daily_entry(user_id, entry_data)
+
+    def add_daily_entries_bulk(self, entries: Iterable[Dict[str, Any]], user_id: Optional[int] = None,
+                               chunk_size: int = 1000, progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Bulk insert; chunks of mixed users are split per shard and inserted shard by shard"""
+        if user_id is not None:
+            with self.routed(user_id) as shard:
+                return shard.add_daily_entries_bulk(entries, user_id, chunk_size, progress)
+
+        stats = {'inserted': 0, 'failed': 0, 'chunks': 0, 'seconds': 0.0, 'rows_per_sec': 0.0}
+        start = time.perf_counter()
+        iterator = iter(entries)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                break
+            with ExitStack() as stack:
+                by_shard = defaultdict(list)
+                shard_of = {}
+                for entry in chunk:
+                    owner = entry.get('user_id')
+                    if owner not in shard_of:
+                        shard_of[owner] = stack.enter_context(self.routed(owner))
+                    by_shard[id(shard_of[owner])].append(entry)
+                shards = {id(shard): shard for shard in shard_of.values()}
+                for key, shard_entries in by_shard.items():
+                    result = shards[key].add_daily_entries_bulk(shard_entries, None, chunk_size)
+                    stats['inserted'] += result['inserted']
+                    stats['failed'] += result['failed']
+            stats['chunks'] += 1
+            stats['seconds'] = time.perf_counter() - start
+            stats['rows_per_sec'] = stats['inserted'] / stats['seconds'] if stats['seconds'] else 0.0
+            if progress:
+                progress(dict(stats))
+
+        stats['seconds'] = round(time.perf_counter() - start, 3)
+        stats['rows_per_sec'] = round(stats['inserted'] / stats['seconds'], 1) if stats['seconds'] else 0.0
+        return stats
+
+    def get_daily_entries(self, user_id: int, date: Optional[str] = None) -> List[Dict]:
+        with self.routed(user_id) as shard:
+            return shard.get_daily_entries(user_id, date)
+
+    def iter_entries(self, user_id: int, date: Optional[str] = None, columns: Optional[Iterable[str]] = None,
+                     limit: Optional[int] = None, batch_size: int = 500) -> Iterator[EntryRow]:
+        with self.routed(user_id) as shard:
+            yield from shard.iter_entries(user_id, date, columns, limit, batch_size)
+
+    def query_entries(self, user_id: int, date: Optional[str] = None, columns: Optional[Iterable[str]] = None,
+                      limit: Optional[int] = None) -> List[EntryRow]:
+        with self.routed(user_id) as shard:
+            return shard.query_entries(user_id, date, columns, limit)
+
+    def get_entries_page(self, user_id: int, cursor: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE,
+                         columns: Optional[Iterable[str]] = None) -> Dict:
+        with self.routed(user_id) as shard:
+            return shard.get_entries_page(user_id, cursor, page_size, columns)
+
+    def get_user_summary(self, user_id: int, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict:
+        with self.routed(user_id) as shard:
+            return shard.get_user_summary(user_id, start_date, end_date)
+
+    def get_daily_totals(self, user_id: int, date: str) -> Dict:
+        with self.routed(user_id) as shard:
+            return shard.get_daily_totals(user_id, date)
+
+    def get_daily_totals_range(self, user_id: int, start_date: Optional[str] = None,
+                               end_date: Optional[str] = None) -> List[tuple]:
+        with self.routed(user_id) as shard:
+            return shard.get_daily_totals_range(user_id, start_date, end_date)
+
+    def get_user_food_names(self, user_id: int, limit: Optional[int] = None) -> List[tuple]:
+        with self.routed(user_id) as shard:
+            return shard.get_user_food_names(user_id, limit)
+
+    def get_entry_version(self, user_id: int) -> tuple:
+        with self.routed(user_id) as shard:
+            # Entry ids restart in the new shard after a move; the shard index keeps versions distinct
+            return shard.get_entry_version(user_id) + (self.shards.index(shard),)
+
+    def delete_entry(self, user_id: int, entry_id: int) -> bool:
+        with self.routed(user_id) as shard:
+            return shard.delete_entry(user_id, entry_id)
+
+    def clear_user_data(self, user_id: int, batch_size: int = PURGE_BATCH_SIZE,
+                        progress: Optional[Callable[[int], None]] = None) -> bool:
+        with self.routed(user_id) as shard:
+            return shard.clear_user_data(user_id, batch_size, progress)
+
+    # ===== GLOBAL (fan-out) =====
+    def get_database_stats(self) -> Dict:
+        """Users from the central file; entries, dates and sizes summed over shards queried in parallel"""
+        shard_stats = self.fan_out(lambda shard: shard.get_database_stats())
+        stats = self.central.get_database_stats()
+        ranges = [s['date_range'].split(' to ') for s in shard_stats if s.get('date_range', 'No data') != 'No data']
+        stats['total_entries'] = sum(s.get('total_entries', 0) for s in shard_stats)
+        stats['date_range'] = (f"{min(r[0] for r in ranges)} to {max(r[1] for r in ranges)}" if ranges else "No data")
+        stats['file_size_kb'] = stats.get('file_size_kb', 0) + sum(s.get('file_size_kb', 0) for s in shard_stats)
+        stats['shards'] = [{'path': shard.db_path, 'entries': s.get('total_entries', 0)}
+                           for shard, s in zip(self.shards, shard_stats)]
+        return stats
+
+    def get_cache_stats(self) -> Dict[str, Dict]:
+        merged = defaultdict(lambda: {'hits': 0, 'misses': 0, 'entries': 0})
+        for db in [self.central] + self.shards:
+            for namespace, s in db.get_cache_stats().items():
+                for key in ('hits', 'misses', 'entries'):
+                    merged[namespace][key] += s[key]
+        for s in merged.values():
+            lookups = s['hits'] + s['misses']
+            s['hit_rate'] = round(s['hits'] / lookups, 4) if lookups else 0.0
+        return dict(merged)
+
+    def get_write_metrics(self) -> Dict[str, Any]:
+        """Write-behind counters summed over shards; latencies are the worst shard's"""
+        per_shard = [m for m in (shard.get_write_metrics() for shard in self.shards) if m]
+        if not per_shard:
+            return {}
+        merged = {}
+        for key in per_shard[0]:
+            values = [m[key] for m in per_shard]
+            merged[key] = max(values) if 'latency' in key or key.startswith('queue_to_commit') else sum(values)
+        merged['avg_batch_size'] = round(merged['committed'] / merged['batches'], 1) if merged['batches'] else 0.0
+        return merged
+
+    def rebuild_daily_totals(self) -> int:
+        return sum(self.fan_out(lambda shard: shard.rebuild_daily_totals()))
+
+    def check_daily_totals(self) -> List[Dict]:
+        return [row for rows in self.fan_out(lambda shard: shard.check_daily_totals()) for row in rows]
+
+    def compact_nutrition_data(self) -> List[Dict]:
+        return self.fan_out(lambda shard: shard.compact_nutrition_data())
+
+    # ===== RESHARDING =====
+    def entry_counts(self) -> List[Dict[int, int]]:
+        """Per shard, {user_id: entry count} of the users with entries there"""
+        def count(shard):
+            with shard.connection() as conn:
+                return dict(conn.execute("SELECT user_id, COUNT(*) FROM daily_entries GROUP BY user_id").fetchall())
+        return self.fan_out(count)
+
+    def copy_entries(self, user_id: int, source: NutritionDatabase, target: NutritionDatabase, after_id: int,
+                     batch_size: int = MOVE_BATCH_SIZE, id_map: Optional[Dict[int, int]] = None) -> int:
+        """
+        Copy a user's entries with id > after_id from source to target, one batch per transaction
+
+        Packed nutrition is re-encoded, since notes ids are local to each shard.
+        Fills id_map with source id -> new target id; returns the last copied source id.
+        """
+        insert_sql = (f"INSERT INTO daily_entries ({', '.join(MOVE_COLUMNS)}) "
+                      f"VALUES ({', '.join('?' * len(MOVE_COLUMNS))})")
+        blob_index = MOVE_COLUMNS.index('nutrition_blob')
+        while True:
+            with source.connection() as conn:
+                rows = conn.execute(
+                    f"SELECT id, {', '.join(MOVE_COLUMNS)} FROM daily_entries WHERE user_id = ? AND id > ? "
+                    f"ORDER BY id LIMIT ?", (user_id, after_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return after_id
+
+            values = [list(row[1:]) for row in rows]
+            nutritions = {i: source.codec.decode(v[blob_index]) for i, v in enumerate(values) if v[blob_index]}
+            target.codec.register_notes(n['notes'] for n in nutritions.values() if isinstance(n.get('notes'), str))
+            for i, nutrition in nutritions.items():
+                values[i][blob_index] = target.codec.encode(nutrition)
+
+            with target.connection() as conn:
+                cursor = conn.cursor()
+                for row, row_values in zip(rows, values):
+                    cursor.execute(insert_sql, row_values)
+                    if id_map is not None:
+                        id_map[row[0]] = cursor.lastrowid
+                conn.commit()
+            after_id = rows[-1][0]
+
+    def move_user(self, user_id: int, target_index: int, batch_size: int = MOVE_BATCH_SIZE) -> Dict[str, Any]:
+        """
+        Move a user's entries to another shard while the app keeps running
+
+        1. Copy existing entries in batches with no lock held.
+        2. Briefly hold the user's calls: copy entries added meanwhile, drop
+           copies of entries deleted meanwhile, and switch shard_routing.
+        3. Delete the old shard's rows in short batches.
+
+        Moved entries get new ids in the target shard.
+
+        Returns:
+            Dictionary with source, target, copied rows, hold time (ms) and seconds
+        """
+        if not 0 <= target_index < len(self.shards):
+            raise ValueError(f"No shard {target_index} (have {len(self.shards)})")
+        start = time.perf_counter()
+        source_index = self.shard_index(user_id)
+        stats = {'user_id': user_id, 'source': source_index, 'target': target_index, 'copied': 0,
+                 'hold_ms': 0.0, 'seconds': 0.0}
+        if source_index == target_index:
+            print(f"✅ User {user_id} is already on shard {target_index}")
+            return stats
+        source, target = self.shards[source_index], self.shards[target_index]
+
+        id_map: Dict[int, int] = {}
+        source.sync_user(user_id)
+        last_id = self.copy_entries(user_id, source, target, 0, batch_size, id_map)
+
+        with self._gate:
+            self._moving.add(user_id)
+            self._gate.wait_for(lambda: self._active.get(user_id, 0) == 0)
+        hold_start = time.perf_counter()
+        try:
+            source.sync_user(user_id)
+            self.copy_entries(user_id, source, target, last_id, batch_size, id_map)
+            with source.connection() as conn:
+                remaining = {row[0] for row in conn.execute("SELECT id FROM daily_entries WHERE user_id = ?", (user_id,))}
+            stale = [(target_id,) for source_id, target_id in id_map.items() if source_id not in remaining]
+            with target.connection() as conn:
+                conn.executemany("DELETE FROM daily_entries WHERE id = ?", stale)
+                conn.commit()
+
+            with self.central.connection() as conn:
+                if target_index == hash_shard(user_id, len(self.shards)):
+                    conn.execute("DELETE FROM shard_routing WHERE user_id = ?", (user_id,))
+                else:
+                    conn.execute('''
+                    INSERT INTO shard_routing (user_id, shard) VALUES (?, ?)
+                    ON CONFLICT (user_id) DO UPDATE SET shard = excluded.shard, moved_at = CURRENT_TIMESTAMP
+                    ''', (user_id, target_index))
+                conn.commit()
+            self.central.invalidate('routing', user_id)
+            target.invalidate('entries', user_id)
+        finally:
+            with self._gate:
+                self._moving.discard(user_id)
+                self._gate.notify_all()
+        stats['hold_ms'] = round((time.perf_counter() - hold_start) * 1000, 2)
+
+        # Invisible now that routing points at the target
+        source.clear_user_data(user_id)
+        for shard in (source, target):
+            shard.invalidate('stats')
+
+        stats['copied'] = len(id_map) - len(stale)
+        stats['seconds'] = round(time.perf_counter() - start, 3)
+        print(f"✅ Moved user {user_id}: shard {source_index} → {target_index}, {stats['copied']} entries "
+              f"(held {stats['hold_ms']} ms, {stats['seconds']}s total)")
+        return stats
+
+    def pin_users(self) -> int:
+        """
+        Record every user's current shard in shard_routing
+
+        Run before restarting with a different shard count: pinned users stay
+        where they are (rebalance can then move them) while new users hash
+        over the new count.
+        """
+        with self.central.connection() as conn:
+            user_ids = [row[0] for row in conn.execute("SELECT id FROM users")]
+        pinned = [(user_id, self.shard_index(user_id)) for user_id in user_ids]
+        with self.central.connection() as conn:
+            conn.executemany("INSERT OR IGNORE INTO shard_routing (user_id, shard) VALUES (?, ?)", pinned)
+            conn.commit()
+        self.central.invalidate('routing')
+        print(f"✅ Pinned {len(pinned)} users to their current shards")
+        return len(pinned)
+
+    def rebalance(self, tolerance: float = 0.1, max_moves: int = 100) -> List[Dict]:
+        """
+        Move users from the fullest to the emptiest shard until entry counts
+        are within tolerance of each other (or max_moves is reached)
+        """
+        counts = self.entry_counts()
+        moves = []
+        while len(moves) < max_moves:
+            totals = [sum(c.values()) for c in counts]
+            fullest, emptiest = totals.index(max(totals)), totals.index(min(totals))
+            gap = totals[fullest] - totals[emptiest]
+            if gap <= tolerance * max(1, sum(totals) / len(totals)):
+                break
+            # The biggest user that still narrows the gap
+            candidates = [(n, uid) for uid, n in counts[fullest].items() if n < gap]
+            if not candidates:
+                break
+            count, user_id = max(candidates)
+            moves.append(self.move_user(user_id, emptiest))
+            counts[emptiest][user_id] = counts[fullest].pop(user_id)
+        print(f"✅ Rebalanced with {len(moves)} moves: "
+              f"{[sum(c.values()) for c in counts]} entries per shard")
+        return moves
+
+    def repair(self) -> int:
+        """Move entries found on a shard their user is not routed to (left by other processes)"""
+        moved = 0
+        for index, counts in enumerate(self.entry_counts()):
+            for user_id in counts:
+                home = self.shard_index(user_id)
+                if home == index:
+                    continue
+                with self.routed(user_id):
+                    source, target = self.shards[index], self.shards[home]
+                    self.copy_entries(user_id, source, target, 0)
+                    source.clear_user_data(user_id)
+                    target.invalidate('entries', user_id)
+                moved += counts[user_id]
+                print(f"⚠️ Moved {counts[user_id]} misplaced entries of user {user_id}: shard {index} → {home}")
+        print(f"✅ Repair finished ({moved} misplaced entries)")
+        return moved
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded nutrition database tools")
+    parser.add_argument("--db", default="nutrition.db", help="Central database path")
+    parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS, help="Number of shard files")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("status", help="Users and entries per shard")
+    move = commands.add_parser("move", help="Move one user's entries to another shard")
+    move.add_argument("user_id", type=int)
+    move.add_argument("shard", type=int)
+    rebalance = commands.add_parser("rebalance", help="Even out entry counts across shards")
+    rebalance.add_argument("--tolerance", type=float, default=0.1, help="Allowed spread, as a fraction of the mean")
+    rebalance.add_argument("--max-moves", type=int, default=100)
+    commands.add_parser("pin", help="Pin every user to their current shard before changing --shards")
+    commands.add_parser("repair", help="Move entries stored on the wrong shard")
+
+    args = parser.parse_args()
+    db = ShardedNutritionDatabase(args.db, args.shards, cache=False)
+    try:
+        if args.command == "status":
+            for index, counts in enumerate(db.entry_counts()):
+                print(f"  • shard {index} ({db.shards[index].db_path}): {len(counts)} users, "
+                      f"{sum(counts.values())} entries")
+        elif args.command == "move":
+            db.move_user(args.user_id, args.shard)
+        elif args.command == "rebalance":
+            db.rebalance(args.tolerance, args.max_moves)
+        elif args.command == "pin":
+            db.pin_users()
+        else:
+            db.repair()
+    finally:
+        db.close()
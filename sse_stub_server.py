@@ -0,0 +1,124 @@
+# sse_stub_server.py
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+DEFAULT_COMPLETION = json.dumps({
+    "food_name": "pasta carbonara",
+    "portion_size": "normal",
+    "calories": "520 kcal",
+    "protein": "21 g",
+    "fat": "24 g",
+    "carbs": "56 g",
+    "fiber": "2.5 g",
+    "sugar": "3 g",
+    "sodium": "780 mg",
+    "notes": "Pasta dengan saus telur, keju dan daging asap. Tinggi lemak jenuh dan natrium, "
+             "imbangi dengan sayuran dan kurangi porsi keju bila sedang membatasi kalori.",
+    "source": "deepseek_api"
+}, ensure_ascii=False, indent=4)
+
+def chunk_text(text: str, size: int) -> List[str]:
+    """Split text into pieces the way a model streams tokens"""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+class SSEStubServer:
+    """
+    Local stand-in for the DeepSeek chat completions endpoint.
+
+    Streams a canned completion as server-sent events (or as one JSON
+    body when the request does not ask for a stream) so the streaming
+    client can be exercised without network access or an API key.
+    """
+
+    def __init__(self, completion: str = DEFAULT_COMPLETION, chunk_size: int = 8,
+                 delay: float = 0.02, status: int = 200):
+        self.completion = completion
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.status = status
+        self.requests = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/chat/completions"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                stub.requests += 1
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+
+                if stub.status != 200:
+                    self.send_response(stub.status)
+                    self.end_headers()
+                    self.wfile.write(b'{"error": "stub failure"}')
+                    return
+
+                if not request.get("stream"):
+                    body = json.dumps({"choices": [{"message": {"content": stub.completion}}]}).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for piece in chunk_text(stub.completion, stub.chunk_size):
+                    event = {"choices": [{"index": 0, "delta": {"content": piece}}]}
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(stub.delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == "__main__":
+    from deepseek_api import DeepSeekNutritionAPI
+
+    with SSEStubServer() as stub:
+        api = DeepSeekNutritionAPI(api_key="stub-key-for-local-server", use_local_kb=False)
+        api.api_url = stub.url
+
+        start = time.perf_counter()
+        first_macros = None
+        for stage, data in api.stream_food_nutrition("pasta carbonara", "normal"):
+            elapsed = (time.perf_counter() - start) * 1000
+            if stage == "macros":
+                first_macros = elapsed
+            print(f"⏱️ {elapsed:7.1f} ms  {stage}: {json.dumps(data, ensure_ascii=False)[:100]}")
+
+        expected = json.loads(DEFAULT_COMPLETION)
+        assert data["calories"] == expected["calories"] and data["notes"] == expected["notes"], data
+        assert first_macros is not None and first_macros < elapsed, "macros were not emitted early"
+        print(f"✅ Macros after {first_macros:.0f} ms, full result after {elapsed:.0f} ms")
@@ -0,0 +1,158 @@
+# stream_parser.py
+import json
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+_WHITESPACE = " \t\r\n"
+
+class IncrementalJSONObjectParser:
+    """
+    Parse a JSON object that arrives in pieces, reporting each top-level
+    field as soon as its value is complete.
+
+    Text before the opening brace (e.g. a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.fields = {}
+        self.started = False
+        self.finished = False
+        self._key: Optional[str] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Add a chunk of text
+
+        Returns:
+            List of (key, value) pairs completed by this chunk
+        """
+        self.buffer += chunk
+        completed = []
+
+        while not self.finished:
+            if not self.started:
+                brace = self.buffer.find("{", self.pos)
+                if brace < 0:
+                    self.pos = len(self.buffer)
+                    break
+                self.started = True
+                self.pos = brace + 1
+
+            self._skip_separators()
+            if self.pos >= len(self.buffer):
+                break
+
+            if self.buffer[self.pos] == "}":
+                self.finished = True
+                self.pos += 1
+                break
+
+            end = self._scan_value(self.pos)
+            if end is None:
+                break
+
+            token = json.loads(self.buffer[self.pos:end])
+            self.pos = end
+
+            if self._key is None:
+                self._key = str(token)
+                self._skip_whitespace()
+                if self.pos < len(self.buffer) and self.buffer[self.pos] == ":":
+                    self.pos += 1
+            else:
+                self.fields[self._key] = token
+                completed.append((self._key, token))
+                self._key = None
+
+        return completed
+
+    def _skip_whitespace(self):
+        while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+            self.pos += 1
+
+    def _skip_separators(self):
+        while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE + ",:":
+            self.pos += 1
+
+    def _scan_value(self, start: int) -> Optional[int]:
+        """End offset of the JSON value starting at start, or None if it is not complete yet"""
+        buf = self.buffer
+        first = buf[start]
+
+        if first == '"':
+            return self._scan_string(start)
+
+        if first in "{[":
+            depth = 0
+            i = start
+            while i < len(buf):
+                ch = buf[i]
+                if ch == '"':
+                    end = self._scan_string(i)
+                    if end is None:
+                        return None
+                    i = end
+                    continue
+                if ch in "{[":
+                    depth += 1
+                elif ch in "}]":
+                    depth -= 1
+                    if depth == 0:
+                        return i + 1
+                i += 1
+            return None
+
+        # Number or literal: only complete once a delimiter follows it
+        i = start
+        while i < len(buf) and buf[i] not in ",}]" + _WHITESPACE:
+            i += 1
+        return i if i < len(buf) else None
+
+    def _scan_string(self, start: int) -> Optional[int]:
+        buf = self.buffer
+        i = start + 1
+        while i < len(buf):
+            ch = buf[i]
+            if ch == "\\":
+                i += 2
+                continue
+            if ch == '"':
+                return i + 1
+            i += 1
+        return None
+
+def iter_sse_data(lines: Iterable[str]) -> Iterator[str]:
+    """Yield the data payload of each server-sent event"""
+    data = []
+    for line in lines:
+        if line is None:
+            continue
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.rstrip("\r\n")
+        if not line:
+            if data:
+                yield "\n".join(data)
+                data = []
+            continue
+        if line.startswith(":"):
+            continue
+        if line.startswith("data:"):
+            data.append(line[5:].lstrip(" "))
+    if data:
+        yield "\n".join(data)
+
+def iter_chat_deltas(lines: Iterable[str]) -> Iterator[str]:
+    """Yield content deltas from an OpenAI-compatible chat completion SSE stream"""
+    for payload in iter_sse_data(lines):
+        if payload == "[DONE]":
+            return
+        try:
+            event = json.loads(payload)
+        except json.JSONDecodeError:
+            continue
+        for choice in event.get("choices", []):
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                yield content
@@ -0,0 +1,80 @@
+# text_index.py
+import re
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+TYPO_MAX_LENGTH_DIFF = 2        # characters a typo may add or drop, on top of one per five characters
+
+def normalize_food_name(name: str) -> str:
+    """Normalize a food name: lowercase, punctuation to spaces, collapsed whitespace"""
+    return _NON_ALNUM.sub(' ', str(name).lower()).strip()
+
+def is_typo_of(key: str, candidate: str) -> bool:
+    """
+    Whether normalized key looks like a misspelling of candidate, not another dish
+
+    Same number of words and nearly the same length: "nasi gorng" is a typo
+    of "nasi goreng", while "nasi goreng kambing" and "sate kambing" are not.
+    """
+    words, candidate_words = key.split(' '), candidate.split(' ')
+    if len(words) != len(candidate_words) or set(candidate_words) < set(words):
+        return False
+    return abs(len(key) - len(candidate)) <= TYPO_MAX_LENGTH_DIFF + len(candidate) // 5
+
+def trigrams(text: str) -> Set[str]:
+    """Character trigrams of an already normalized string (padded at word edges)"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class TrigramIndex:
+    """Inverted trigram index for typo-tolerant matching of short strings"""
+
+    def __init__(self):
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._grams: Dict[str, Set[str]] = {}
+
+    def __len__(self):
+        return len(self._grams)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._grams
+
+    def add(self, key: str):
+        """Index a normalized key (no-op if already present)"""
+        if not key or key in self._grams:
+            return
+        grams = trigrams(key)
+        self._grams[key] = grams
+        for gram in grams:
+            self._postings[gram].add(key)
+
+    def search(self, query: str, limit: int = 5, min_score: float = 0.0) -> List[Tuple[str, float]]:
+        """
+        Find keys similar to query
+
+        Args:
+            query: Normalized query string
+            limit: Maximum number of results
+            min_score: Minimum Dice similarity (0..1)
+
+        Returns:
+            List of (key, score) tuples, best first
+        """
+        if not query:
+            return []
+        query_grams = trigrams(query)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in query_grams:
+            for key in self._postings.get(gram, ()):
+                shared[key] += 1
+
+        scored = []
+        for key, count in shared.items():
+            score = 2.0 * count / (len(query_grams) + len(self._grams[key]))
+            if score >= min_score:
+                scored.append((key, score))
+
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
@@ -0,0 +1,172 @@
+# workload.py
+import argparse
+import io
+import random
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from database import NutritionDatabase
+from food_index import load_class_names
+from nutrition_kb import PORTION_FACTORS, get_nutrition_kb
+
+WORKLOAD_DOMAIN = "workload.example"
+WORKLOAD_PASSWORD = "workload123"
+
+DEFAULT_USERS = 1000
+DEFAULT_MEAN_ENTRIES = 60       # entries per user on average; the heaviest users get far more
+DEFAULT_DAYS = 180              # history length
+ACTIVITY_EXPONENT = 1.1         # Zipf exponent of entries per user (rank 1 is the most active)
+FOOD_EXPONENT = 0.9             # Zipf exponent of dish popularity, in class_names order
+
+PORTIONS = (("Small", 0.2), ("Normal", 0.6), ("Large", 0.2))
+
+def zipf_weights(n: int, exponent: float) -> List[float]:
+    """Normalized power-law weights 1/rank^exponent for ranks 1..n"""
+    weights = [1.0 / (rank ** exponent) for rank in range(1, n + 1)]
+    total = sum(weights)
+    return [w / total for w in weights]
+
+def entries_per_user(users: int, mean_entries: int, exponent: float = ACTIVITY_EXPONENT) -> List[int]:
+    """Power-law entry counts (at least one each) summing to about users * mean_entries"""
+    total = users * mean_entries
+    return [max(1, round(total * w)) for w in zipf_weights(users, exponent)]
+
+class WorkloadGenerator:
+    def __init__(self, seed: int = 42, days: int = DEFAULT_DAYS, end_date: Optional[str] = None,
+                 food_names: Optional[List[str]] = None):
+        """
+        Synthetic daily entries that look like the app's own
+
+        Dishes come from data/class_names.txt with power-law popularity;
+        nutrition is the local table's value for the dish and portion.
+
+        Args:
+            seed: Random seed; the same seed always produces the same entries
+            days: Number of days of history, ending at end_date
+            end_date: Last day of history (YYYY-MM-DD, default today)
+            food_names: Dish names (default: data/class_names.txt)
+        """
+        self.rng = random.Random(seed)
+        self.days = days
+        self.end_date = datetime.strptime(end_date, '%Y-%m-%d') if end_date else datetime.now()
+        self.food_names = food_names or load_class_names()
+        self.food_weights = zipf_weights(len(self.food_names), FOOD_EXPONENT)
+        self.portions = [name for name, _ in PORTIONS]
+        self.portion_weights = [weight for _, weight in PORTIONS]
+        self._nutrition: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # Table lookups print; resolve each (dish, portion) once, quietly
+        with redirect_stdout(io.StringIO()):
+            kb = get_nutrition_kb()
+            for food in self.food_names:
+                for portion in self.portions:
+                    nutrition = kb.lookup(food, portion.lower()) if portion.lower() in PORTION_FACTORS else None
+                    if nutrition:
+                        nutrition.pop("analyzed_at", None)
+                        self._nutrition[(food, portion)] = nutrition
+
+    def date(self, span: Optional[int] = None) -> str:
+        """A day within the last span days of history (most recent days slightly favoured)"""
+        span = min(span or self.days, self.days)
+        offset = int(span * self.rng.random() ** 1.5)
+        return (self.end_date - timedelta(days=offset)).strftime('%Y-%m-%d')
+
+    def entry(self, date: Optional[str] = None) -> Dict[str, Any]:
+        """One add_daily_entry payload"""
+        food = self.rng.choices(self.food_names, self.food_weights)[0]
+        portion = self.rng.choices(self.portions, self.portion_weights)[0]
+        nutrition = dict(self._nutrition.get((food, portion)) or {})
+        date = date or self.date()
+        if nutrition:
+            nutrition["analyzed_at"] = f"{date}T{self.rng.randint(6, 21):02d}:{self.rng.randint(0, 59):02d}:00"
+        return {
+            'food': food.title(),
+            'portion': portion,
+            'nutrition': nutrition,
+            'water': self.rng.choice((0, 0, 250, 500)),
+            'exercise': self.rng.choice((0, 0, 0, 15, 30, 60)),
+            'source': self.rng.choices(('classifier', 'manual'), (0.7, 0.3))[0],
+            'prediction_confidence': round(self.rng.uniform(0.55, 0.99), 3),
+            'date': date,
+        }
+
+    def iter_entries(self, user_ids: List[int], mean_entries: int = DEFAULT_MEAN_ENTRIES) -> Iterator[Dict[str, Any]]:
+        """
+        History for user_ids (most active first), interleaved across users
+
+        Heavier users also have longer histories: a user with fewer entries
+        than days only spans as many days as they have entries.
+        """
+        counts = entries_per_user(len(user_ids), mean_entries)
+        remaining = dict(zip(user_ids, counts))
+        spans = {user_id: max(1, min(self.days, count)) for user_id, count in remaining.items()}
+        while remaining:
+            for user_id in list(remaining):
+                for _ in range(min(remaining[user_id], 50)):
+                    entry = self.entry(self.date(spans[user_id]))
+                    entry['user_id'] = user_id
+                    yield entry
+                remaining[user_id] -= min(remaining[user_id], 50)
+                if not remaining[user_id]:
+                    del remaining[user_id]
+
+def create_workload_users(db: NutritionDatabase, users: int, prefix: str = "user") -> List[int]:
+    """Create users {prefix}{i}@workload.example, all with WORKLOAD_PASSWORD; returns their ids"""
+    user_ids = []
+    with redirect_stdout(io.StringIO()):
+        for i in range(users):
+            user_id = db.create_user(f"{prefix}{i}@{WORKLOAD_DOMAIN}", WORKLOAD_PASSWORD, f"Workload {prefix} {i}")
+            if user_id:
+                user_ids.append(user_id)
+    return user_ids
+
+def workload_users(db: NutritionDatabase) -> List[Dict]:
+    """Generated users already in db, most active first (id, email)"""
+    users = [u for u in db.get_all_users() if u['email'].endswith(f"@{WORKLOAD_DOMAIN}")]
+    return sorted(users, key=lambda u: u['id'])
+
+def populate(db: NutritionDatabase, users: int = DEFAULT_USERS, mean_entries: int = DEFAULT_MEAN_ENTRIES,
+             days: int = DEFAULT_DAYS, seed: int = 42, end_date: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Create users and their power-law entry histories in bulk
+
+    Returns:
+        Dictionary with user/entry counts, heaviest user and top-1% share, and timings
+    """
+    start = time.perf_counter()
+    prefix = f"u{seed}_{time.time_ns() % 10**8}_"
+    user_ids = create_workload_users(db, users, prefix)
+    generator = WorkloadGenerator(seed, days, end_date)
+    with redirect_stdout(io.StringIO()):
+        result = db.add_daily_entries_bulk(generator.iter_entries(user_ids, mean_entries), chunk_size=5000)
+
+    counts = entries_per_user(len(user_ids), mean_entries)
+    top = max(1, len(counts) // 100)
+    stats = {
+        'users': len(user_ids),
+        'entries': result['inserted'],
+        'failed': result['failed'],
+        'max_entries_per_user': max(counts) if counts else 0,
+        'median_entries_per_user': sorted(counts)[len(counts) // 2] if counts else 0,
+        'top_1pct_share': round(sum(counts[:top]) / sum(counts), 3) if counts else 0.0,
+        'seconds': round(time.perf_counter() - start, 3),
+        'rows_per_sec': result['rows_per_sec'],
+    }
+    print(f"✅ Generated {stats['users']} users and {stats['entries']} entries in {stats['seconds']}s "
+          f"(top 1% of users hold {stats['top_1pct_share']:.0%} of entries)")
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill a database with a synthetic power-law workload")
+    parser.add_argument("--db", default="nutrition.db", help="Database path")
+    parser.add_argument("--users", type=int, default=DEFAULT_USERS)
+    parser.add_argument("--entries", type=int, default=DEFAULT_MEAN_ENTRIES, help="Mean entries per user")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="Days of history")
+    parser.add_argument("--end-date", help="Last day of history (YYYY-MM-DD, default today)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    db = NutritionDatabase(args.db, cache=False)
+    print(populate(db, args.users, args.entries, args.days, args.seed, args.end_date))
+    db.close()